@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the throughput of the data flows.
+
+It covers gathering mini-batches from unshuffled and shuffled arrays at
+several data and batch sizes, the overhead of :class:`MapperFlow`, the
+hand-off cost of :class:`ThreadingFlow`, :func:`minibatch_slices_iterator`
+and :meth:`DataFlow.get_arrays`, reporting mini-batches and bytes per
+second for each case.
+
+Usage::
+
+    # run the benchmarks, and store the results as the baseline
+    python benchmarks/bench_dataflow.py --save baseline.json
+
+    # run the benchmarks again, and compare with the baseline
+    python benchmarks/bench_dataflow.py --compare baseline.json
+
+When comparing, the cases slower than the baseline by more than
+`--tolerance` are marked as regressions, and the script exits with
+status 1.  The baselines are specific to the machine, so they should be
+recorded and compared on the same machine.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from tfsnippet.dataflow import DataFlow
+from tfsnippet.utils import minibatch_slices_iterator
+
+
+def time_best(fn, repeat=3):
+    """Get the best time (in seconds) to call `fn`, and its result."""
+    best = result = None
+    for _ in range(repeat):
+        start = time.time()
+        result = fn()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def iterate_epoch(flow):
+    """Iterate through an epoch, and get the number of batches and bytes."""
+    n_batches = n_bytes = 0
+    for batch in flow:
+        n_batches += 1
+        n_bytes += sum(a.nbytes for a in batch)
+    return n_batches, n_bytes
+
+
+def flow_case(make_flow):
+    """Make a benchmark case which iterates through an epoch of a flow."""
+    def run():
+        flow = make_flow()
+        try:
+            return iterate_epoch(flow)
+        finally:
+            if hasattr(flow, 'close'):
+                flow.close()
+    return run
+
+
+def identity(*arrays):
+    return arrays
+
+
+def benchmark_cases():
+    """
+    Yield the names and functions of the benchmark cases.
+
+    Each function returns the number of batches and bytes it has produced.
+    The functions refer to the loop variables, thus must be run before
+    the next case is yielded.
+    """
+    for n_rows, n_cols in [(10000, 128), (100000, 128), (20000, 3072)]:
+        x = np.random.normal(size=[n_rows, n_cols]).astype(np.float32)
+        y = np.arange(n_rows, dtype=np.int32)
+
+        for batch_size in (32, 256, 2048):
+            for shuffle in (False, True):
+                name = 'gather/{}x{}/batch={}/{}'.format(
+                    n_rows, n_cols, batch_size,
+                    'shuffled' if shuffle else 'unshuffled'
+                )
+                yield name, flow_case(
+                    lambda: DataFlow.arrays([x, y], batch_size=batch_size,
+                                            shuffle=shuffle))
+
+        for batch_size in (32, 256):
+            name = 'map/{}x{}/batch={}'.format(n_rows, n_cols, batch_size)
+            yield name, flow_case(
+                lambda: DataFlow.arrays([x, y], batch_size=batch_size).
+                map(identity)
+            )
+
+            name = 'threaded/{}x{}/batch={}'.format(n_rows, n_cols,
+                                                     batch_size)
+            yield name, flow_case(
+                lambda: DataFlow.arrays([x, y], batch_size=batch_size).
+                threaded(prefetch=5)
+            )
+
+        name = 'get_arrays/{}x{}/batch=256'.format(n_rows, n_cols)
+        yield name, lambda: (
+            (n_rows + 255) // 256,
+            sum(a.nbytes for a in
+                DataFlow.arrays([x, y], batch_size=256).get_arrays())
+        )
+
+    for length, batch_size in [(1000000, 32), (1000000, 256)]:
+        name = 'slices/{}/batch={}'.format(length, batch_size)
+        yield name, lambda: (
+            sum(1 for _ in minibatch_slices_iterator(length, batch_size)),
+            0
+        )
+
+
+def run_benchmarks(pattern=None):
+    """Run the benchmark cases, and get the results."""
+    results = {}
+    print('{:<40} {:>12} {:>12}'.format('case', 'batches/s', 'MB/s'))
+    for name, fn in benchmark_cases():
+        if pattern and pattern not in name:
+            continue
+        elapsed, (n_batches, n_bytes) = time_best(fn)
+        results[name] = {
+            'batches_per_sec': n_batches / elapsed,
+            'bytes_per_sec': n_bytes / elapsed,
+        }
+        print('{:<40} {:>12.1f} {:>12.1f}'.format(
+            name, n_batches / elapsed, n_bytes / elapsed / 1e6))
+    return results
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compare the results with the baseline.
+
+    Returns:
+        int: The number of regressions.
+    """
+    print('')
+    print('{:<40} {:>12} {:>12} {:>8}'.format(
+        'case', 'baseline', 'current', 'ratio'))
+    regressions = 0
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        base = baseline[name]['batches_per_sec']
+        current = results[name]['batches_per_sec']
+        ratio = current / base
+        is_regression = ratio < 1. - tolerance
+        regressions += is_regression
+        print('{:<40} {:>12.1f} {:>12.1f} {:>8.2f}{}'.format(
+            name, base, current, ratio, '  REGRESSION' if is_regression else ''
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the throughput of the data flows.')
+    parser.add_argument('-k', '--pattern', default=None,
+                        help='only run the cases whose names contain this')
+    parser.add_argument('--save', default=None,
+                        help='save the results as a JSON baseline file')
+    parser.add_argument('--compare', default=None,
+                        help='compare the results with a JSON baseline file')
+    parser.add_argument('--tolerance', type=float, default=.1,
+                        help='tolerated fraction of slow down (default .1)')
+    args = parser.parse_args()
+
+    np.random.seed(1234)
+    results = run_benchmarks(args.pattern)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare_results(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the batched image augmentation mappers against naive loops.
+
+The naive implementations augment the images one by one in Python loops,
+which is the usual way of writing such augmentations, while the mappers
+in :mod:`tfsnippet.dataflow.image_mappers` transform a whole mini-batch
+by vectorized index arithmetic.
+
+Usage::
+
+    python benchmarks/bench_image_mappers.py
+"""
+import time
+
+import numpy as np
+
+from tfsnippet.dataflow import (NormalizeChannels, RandomCrop, RandomFlip,
+                                RandomShift)
+
+
+def time_best(fn, repeat=5):
+    """Get the best time (in seconds) to call `fn`."""
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        fn()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def naive_crop(images, size, padding):
+    ret = []
+    for img in images:
+        img = np.pad(img, [(padding, padding), (padding, padding), (0, 0)],
+                     mode='constant')
+        y = np.random.randint(0, img.shape[0] - size + 1)
+        x = np.random.randint(0, img.shape[1] - size + 1)
+        ret.append(img[y: y + size, x: x + size])
+    return np.stack(ret, axis=0)
+
+
+def naive_shift(images, max_shift):
+    ret = np.zeros_like(images)
+    height, width = images.shape[1: 3]
+    for i, img in enumerate(images):
+        dy, dx = np.random.randint(-max_shift, max_shift + 1, size=2)
+        src_y, dst_y = max(-dy, 0), max(dy, 0)
+        src_x, dst_x = max(-dx, 0), max(dx, 0)
+        h, w = height - abs(dy), width - abs(dx)
+        ret[i, dst_y: dst_y + h, dst_x: dst_x + w] = \
+            img[src_y: src_y + h, src_x: src_x + w]
+    return ret
+
+
+def naive_flip(images):
+    ret = []
+    for img in images:
+        if np.random.random_sample() < .5:
+            img = img[:, ::-1]
+        ret.append(img)
+    return np.stack(ret, axis=0)
+
+
+def naive_normalize(images, mean, std):
+    ret = np.empty(images.shape, dtype=np.float32)
+    for i, img in enumerate(images):
+        for c in range(images.shape[-1]):
+            ret[i, ..., c] = (img[..., c] - mean[c]) / std[c]
+    return ret
+
+
+def main():
+    np.random.seed(1234)
+    mean = [125.3, 123.0, 113.9]
+    std = [63.0, 62.1, 66.7]
+    cases = [
+        ('crop', RandomCrop(32, padding=4),
+         lambda x: naive_crop(x, 32, 4)),
+        ('shift', RandomShift(4), lambda x: naive_shift(x, 4)),
+        ('flip', RandomFlip(), naive_flip),
+        ('normalize', NormalizeChannels(mean, std),
+         lambda x: naive_normalize(x, mean, std)),
+    ]
+
+    print('{:<24} {:>12} {:>12} {:>8}'.format(
+        'case', 'naive (ms)', 'batched (ms)', 'speedup'))
+    for batch_size in (32, 128, 512):
+        x = np.random.randint(
+            0, 256, size=[batch_size, 32, 32, 3]).astype(np.uint8)
+        for name, mapper, naive_fn in cases:
+            naive_time = time_best(lambda: naive_fn(x))
+            batched_time = time_best(lambda: mapper(x))
+            print('{:<24} {:>12.3f} {:>12.3f} {:>8.2f}'.format(
+                '{}/batch={}'.format(name, batch_size), naive_time * 1e3,
+                batched_time * 1e3, naive_time / batched_time
+            ))
+
+
+if __name__ == '__main__':
+    main()
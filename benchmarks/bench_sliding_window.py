@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for producing mini-batches of sliding windows, by fancy-indexing
+the data array (the default), and by the strided view of the data array.
+
+Usage::
+
+    python benchmarks/bench_sliding_window.py
+"""
+import time
+
+import numpy as np
+
+from tfsnippet.dataflow import SlidingWindow
+
+
+def time_one_epoch(flow, repeat=3):
+    """Get the best time (in seconds) to iterate through an epoch."""
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for _ in flow:
+            pass
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def benchmark(x, window_size, batch_size=64):
+    n_windows = len(x) - window_size + 1
+    n_batches = (n_windows + batch_size - 1) // batch_size
+    window_bytes = x.itemsize * window_size * int(np.prod(x.shape[1:]))
+    for shuffle in (False, True):
+        for mode, kwargs in [
+                ('fancy-index', {}),
+                ('fancy-index + pool', {'buffer_pool_size': 2}),
+                ('strided', {'strided': True}),
+                ('strided + pool', {'strided': True,
+                                    'buffer_pool_size': 2})]:
+            sw = SlidingWindow(x, window_size=window_size, **kwargs)
+            flow = sw.as_flow(batch_size=batch_size, shuffle=shuffle)
+            elapsed = time_one_epoch(flow)
+            print('{:>10} {:>6} {:>7} {:>8} {:>20} {:>12.1f} {:>12.1f}'.
+                  format(x.shape[0], window_size,
+                         'yes' if shuffle else 'no', x.shape[1], mode,
+                         n_batches / elapsed,
+                         n_windows * window_bytes / elapsed / 1e6))
+
+
+def main():
+    print('{:>10} {:>6} {:>7} {:>8} {:>20} {:>12} {:>12}'.format(
+        'length', 'window', 'shuffle', 'features', 'mode', 'batches/s',
+        'MB/s'))
+    for length, n_features, window_size in [(100000, 1, 100),
+                                            (20000, 16, 100),
+                                            (5000, 64, 250)]:
+        x = np.random.normal(size=[length, n_features]).astype(np.float32)
+        benchmark(x, window_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for gathering shuffled mini-batches from large row-major arrays,
+with and without sorting the indices of each mini-batch.
+
+Usage::
+
+    python benchmarks/bench_sorted_gather.py
+"""
+import os
+import time
+
+import numpy as np
+
+from tfsnippet.dataflow import DataFlow
+from tfsnippet.utils import TemporaryDirectory
+
+
+def time_one_epoch(flow, repeat=3):
+    """Get the best time (in seconds) to iterate through an epoch."""
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for _ in flow:
+            pass
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def benchmark(x, source, batch_size=256):
+    n_batches = (len(x) + batch_size - 1) // batch_size
+    for mode, kwargs in [
+            ('unsorted', {}),
+            ('sorted', {'sort_batch_indices': True}),
+            ('sorted + restore', {'sort_batch_indices': True,
+                                  'restore_batch_order': True}),
+            ('sorted + buffer pool', {'sort_batch_indices': True,
+                                      'buffer_pool_size': 2})]:
+        flow = DataFlow.arrays([x], batch_size=batch_size, shuffle=True,
+                               **kwargs)
+        elapsed = time_one_epoch(flow)
+        print('{:>10} {:>6} {:>8} {:>22} {:>12.1f} {:>12.1f}'.format(
+            x.shape[0], x.shape[1], source, mode, n_batches / elapsed,
+            x.nbytes / elapsed / 1e6
+        ))
+
+
+def main():
+    print('{:>10} {:>6} {:>8} {:>22} {:>12} {:>12}'.format(
+        'rows', 'cols', 'source', 'mode', 'batches/s', 'MB/s'))
+    with TemporaryDirectory() as tmpdir:
+        for n_rows, n_cols in [(100000, 128), (200000, 784), (20000, 8192)]:
+            x = np.random.normal(size=[n_rows, n_cols]).astype(np.float32)
+            benchmark(x, 'memory')
+
+            path = os.path.join(tmpdir, 'x.npy')
+            np.save(path, x)
+            del x
+            x = np.load(path, mmap_mode='r')
+            benchmark(x, 'mmap')
+            del x
+
+
+if __name__ == '__main__':
+    main()
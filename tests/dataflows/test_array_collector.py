@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import *
+
+
+class ArrayCollectorTestCase(unittest.TestCase):
+
+    def test_known_length(self):
+        x = np.arange(10, dtype=np.int32)
+        y = np.random.normal(size=(10, 3))
+        collector = ArrayCollector(length=10)
+        self.assertEquals(10, collector.length)
+        for i in range(0, 10, 4):
+            collector.collect([x[i: i + 4], y[i: i + 4]])
+        self.assertEquals(10, collector.size)
+        arrays = collector.get_arrays()
+        self.assertEquals(np.int32, arrays[0].dtype)
+        np.testing.assert_equal(x, arrays[0])
+        np.testing.assert_equal(y, arrays[1])
+        self.assertIsNone(arrays[0].base)  # exactly allocated
+
+    def test_unknown_length(self):
+        x = np.arange(100)
+        collector = ArrayCollector()
+        self.assertIsNone(collector.length)
+        for i in range(0, 100, 3):
+            collector.collect([x[i: i + 3]])
+        arrays = collector.get_arrays()
+        np.testing.assert_equal(x, arrays[0])
+        self.assertIsNone(arrays[0].base)  # shrunk to the collected size
+        self.assertEquals(100, len(collector._buffers[0]))
+
+        # test collecting more data after the arrays are shrunk
+        collector.collect([x[:3]])
+        np.testing.assert_equal(np.concatenate([x, x[:3]]),
+                                collector.get_arrays()[0])
+        np.testing.assert_equal(x, arrays[0])
+
+        # test the length hint is exceeded
+        collector = ArrayCollector(length=5)
+        for i in range(0, 100, 7):
+            collector.collect([x[i: i + 7]])
+        np.testing.assert_equal(x, collector.get_arrays()[0])
+
+    def test_dtype_promotion(self):
+        collector = ArrayCollector(length=4)
+        collector.collect([np.array([1, 2], dtype=np.int32)])
+        collector.collect([np.array([.5, 1.5], dtype=np.float64)])
+        arrays = collector.get_arrays()
+        self.assertEquals(np.float64, arrays[0].dtype)
+        np.testing.assert_equal([1, 2, .5, 1.5], arrays[0])
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`length` must be non-negative'):
+            _ = ArrayCollector(length=-1)
+        collector = ArrayCollector()
+        with pytest.raises(ValueError, match='No mini-batch has been '
+                                             'collected'):
+            _ = collector.get_arrays()
+        with pytest.raises(ValueError, match='Arrays in a mini-batch must '
+                                             'have the same length'):
+            collector.collect([np.arange(2), np.arange(3)])
+        collector.collect([np.zeros([2, 3])])
+        with pytest.raises(ValueError, match='Expected 1 arrays in a '
+                                             'mini-batch, got 2'):
+            collector.collect([np.zeros([2, 3]), np.zeros([2, 3])])
+        with pytest.raises(ValueError, match='Shape mismatch'):
+            collector.collect([np.zeros([2, 4])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
+import pickle
 import unittest
 
 import numpy as np
 import pytest
 
 from tfsnippet.dataflow import ArrayFlow, DataFlow
+from tfsnippet.utils import RandomStreams
 
 
 class ArrayFlowTestCase(unittest.TestCase):
@@ -53,6 +55,10 @@ class ArrayFlowTestCase(unittest.TestCase):
         with pytest.raises(
                 ValueError, match='`arrays` must have the same data length'):
             _ = ArrayFlow([np.arange(3), np.arange(4)], 3)
+        with pytest.raises(
+                ValueError, match='`restore_batch_order` can only be True '
+                                  'if `sort_batch_indices` is True'):
+            _ = ArrayFlow([np.arange(3)], 3, restore_batch_order=True)
 
     def test_iterator(self):
         # test single array, without shuffle, no ignore
@@ -84,6 +90,272 @@ class ArrayFlowTestCase(unittest.TestCase):
         self.assertEquals(3, len(b))
         np.testing.assert_array_equal(np.arange(12), sorted(np.concatenate(b)))
 
+    def test_block_shuffle(self):
+        df = ArrayFlow([np.arange(100)], batch_size=7, shuffle='block',
+                       shuffle_chunk_size=10, shuffle_buffer_size=20,
+                       random_state=np.random.RandomState(1234))
+        self.assertTrue(df.is_shuffled)
+        self.assertEquals(10, df.shuffle_chunk_size)
+        self.assertEquals(20, df.shuffle_buffer_size)
+
+        for epoch in range(2):
+            indices = np.concatenate([b[0] for b in df])
+            np.testing.assert_equal(np.arange(100), np.sort(indices))
+            # each buffer should be composed of exactly two chunks
+            for start in range(0, 100, 20):
+                chunks = np.unique(indices[start: start + 20] // 10)
+                self.assertEquals(2, len(chunks))
+
+        # test the last incomplete chunk and buffer
+        df = DataFlow.arrays([np.arange(95)], batch_size=10, shuffle='block',
+                             shuffle_chunk_size=10, shuffle_buffer_size=30)
+        indices = np.concatenate([b[0] for b in df])
+        np.testing.assert_equal(np.arange(95), np.sort(indices))
+
+        # test default options
+        df = ArrayFlow([np.arange(100)], batch_size=7, shuffle='block')
+        self.assertEquals(7, df.shuffle_chunk_size)
+        self.assertEquals(112, df.shuffle_buffer_size)
+        df = ArrayFlow([np.arange(100)], batch_size=7, shuffle=True,
+                       shuffle_chunk_size=10)
+        self.assertIsNone(df.shuffle_chunk_size)
+        self.assertIsNone(df.shuffle_buffer_size)
+
+        # test errors
+        with pytest.raises(ValueError, match='`shuffle` must be one of'):
+            _ = ArrayFlow([np.arange(10)], 3, shuffle='random')
+        with pytest.raises(
+                ValueError, match='`shuffle_chunk_size` must be at least 1'):
+            _ = ArrayFlow([np.arange(10)], 3, shuffle='block',
+                          shuffle_chunk_size=0)
+        with pytest.raises(
+                ValueError, match='`shuffle_buffer_size` must be at least '
+                                  '`shuffle_chunk_size`'):
+            _ = ArrayFlow([np.arange(10)], 3, shuffle='block',
+                          shuffle_chunk_size=4, shuffle_buffer_size=3)
+
+    def test_buffer_pool(self):
+        x = np.arange(24, dtype=np.float32).reshape([12, 2])
+        y = np.arange(12)
+        df = DataFlow.arrays([x, y], batch_size=5, shuffle=True,
+                             buffer_pool_size=2)
+        self.assertEquals(2, df.buffer_pool_size)
+
+        for epoch in range(2):
+            batches = []
+            for bx, by in df:
+                self.assertFalse(bx.flags.writeable)
+                self.assertEquals(np.float32, bx.dtype)
+                np.testing.assert_equal(x[by], bx)
+                batches.append((bx, by))
+            self.assertEquals(3, len(batches))
+            self.assertEquals((2, 2), batches[-1][0].shape)
+            # the buffers are recycled in round-robin
+            self.assertTrue(np.shares_memory(batches[0][0], batches[2][0]))
+            self.assertFalse(np.shares_memory(batches[0][0], batches[1][0]))
+
+        # the buffer pool should not affect un-shuffled flows
+        df = DataFlow.arrays([x, y], batch_size=5, buffer_pool_size=2)
+        b = list(df)
+        self.assertTrue(np.shares_memory(x, b[0][0]))
+
+        with pytest.raises(
+                ValueError, match='`buffer_pool_size` must be at least 1'):
+            _ = ArrayFlow([np.arange(10)], 3, buffer_pool_size=0)
+
+    def test_sort_batch_indices(self):
+        x = np.arange(24, dtype=np.float32).reshape([12, 2])
+        y = np.arange(12)
+
+        # test sorted gathering
+        df = DataFlow.arrays([x, y], batch_size=5, shuffle=True,
+                             sort_batch_indices=True)
+        self.assertTrue(df.sort_batch_indices)
+        self.assertFalse(df.restore_batch_order)
+        batches = list(df)
+        self.assertEquals(3, len(batches))
+        for bx, by in batches:
+            np.testing.assert_equal(np.sort(by), by)
+            np.testing.assert_equal(x[by], bx)
+            self.assertFalse(bx.flags.writeable)
+        np.testing.assert_equal(
+            y, np.sort(np.concatenate([b[1] for b in batches])))
+
+        # test restoring the shuffled order, which should produce exactly
+        # the same mini-batches as the un-sorted gathering
+        kwargs = {'batch_size': 5, 'shuffle': True, 'buffer_pool_size': 2}
+        df1 = DataFlow.arrays([x, y], random_state=np.random.RandomState(1),
+                              **kwargs)
+        df2 = DataFlow.arrays([x, y], random_state=np.random.RandomState(1),
+                              sort_batch_indices=True,
+                              restore_batch_order=True, **kwargs)
+        self.assertTrue(df2.restore_batch_order)
+        for (bx1, by1), (bx2, by2) in zip(df1, df2):
+            np.testing.assert_equal(bx1, bx2)
+            np.testing.assert_equal(by1, by2)
+            self.assertFalse(bx2.flags.writeable)
+
+
+    def test_shard(self):
+        x = np.arange(11)
+        y = np.arange(11, 22)
+
+        # test the interleave mode
+        df = DataFlow.arrays([x, y], batch_size=2, skip_incomplete=True)
+        shards = [df.shard(3, i) for i in range(3)]
+        for i, shard in enumerate(shards):
+            self.assertIsInstance(shard, ArrayFlow)
+            self.assertEquals(2, shard.batch_size)
+            self.assertTrue(shard.skip_incomplete)
+            np.testing.assert_equal(x[i::3], shard.the_arrays[0])
+            np.testing.assert_equal(y[i::3], shard.the_arrays[1])
+        self.assertEquals([4, 4, 3], [s.data_length for s in shards])
+
+        # test the contiguous mode, which should produce views
+        shards = [df.shard(3, i, mode='contiguous') for i in range(3)]
+        self.assertEquals([3, 4, 4], [s.data_length for s in shards])
+        np.testing.assert_equal(
+            x, np.concatenate([s.the_arrays[0] for s in shards]))
+        self.assertIs(x, shards[0].the_arrays[0].base)
+
+        # test the shuffled shards, each epoch should cover the data
+        # exactly once across the shards
+        df = DataFlow.arrays([x, y], batch_size=3, shuffle=True,
+                             buffer_pool_size=2, sort_batch_indices=True)
+        for mode in ('interleave', 'contiguous'):
+            shards = [df.shard(2, i, mode=mode) for i in range(2)]
+            self.assertTrue(shards[0].is_shuffled)
+            self.assertEquals(2, shards[0].buffer_pool_size)
+            self.assertTrue(shards[0].sort_batch_indices)
+            for epoch in range(2):
+                batches = sum([list(s) for s in shards], [])
+                np.testing.assert_equal(
+                    x, np.sort(np.concatenate([b[0] for b in batches])))
+                for bx, by in batches:
+                    np.testing.assert_equal(bx + 11, by)
+
+        # test the block-shuffled shards
+        df = DataFlow.arrays([x], batch_size=3, shuffle='block',
+                             shuffle_chunk_size=2, shuffle_buffer_size=4)
+        shard = df.shard(2, 1, mode='contiguous')
+        self.assertEquals(2, shard.shuffle_chunk_size)
+        self.assertEquals(4, shard.shuffle_buffer_size)
+        np.testing.assert_equal(
+            x[5:], np.sort(np.concatenate([b[0] for b in shard])))
+
+        # sharding into one shard should keep all the data
+        np.testing.assert_equal(x, df.shard(1, 0).the_arrays[0])
+
+    def test_state(self):
+        x = np.arange(11)
+
+        def make_flow(seed, **kwargs):
+            return DataFlow.arrays(
+                [x], batch_size=2, random_state=np.random.RandomState(seed),
+                **kwargs
+            )
+
+        for kwargs in ({}, {'shuffle': True}, {'shuffle': 'block'},
+                       {'shuffle': True, 'skip_incomplete': True}):
+            # interrupt the second epoch after 2 mini-batches
+            df = make_flow(1, **kwargs)
+            _ = list(df)
+            it = iter(df)
+            _ = [next(it), next(it)]
+            state = pickle.loads(pickle.dumps(df.get_state()))
+            self.assertEquals(2, state['position'])
+            expected = list(it) + list(df)
+
+            # resume the second epoch in another flow
+            df2 = make_flow(2, **kwargs)
+            df2.set_state(state)
+            self.assertEquals(2, df2.get_state()['position'])
+            batches = list(df2)
+            self.assertEquals(len(expected) - len(list(df)), len(batches))
+            self.assertEquals(0, df2.get_state()['position'])
+            batches.extend(df2)
+            self.assertEquals(len(expected), len(batches))
+            for a, b in zip(expected, batches):
+                np.testing.assert_equal(a, b)
+
+        # test resuming from the last mini-batch, which should start the
+        # next epoch with the same shuffling
+        df = make_flow(1, shuffle=True)
+        for _ in df:
+            state = df.get_state()
+        expected = list(df)
+        df2 = make_flow(2, shuffle=True)
+        df2.set_state(state)
+        for a, b in zip(expected, list(df2)):
+            np.testing.assert_equal(a, b)
+
+        # test an interrupted epoch
+        df = make_flow(1, shuffle=True)
+        for _ in df:
+            break
+        self.assertEquals(0, df.get_state()['position'])
+
+        with pytest.raises(NotImplementedError,
+                           match='IteratorFactoryFlow does not support '
+                                 'checkpointing'):
+            _ = DataFlow.iterator_factory(lambda: iter([])).get_state()
+
+
+    def test_random_streams(self):
+        x = np.arange(50)
+        streams = RandomStreams(1234)
+
+        def make_flow(**kwargs):
+            return DataFlow.arrays([x], batch_size=8, random_state=streams,
+                                   **kwargs)
+
+        for shuffle in (True, 'block'):
+            # each epoch is shuffled by its own random stream
+            df = make_flow(shuffle=shuffle)
+            epochs = [np.concatenate([b[0] for b in df]) for _ in range(3)]
+            for e in epochs:
+                np.testing.assert_equal(x, np.sort(e))
+            self.assertFalse(np.all(epochs[0] == epochs[1]))
+
+            # the epochs are reproducible, and independent of each other
+            df2 = make_flow(shuffle=shuffle)
+            df2.set_state({'position': 0, 'random_state': 2})
+            np.testing.assert_equal(
+                epochs[2], np.concatenate([b[0] for b in df2]))
+            df2.set_state({'position': 0, 'random_state': 1})
+            np.testing.assert_equal(
+                epochs[1], np.concatenate([b[0] for b in df2]))
+
+        # test the checkpointing, which only saves the epoch counter
+        df = make_flow(shuffle=True)
+        _ = list(df)
+        it = iter(df)
+        _ = [next(it), next(it)]
+        state = df.get_state()
+        self.assertEquals({'position': 2, 'random_state': 1}, state)
+        expected = list(it)
+        df2 = make_flow(shuffle=True)
+        df2.set_state(state)
+        batches = list(df2)
+        self.assertEquals(len(expected), len(batches))
+        for a, b in zip(expected, batches):
+            np.testing.assert_equal(a, b)
+        self.assertEquals({'position': 0, 'random_state': 2},
+                          df2.get_state())
+
+        # each shard uses the child streams
+        df = make_flow(shuffle=True)
+        shards = [df.shard(2, i) for i in range(2)]
+        self.assertEquals(streams.child(0), shards[0]._random_state)
+        self.assertEquals(streams.child(1), shards[1]._random_state)
+        seq_shard = DataFlow.seq(0, 50, batch_size=8, shuffle=True,
+                                 random_state=streams).shard(2, 1)
+        self.assertEquals(streams.child(1), seq_shard._random_state)
+        np.testing.assert_equal(
+            np.concatenate([b[0] for b in shards[1]]),
+            np.concatenate([b[0] for b in seq_shard])
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -50,6 +50,18 @@ class DataFlowTestCase(unittest.TestCase):
         np.testing.assert_equal(np.arange(10), arrays[0])
         np.testing.assert_equal(np.arange(10, 20), arrays[1])
 
+        # test unknown length
+        df = DataFlow.iterator_factory(
+            lambda: ((np.arange(i, i + 3),) for i in range(0, 9, 3)))
+        self.assertIsNone(df.length_hint())
+        np.testing.assert_equal(np.arange(9), df.get_arrays()[0])
+
+        # test length hint with skip_incomplete
+        df2 = DataFlow.arrays([np.arange(10)], batch_size=4,
+                              skip_incomplete=True)
+        self.assertEquals(8, df2.length_hint())
+        np.testing.assert_equal(np.arange(8), df2.get_arrays()[0])
+
         # test to_arrays_flow
         df2 = df.to_arrays_flow(batch_size=6)
         self.assertIsInstance(df2, ArrayFlow)
@@ -70,5 +82,22 @@ class DataFlowTestCase(unittest.TestCase):
         np.testing.assert_equal([[0, 1]], df.current_batch)
 
 
+    def test_shard_errors(self):
+        df = DataFlow.arrays([np.arange(10)], batch_size=3)
+        with pytest.raises(ValueError, match='`num_shards` must be at least 1'):
+            _ = df.shard(0, 0)
+        with pytest.raises(ValueError,
+                           match=r'`index` must be in \[0, num_shards\)'):
+            _ = df.shard(2, 2)
+        with pytest.raises(ValueError,
+                           match=r'`index` must be in \[0, num_shards\)'):
+            _ = df.shard(2, -1)
+        with pytest.raises(ValueError, match='`mode` must be one of'):
+            _ = df.shard(2, 0, mode='xyz')
+        with pytest.raises(NotImplementedError,
+                           match='_DataFlow does not support sharding'):
+            _ = _DataFlow().shard(2, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import DataFlow, BucketedFlow
+
+
+def _make_sequences(lengths):
+    return [np.arange(1, n + 1, dtype=np.int32) * 10 + i
+            for i, n in enumerate(lengths)]
+
+
+class BucketedFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        lengths = [1, 5, 3, 8, 2, 6]
+        x = _make_sequences(lengths)
+        df = DataFlow.bucketed([x], batch_size=2, bucket_boundaries=[3, 6])
+        self.assertIsInstance(df, BucketedFlow)
+        np.testing.assert_equal(lengths, df.lengths)
+        self.assertEquals((3, 6), df.bucket_boundaries)
+        self.assertEquals((2, 2, 2), df.bucket_sizes)
+        self.assertEquals(2, df.batch_size)
+        self.assertFalse(df.is_shuffled)
+        self.assertFalse(df.skip_incomplete)
+        self.assertFalse(df.with_mask)
+
+    def test_errors(self):
+        x = _make_sequences([1, 2, 3])
+        with pytest.raises(ValueError, match='`batch_size` must be at least 1'):
+            _ = BucketedFlow([x], batch_size=0, bucket_boundaries=[2])
+        with pytest.raises(ValueError, match='`sequences` must not be empty'):
+            _ = BucketedFlow([], batch_size=2, bucket_boundaries=[2])
+        with pytest.raises(ValueError, match='`lengths` must be specified'):
+            _ = BucketedFlow([np.zeros([3, 4])], batch_size=2,
+                             bucket_boundaries=[2])
+        with pytest.raises(ValueError, match='`lengths` must be a 1-d array'):
+            _ = BucketedFlow([x], batch_size=2, bucket_boundaries=[2],
+                             lengths=np.zeros([3, 1]))
+        with pytest.raises(ValueError, match='must have the same data length'):
+            _ = BucketedFlow([x], batch_size=2, bucket_boundaries=[2],
+                             aux_arrays=[np.arange(4)])
+        with pytest.raises(ValueError,
+                           match='`bucket_boundaries` must be increasing'):
+            _ = BucketedFlow([x], batch_size=2, bucket_boundaries=[3, 2])
+
+    def test_iterator(self):
+        lengths = [1, 5, 3, 8, 2, 6, 4]
+        x = _make_sequences(lengths)
+        y = np.arange(7)
+        df = DataFlow.bucketed([x], batch_size=2, bucket_boundaries=[3, 6],
+                               aux_arrays=[y], with_mask=True, pad_value=-1)
+        batches = list(df)
+        self.assertEquals([[0, 4], [1, 2], [6], [3, 5]],
+                          [b[1].tolist() for b in batches])
+
+        bx, by, mask = batches[1]
+        np.testing.assert_equal(
+            [[11, 21, 31, 41, 51], [12, 22, 32, -1, -1]], bx)
+        np.testing.assert_equal([[1, 1, 1, 1, 1], [1, 1, 1, 0, 0]], mask)
+        self.assertEquals(np.int32, bx.dtype)
+        self.assertEquals(np.float32, mask.dtype)
+
+        # test skip incomplete
+        df = DataFlow.bucketed([x], batch_size=2, bucket_boundaries=[3, 6],
+                               skip_incomplete=True)
+        self.assertEquals(3, len(list(df)))
+
+    def test_padded_arrays(self):
+        lengths = np.asarray([1, 5, 3, 8, 2, 6, 4])
+        x = np.zeros([7, 8, 2], dtype=np.float32)
+        for i, n in enumerate(lengths):
+            x[i, :n] = i + 1
+        df = DataFlow.bucketed([x, x[..., 0]], batch_size=3,
+                               bucket_boundaries=[4], lengths=lengths,
+                               with_mask=True, mask_dtype=np.bool_)
+        for bx, bx0, mask in df:
+            self.assertEquals(mask.shape[1], bx.shape[1])
+            self.assertEquals(np.bool_, mask.dtype)
+            np.testing.assert_equal(bx[..., 0], bx0)
+            np.testing.assert_equal(mask, bx0 > 0)
+            self.assertEquals(np.max(np.sum(mask, axis=1)), bx.shape[1])
+
+    def test_shuffle(self):
+        lengths = np.random.RandomState(1234).randint(1, 50, size=200)
+        x = _make_sequences(lengths)
+        y = np.arange(200)
+        df = DataFlow.bucketed([x], batch_size=16,
+                               bucket_boundaries=[10, 20, 30, 40],
+                               aux_arrays=[y], shuffle=True,
+                               random_state=np.random.RandomState(1))
+        epochs = []
+        for epoch in range(2):
+            batches = list(df)
+            ids = np.concatenate([b[1] for b in batches])
+            np.testing.assert_equal(y, np.sort(ids))
+            epochs.append(ids)
+            for bx, by in batches:
+                # each mini-batch should come from a single bucket
+                buckets = np.searchsorted([10, 20, 30, 40], lengths[by],
+                                          side='right')
+                self.assertEquals(1, len(set(buckets)))
+                self.assertEquals(np.max(lengths[by]), bx.shape[1])
+                np.testing.assert_equal(bx[:, 0] % 10, by % 10)
+        self.assertFalse(np.all(epochs[0] == epochs[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import BufferPool
+
+
+class BufferPoolTestCase(unittest.TestCase):
+
+    def test_props(self):
+        pool = BufferPool(3, batch_size=4, data_shape=[2], dtype='float32')
+        self.assertEquals(3, pool.pool_size)
+        self.assertEquals(4, pool.batch_size)
+        self.assertEquals((2,), pool.data_shape)
+        self.assertEquals(np.float32, pool.dtype)
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`pool_size` must be at least 1'):
+            _ = BufferPool(0, batch_size=4, data_shape=(), dtype=np.int32)
+        pool = BufferPool(1, batch_size=4, data_shape=(), dtype=np.int32)
+        with pytest.raises(
+                ValueError, match='`size` must not be larger than '
+                                  '`batch_size`: 5 vs 4'):
+            _ = pool.next_buffer(5)
+
+    def test_next_buffer(self):
+        pool = BufferPool(2, batch_size=4, data_shape=(2,), dtype=np.int32)
+        a = pool.next_buffer()
+        b = pool.next_buffer(3)
+        c = pool.next_buffer(2)
+        self.assertEquals((4, 2), a.shape)
+        self.assertEquals((3, 2), b.shape)
+        self.assertEquals((2, 2), c.shape)
+        self.assertEquals(np.int32, a.dtype)
+        self.assertTrue(a.flags.writeable)
+        self.assertFalse(np.shares_memory(a, b))
+        self.assertTrue(np.shares_memory(a, c))
+
+
+if __name__ == '__main__':
+    unittest.main()
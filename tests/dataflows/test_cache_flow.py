@@ -0,0 +1,129 @@
+import os
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import DataFlow, CacheFlow
+from tfsnippet.utils import TemporaryDirectory
+
+
+class _CountingMapper(object):
+
+    def __init__(self):
+        self.counter = 0
+
+    def __call__(self, x):
+        self.counter += 1
+        return x * 2,
+
+
+class CacheFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=3)
+        flow = source.cache()
+        self.assertIsInstance(flow, CacheFlow)
+        self.assertIs(source, flow.source)
+        self.assertIsNone(flow.max_bytes)
+        self.assertIsNone(flow.spill_dir)
+        self.assertFalse(flow.is_cached)
+        self.assertEquals(0, flow.memory_bytes)
+        self.assertEquals(0, flow.spilled_bytes)
+
+        flow = source.cache(max_bytes=100, spill_dir='/tmp')
+        self.assertEquals(100, flow.max_bytes)
+        self.assertEquals('/tmp', flow.spill_dir)
+
+        with pytest.raises(ValueError, match='`max_bytes` must be at least 0'):
+            _ = source.cache(max_bytes=-1)
+
+    def test_cache_in_memory(self):
+        x = np.arange(10, dtype=np.int64)
+        mapper = _CountingMapper()
+        flow = DataFlow.arrays([x], batch_size=3).map(mapper).cache()
+
+        # the interrupted epoch should not be cached
+        for _ in flow:
+            break
+        self.assertFalse(flow.is_cached)
+        self.assertEquals(1, mapper.counter)
+
+        for epoch in range(3):
+            batches = [b[0] for b in flow]
+            self.assertEquals(4, len(batches))
+            np.testing.assert_equal(x * 2, np.concatenate(batches))
+        self.assertTrue(flow.is_cached)
+        self.assertEquals(5, mapper.counter)
+        self.assertEquals(80, flow.memory_bytes)
+        self.assertEquals(0, flow.spilled_bytes)
+
+        # the cached arrays should be read-only
+        with pytest.raises(ValueError):
+            batches[0][0] = 0
+
+        # close should clear the cache
+        flow.close()
+        self.assertFalse(flow.is_cached)
+        self.assertEquals(0, flow.memory_bytes)
+        _ = list(flow)
+        self.assertEquals(9, mapper.counter)
+
+    def test_cache_copies_reused_buffers(self):
+        buf = np.zeros([2], dtype=np.int32)
+
+        def reuse_buffer(x):
+            buf[:len(x)] = x
+            return buf[:len(x)],
+
+        flow = DataFlow.arrays([np.arange(4, dtype=np.int32)], batch_size=2). \
+            map(reuse_buffer).cache()
+        _ = list(flow)
+        np.testing.assert_equal(
+            [0, 1, 2, 3], np.concatenate([b[0] for b in flow]))
+
+    def test_spill(self):
+        x = np.arange(100, dtype=np.float32).reshape([50, 2])
+        y = np.arange(50, dtype=np.int32)
+        mapper = _CountingMapper()
+
+        with TemporaryDirectory() as tmpdir:
+            flow = DataFlow.arrays([x, y], batch_size=8). \
+                map(lambda x, y: mapper(x) + (y,)). \
+                cache(max_bytes=100, spill_dir=tmpdir)
+
+            for epoch in range(3):
+                batches = list(flow)
+                self.assertEquals(7, len(batches))
+                np.testing.assert_equal(
+                    x * 2, np.concatenate([b[0] for b in batches]))
+                np.testing.assert_equal(
+                    y, np.concatenate([b[1] for b in batches]))
+                if epoch == 0:
+                    self.assertEquals(1, len(os.listdir(tmpdir)))
+            self.assertEquals(7, mapper.counter)
+
+            # each mini-batch takes 96 bytes, except for the last one
+            self.assertEquals(96, flow.memory_bytes)
+            self.assertEquals(96 * 5 + 24, flow.spilled_bytes)
+            self.assertIsInstance(batches[-1][0], np.memmap)
+
+            # close should remove the spilled files
+            flow.close()
+            self.assertEquals([], os.listdir(tmpdir))
+
+    def test_spill_everything(self):
+        x = np.arange(10, dtype=np.int32)
+        with TemporaryDirectory() as tmpdir:
+            with DataFlow.arrays([x], batch_size=4). \
+                    cache(max_bytes=0, spill_dir=tmpdir) as flow:
+                for epoch in range(2):
+                    np.testing.assert_equal(
+                        x, np.concatenate([b[0] for b in flow]))
+                self.assertEquals(0, flow.memory_bytes)
+                self.assertEquals(40, flow.spilled_bytes)
+            self.assertEquals([], os.listdir(tmpdir))
+
+
+if __name__ == '__main__':
+    unittest.main()
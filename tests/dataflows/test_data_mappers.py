@@ -4,7 +4,9 @@ import numpy as np
 import pytest
 from mock import Mock
 
-from tfsnippet.dataflow import DataMapper, SlidingWindow
+from tfsnippet.dataflow import (ArrayFlow, BernoulliSampler, CastArrays,
+                                DataFlow, DataMapper, MapperFlow,
+                                SlidingWindow)
 
 
 class DataMapperTestCase(unittest.TestCase):
@@ -51,5 +53,190 @@ class SlidingWindowTestCase(unittest.TestCase):
         )
 
 
+    def test_strided(self):
+        arr = np.arange(26).reshape([13, 2])
+        sw = SlidingWindow(arr, window_size=3, strided=True)
+        self.assertTrue(sw.strided)
+        self.assertIsNone(sw.buffer_pool_size)
+
+        # contiguous windows are zero-copy read-only views
+        out = sw(np.asarray([4, 5, 6]))[0]
+        np.testing.assert_equal(arr[[[4, 5, 6], [5, 6, 7], [6, 7, 8]]], out)
+        self.assertTrue(np.may_share_memory(out, arr))
+        self.assertFalse(out.flags.writeable)
+
+        # non-contiguous windows are gathered
+        out = sw(np.asarray([0, 5, 3]))[0]
+        np.testing.assert_equal(arr[[[0, 1, 2], [5, 6, 7], [3, 4, 5]]], out)
+        self.assertFalse(np.may_share_memory(out, arr))
+
+        # the flow should produce the same windows as the default mode
+        for shuffle in (False, True):
+            batches = list(sw.as_flow(batch_size=4, shuffle=shuffle))
+            self.assertEquals(3, len(batches))
+            for [b] in batches:
+                self.assertEquals((3, 2), b.shape[1:])
+                np.testing.assert_equal(
+                    SlidingWindow(arr, window_size=3)(b[:, 0, 0] // 2)[0], b)
+
+        with pytest.raises(TypeError, match='`data_array` must be a numpy '
+                                            'array if `strided` is True'):
+            _ = SlidingWindow(list(range(13)), window_size=3, strided=True)
+
+    def test_buffer_pool(self):
+        arr = np.arange(13)
+        for strided in (False, True):
+            sw = SlidingWindow(arr, window_size=3, strided=strided,
+                               buffer_pool_size=2)
+            self.assertEquals(2, sw.buffer_pool_size)
+
+            out = [sw(np.asarray([0, 5, 3]))[0], sw(np.asarray([1, 3]))[0],
+                   sw(np.asarray([7, 2, 4]))[0]]
+            np.testing.assert_equal(
+                [[7, 8, 9], [2, 3, 4], [4, 5, 6]], out[2])
+            np.testing.assert_equal([[1, 2, 3], [3, 4, 5]], out[1])
+            self.assertFalse(out[2].flags.writeable)
+            # the buffer of the first batch is recycled by the third batch
+            self.assertTrue(np.may_share_memory(out[0], out[2]))
+
+            # a larger batch re-creates the pool
+            np.testing.assert_equal(
+                [[0, 1, 2], [2, 3, 4], [4, 5, 6], [6, 7, 8]],
+                sw(np.asarray([0, 2, 4, 6]))[0]
+            )
+
+            with pytest.raises(IndexError, match='`indices` out of range'):
+                _ = sw(np.asarray([11, 0]))
+
+        with pytest.raises(ValueError, match='`buffer_pool_size` must be '
+                                             'at least 1'):
+            _ = SlidingWindow(arr, window_size=3, buffer_pool_size=0)
+
+
+class CastArraysTestCase(unittest.TestCase):
+
+    def test_cast(self):
+        x = np.arange(24, dtype=np.uint8).reshape([6, 4])
+        y = np.arange(6, dtype=np.int32)
+
+        # test converting all arrays without scale and shift
+        mapper = CastArrays(np.float32)
+        self.assertEquals(np.float32, mapper.dtype)
+        self.assertIsNone(mapper.scale)
+        self.assertIsNone(mapper.shift)
+        self.assertIsNone(mapper.buffer_pool_size)
+        out_x, out_y = mapper(x, y)
+        self.assertEquals(np.float32, out_x.dtype)
+        self.assertEquals(np.float32, out_y.dtype)
+        np.testing.assert_equal(x, out_x)
+        np.testing.assert_equal(y, out_y)
+
+        # an array already in the data type should not be copied
+        self.assertIs(out_x, CastArrays(np.float32)(out_x)[0])
+
+        # test converting the selected arrays with scale and shift
+        mapper = CastArrays(np.float32, scale=1. / 255, shift=-.5,
+                            indices=[0])
+        out_x, out_y = mapper(x, y)
+        self.assertEquals(np.float32, out_x.dtype)
+        np.testing.assert_allclose(x / 255. - .5, out_x, rtol=1e-6)
+        self.assertIs(y, out_y)
+
+    def test_buffer_pool(self):
+        x = np.arange(24, dtype=np.uint8).reshape([6, 4])
+        mapper = CastArrays(np.float32, scale=2., buffer_pool_size=2)
+        self.assertEquals(2, mapper.buffer_pool_size)
+        outputs = [mapper(x[i: i + 2])[0] for i in range(0, 6, 2)]
+        self.assertFalse(outputs[0].flags.writeable)
+        self.assertEquals(np.float32, outputs[0].dtype)
+        np.testing.assert_equal(x[4:6] * 2., outputs[2])
+        np.testing.assert_equal(x[2:4] * 2., outputs[1])
+        # the first buffer has been recycled for the third mini-batch
+        self.assertIs(outputs[0].base, outputs[2].base)
+        np.testing.assert_equal(x[4:6] * 2., outputs[0])
+
+        # larger mini-batches should re-create the pool
+        np.testing.assert_equal(x * 2., mapper(x)[0])
+
+        with pytest.raises(
+                ValueError, match='`buffer_pool_size` must be at least 1'):
+            _ = CastArrays(np.float32, buffer_pool_size=0)
+
+    def test_flow(self):
+        x = np.arange(10, dtype=np.uint8)
+        y = np.arange(10, dtype=np.int32)
+        flow = DataFlow.arrays([x, y], batch_size=4). \
+            cast(np.float32, scale=.5, indices=[0])
+        self.assertIsInstance(flow, MapperFlow)
+        self.assertIsInstance(flow.source, ArrayFlow)
+        out_x, out_y = flow.get_arrays()
+        self.assertEquals(np.float32, out_x.dtype)
+        np.testing.assert_equal(x * .5, out_x)
+        self.assertEquals(np.int32, out_y.dtype)
+        np.testing.assert_equal(y, out_y)
+
+
+class BernoulliSamplerTestCase(unittest.TestCase):
+
+    def test_sample(self):
+        probs = np.random.uniform(size=[1000, 50]).astype(np.float32)
+        probs[:, 0] = 0.
+        probs[:, 1] = 1.
+        y = np.arange(1000)
+
+        sampler = BernoulliSampler(random_state=np.random.RandomState(1),
+                                   indices=[0])
+        self.assertEquals(np.int32, sampler.dtype)
+        self.assertIsNone(sampler.n_threads)
+        self.assertIsNone(sampler.buffer_pool_size)
+        x, out_y = sampler(probs, y)
+        self.assertIs(y, out_y)
+        self.assertEquals(np.int32, x.dtype)
+        self.assertEquals(probs.shape, x.shape)
+        self.assertTrue(np.all((x == 0) | (x == 1)))
+        np.testing.assert_equal(0, x[:, 0])
+        np.testing.assert_equal(1, x[:, 1])
+        self.assertLess(np.abs(np.mean(x) - np.mean(probs)), .01)
+
+        # test the samples are reproducible with the same random state
+        sampler2 = BernoulliSampler(random_state=np.random.RandomState(1),
+                                    indices=[0])
+        np.testing.assert_equal(x, sampler2(probs, y)[0])
+
+    def test_threads_and_buffer_pool(self):
+        probs = np.random.uniform(size=[1000, 50])
+        sampler = BernoulliSampler(dtype=np.float32, n_threads=4,
+                                   min_thread_size=1000, buffer_pool_size=2,
+                                   random_state=np.random.RandomState(1))
+        self.assertEquals(4, sampler.n_threads)
+        self.assertEquals(2, sampler.buffer_pool_size)
+        outputs = [sampler(probs)[0] for _ in range(3)]
+        for x in outputs:
+            self.assertEquals(np.float32, x.dtype)
+            self.assertFalse(x.flags.writeable)
+            self.assertLess(np.abs(np.mean(x) - np.mean(probs)), .01)
+        self.assertIs(outputs[0].base, outputs[2].base)
+
+        # small mini-batches should be sampled in the caller thread
+        x = sampler(probs[:10])[0]
+        self.assertEquals((10, 50), x.shape)
+
+        # test closing the worker threads
+        self.assertIsNotNone(sampler._thread_pool)
+        sampler.close()
+        self.assertIsNone(sampler._thread_pool)
+        with sampler:
+            x = sampler(probs)[0]
+            self.assertLess(np.abs(np.mean(x) - np.mean(probs)), .01)
+            self.assertIsNotNone(sampler._thread_pool)
+        self.assertIsNone(sampler._thread_pool)
+
+        with pytest.raises(ValueError, match='`n_threads` must be at least 1'):
+            _ = BernoulliSampler(n_threads=0)
+        with pytest.raises(
+                ValueError, match='`buffer_pool_size` must be at least 1'):
+            _ = BernoulliSampler(buffer_pool_size=0)
+
+
 if __name__ == '__main__':
     unittest.main()
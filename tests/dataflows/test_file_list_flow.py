@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import DataFlow, FileListFlow
+from tfsnippet.utils import TemporaryDirectory
+
+
+def save_items(tmpdir, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(tmpdir, '{}.npz'.format(i))
+        np.savez(path, x=np.full([2, 3], i, dtype=np.float32),
+                 y=np.asarray(i, dtype=np.int32))
+        paths.append(path)
+    return paths
+
+
+def load_item(path):
+    with np.load(path) as f:
+        return f['x'], f['y']
+
+
+class FileListFlowTestCase(unittest.TestCase):
+
+    def test_files(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = save_items(tmpdir, 12)
+
+            df = DataFlow.files(paths, load_item, batch_size=5,
+                                n_io_threads=3)
+            self.assertIsInstance(df, FileListFlow)
+            self.assertEqual(tuple(paths), df.paths)
+            self.assertIs(load_item, df.loader)
+            self.assertEqual(2, df.array_count)
+            self.assertEqual(12, df.data_length)
+            self.assertEqual(12, df.length_hint())
+            self.assertEqual(((2, 3), ()), df.data_shapes)
+            self.assertEqual((np.float32, np.int32), df.dtypes)
+            self.assertEqual(5, df.batch_size)
+            self.assertEqual(3, df.n_io_threads)
+            self.assertEqual(1, df.prefetch)
+            self.assertFalse(df.is_shuffled)
+            self.assertFalse(df.skip_incomplete)
+
+            # test iterating without shuffle
+            with df:
+                for epoch in range(2):
+                    b = list(df)
+                    self.assertEqual(3, len(b))
+                    np.testing.assert_equal(np.arange(5), b[0][1])
+                    np.testing.assert_equal(np.arange(10, 12), b[2][1])
+                    for bx, by in b:
+                        self.assertEqual(np.float32, bx.dtype)
+                        np.testing.assert_equal(
+                            bx, np.tile(by.reshape([-1, 1, 1]), [1, 2, 3]))
+
+            # test iterating with shuffle
+            with DataFlow.files(paths, load_item, batch_size=5, shuffle=True,
+                                skip_incomplete=True, prefetch=0) as df:
+                self.assertTrue(df.is_shuffled)
+                self.assertTrue(df.skip_incomplete)
+                self.assertEqual(10, df.length_hint())
+                b = list(df)
+                self.assertEqual(2, len(b))
+                y = np.concatenate([by for _, by in b])
+                self.assertEqual(10, len(np.unique(y)))
+                self.assertFalse(np.all(np.diff(y) == 1))
+
+    def test_single_array_and_threads(self):
+        thread_names = set()
+
+        def loader(path):
+            thread_names.add(threading.current_thread().name)
+            return np.asarray(int(path))
+
+        with DataFlow.files([str(i) for i in range(20)], loader,
+                            batch_size=4, n_io_threads=4, prefetch=2) as df:
+            self.assertEqual(1, df.array_count)
+            self.assertEqual(((),), df.data_shapes)
+            thread_names.clear()
+            b = list(df)
+            np.testing.assert_equal(np.arange(20),
+                                    np.concatenate([bx for bx, in b]))
+            self.assertNotIn(threading.current_thread().name, thread_names)
+            self.assertFalse(b[0][0].flags.writeable)
+
+    def test_buffer_pool(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = save_items(tmpdir, 12)
+            df = DataFlow.files(paths, load_item, batch_size=5)
+            self.assertIsNone(df.buffer_pool_size)
+
+            with DataFlow.files(paths, load_item, batch_size=5, prefetch=2,
+                                buffer_pool_size=2) as df:
+                self.assertEqual(2, df.buffer_pool_size)
+                for epoch in range(2):
+                    ys = []
+                    last = None
+                    for bx, by in df:
+                        ys.append(by.copy())
+                        # the last mini-batch is not yet overwritten
+                        if last is not None:
+                            np.testing.assert_equal(ys[-2], last[1])
+                        last = (bx, by)
+                    np.testing.assert_equal(np.arange(12),
+                                            np.concatenate(ys))
+
+                # the mini-batches are loaded into the pooled buffers
+                pool = df._buffer_pools[1]
+                self.assertEqual(5, pool.pool_size)
+                for _, by in df:
+                    self.assertTrue(any(by.base is buf
+                                        for buf in pool._buffers))
+                    self.assertFalse(by.flags.writeable)
+
+        # test interrupting an epoch, whose submitted mini-batches should
+        # not overwrite the buffers of the next epoch
+        slow_paths = {'5'}
+
+        def slow_loader(path):
+            if path in slow_paths:
+                slow_paths.remove(path)
+                time.sleep(.2)
+            return np.asarray(int(path))
+
+        with DataFlow.files([str(i) for i in range(32)], slow_loader,
+                            batch_size=4, prefetch=0,
+                            buffer_pool_size=4) as df:
+            for _ in df:
+                break
+            ys = []
+            for [by] in df:
+                time.sleep(.05)
+                ys.append(by.copy())
+            np.testing.assert_equal(np.arange(32), np.concatenate(ys))
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`paths` must not be empty'):
+            _ = FileListFlow([], load_item, batch_size=5)
+        with pytest.raises(ValueError, match='`n_io_threads` must be at '
+                                             'least 1'):
+            _ = FileListFlow(['0'], load_item, batch_size=5, n_io_threads=0)
+        with pytest.raises(ValueError, match='`prefetch` must be at least 0'):
+            _ = FileListFlow(['0'], load_item, batch_size=5, prefetch=-1)
+        with pytest.raises(ValueError, match='`buffer_pool_size` must be at '
+                                             'least 1'):
+            _ = FileListFlow(['0'], load_item, batch_size=5,
+                             buffer_pool_size=0)
+
+        def bad_shape(path):
+            return np.zeros([int(path)])
+
+        with DataFlow.files(['1', '1', '2'], bad_shape, batch_size=2) as df:
+            with pytest.raises(ValueError, match='Shape mismatch: expected '
+                                                 'data shape \\(1,\\) from '
+                                                 'file \'2\', got \\(2,\\)'):
+                _ = list(df)
+
+        def bad_count(path):
+            return (np.zeros([1]),) * int(path)
+
+        with DataFlow.files(['1', '2'], bad_count, batch_size=2) as df:
+            with pytest.raises(ValueError, match='Expected 1 arrays from '
+                                                 'file \'2\', got 2'):
+                _ = list(df)
@@ -1,3 +1,4 @@
+import time
 import unittest
 
 import numpy as np
@@ -21,6 +22,80 @@ class GatherFlowTestCase(unittest.TestCase):
         np.testing.assert_equal(np.arange(4, 8), batches[1][0])
         np.testing.assert_equal(np.arange(14, 17), batches[1][1])
 
+    def test_parallel_flow(self):
+        x_flow = DataFlow.arrays([np.arange(10)], batch_size=4)
+        y_flow = DataFlow.arrays([np.arange(10, 17)], batch_size=4)
+        flow = DataFlow.gather([x_flow, y_flow], parallel=True, prefetch=2)
+        self.assertTrue(flow.parallel)
+        self.assertEquals(2, flow.prefetch)
+        self.assertFalse(DataFlow.gather([x_flow]).parallel)
+        for _ in range(2):
+            batches = list(flow)
+            self.assertEquals(2, len(batches))
+            np.testing.assert_equal(np.arange(4), batches[0][0])
+            np.testing.assert_equal(np.arange(10, 14), batches[0][1])
+            np.testing.assert_equal(np.arange(4, 8), batches[1][0])
+            np.testing.assert_equal(np.arange(14, 17), batches[1][1])
+
+        # test the sources are advanced concurrently
+        def slow(*arrays):
+            time.sleep(.1)
+            return arrays
+
+        flow = DataFlow.gather(
+            [x_flow.map(slow), y_flow.map(slow)], parallel=True)
+        start_time = time.time()
+        self.assertEquals(2, len(list(flow)))
+        self.assertLess(time.time() - start_time, .35)
+
+        # test interrupting an epoch
+        flow = DataFlow.gather([x_flow, y_flow], parallel=True)
+        for b in flow:
+            break
+        self.assertEquals(2, len(list(flow)))
+
+    def test_parallel_errors(self):
+        def mapper(x):
+            raise RuntimeError('error from mapper')
+
+        x_flow = DataFlow.arrays([np.arange(10)], batch_size=4)
+        y_flow = DataFlow.arrays([np.arange(10)], batch_size=4).map(mapper)
+        flow = DataFlow.gather([x_flow, y_flow], parallel=True)
+        with pytest.raises(RuntimeError, match='error from mapper'):
+            _ = list(flow)
+        with pytest.raises(ValueError, match='`prefetch` must be at least 1'):
+            _ = DataFlow.gather([x_flow], parallel=True, prefetch=0)
+
+        # the prefetched mini-batches must fit into the buffer pool
+        x_flow = DataFlow.arrays([np.arange(10)], batch_size=3, shuffle=True,
+                                 buffer_pool_size=2)
+        _ = DataFlow.gather([x_flow], prefetch=2)
+        with pytest.raises(ValueError, match='up to 3 of them may be used'):
+            _ = DataFlow.gather([x_flow], parallel=True)
+
+    def test_state(self):
+        for parallel in (False, True):
+            x_flow = DataFlow.arrays([np.arange(10)], batch_size=3,
+                                     shuffle=True)
+            y_flow = DataFlow.arrays([np.arange(10, 20)], batch_size=3,
+                                     shuffle=True)
+            flow = DataFlow.gather([x_flow, y_flow], parallel=parallel)
+            it = iter(flow)
+            _ = next(it)
+            _ = next(it)
+            state = flow.get_state()
+            self.assertEquals(2, state['position'])
+            self.assertEquals([2, 2], [s['position'] for s in state['flows']])
+            expected = list(it)
+
+            flow.set_state(state)
+            self.assertEquals(2, flow.get_state()['position'])
+            batches = list(flow)
+            self.assertEquals(len(expected), len(batches))
+            for a, b in zip(expected, batches):
+                np.testing.assert_equal(a, b)
+            self.assertEquals(0, flow.get_state()['position'])
+
     def test_errors(self):
         with pytest.raises(
                 ValueError, match='At least one flow must be specified'):
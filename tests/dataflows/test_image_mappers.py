@@ -0,0 +1,189 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import (DataFlow, ImageMapper, NormalizeChannels,
+                                RandomCrop, RandomFlip, RandomShift)
+
+
+def naive_crop(images, offset_y, offset_x, height, width):
+    return np.stack([
+        img[y: y + height, x: x + width]
+        for img, y, x in zip(images, offset_y, offset_x)
+    ], axis=0)
+
+
+def nchw(images):
+    return np.transpose(images, [0, 3, 1, 2])
+
+
+class ImageMapperTestCase(unittest.TestCase):
+
+    def test_props(self):
+        m = ImageMapper()
+        self.assertTrue(m.channels_last)
+        self.assertEqual((1, 2), m.spatial_axes)
+        m = ImageMapper(channels_last=False)
+        self.assertFalse(m.channels_last)
+        self.assertEqual((2, 3), m.spatial_axes)
+
+    def test_indices(self):
+        x = np.random.normal(size=[4, 5, 6, 3])
+        y = np.arange(4)
+        m = NormalizeChannels(mean=[1., 2., 3.], std=[1., 1., 1.],
+                              indices=[1])
+        with pytest.raises(ValueError,
+                           match='The images must be 4-d arrays'):
+            _ = m(x, y)
+        out_x, out_y = m(x, x)
+        self.assertIs(out_x, x)
+        np.testing.assert_allclose(out_y, x - [1., 2., 3.], rtol=1e-5)
+
+
+class RandomCropTestCase(unittest.TestCase):
+
+    def test_props(self):
+        m = RandomCrop(3, padding=(1, 2))
+        self.assertEqual((3, 3), m.size)
+        self.assertEqual((1, 2), m.padding)
+        with pytest.raises(ValueError, match='`size` must be an integer or '
+                                             'a pair of integers'):
+            _ = RandomCrop((1, 2, 3))
+
+    def test_crop(self):
+        x = np.random.normal(size=[10, 7, 8, 3]).astype(np.float32)
+        y = np.arange(10)
+        m = RandomCrop((4, 5), padding=(1, 2),
+                       random_state=np.random.RandomState(1234))
+        out_x, out_y = m(x, y)
+        self.assertEqual((10, 4, 5, 3), out_x.shape)
+        self.assertEqual(np.float32, out_x.dtype)
+        self.assertIs(out_y, y)
+
+        # check against cropping the padded images one by one
+        rs = np.random.RandomState(1234)
+        offset_y = rs.randint(0, 6, size=10)
+        offset_x = rs.randint(0, 8, size=10)
+        padded = np.pad(x, [(0, 0), (1, 1), (2, 2), (0, 0)], mode='constant')
+        np.testing.assert_equal(
+            out_x, naive_crop(padded, offset_y, offset_x, 4, 5))
+
+        # channels first
+        m = RandomCrop((4, 5), padding=(1, 2), channels_last=False,
+                       random_state=np.random.RandomState(1234))
+        out_x, = m(nchw(x))
+        self.assertEqual((10, 3, 4, 5), out_x.shape)
+        np.testing.assert_equal(
+            out_x, nchw(naive_crop(padded, offset_y, offset_x, 4, 5)))
+
+    def test_errors(self):
+        m = RandomCrop(6, padding=1)
+        with pytest.raises(ValueError, match='The crop size .* is larger '
+                                             'than the padded images'):
+            _ = m(np.zeros([2, 3, 4, 1]))
+
+
+class RandomShiftTestCase(unittest.TestCase):
+
+    def test_shift(self):
+        x = np.arange(2 * 3 * 4, dtype=np.int32).reshape([2, 3, 4, 1]) + 1
+        m = RandomShift((1, 2), random_state=np.random.RandomState(1234))
+        self.assertEqual((1, 2), m.max_shift)
+        out_x, = m(x)
+        self.assertEqual(x.shape, out_x.shape)
+        self.assertEqual(np.int32, out_x.dtype)
+
+        rs = np.random.RandomState(1234)
+        offset_y = rs.randint(0, 3, size=2)
+        offset_x = rs.randint(0, 5, size=2)
+        padded = np.pad(x, [(0, 0), (1, 1), (2, 2), (0, 0)], mode='constant')
+        np.testing.assert_equal(
+            out_x, naive_crop(padded, offset_y, offset_x, 3, 4))
+
+        # channels first
+        m = RandomShift((1, 2), channels_last=False,
+                        random_state=np.random.RandomState(1234))
+        out_x, = m(nchw(x))
+        np.testing.assert_equal(
+            out_x, nchw(naive_crop(padded, offset_y, offset_x, 3, 4)))
+
+    def test_no_shift(self):
+        x = np.random.normal(size=[3, 4, 5, 2])
+        out_x, = RandomShift(0)(x)
+        np.testing.assert_equal(out_x, x)
+
+
+class RandomFlipTestCase(unittest.TestCase):
+
+    def test_props(self):
+        m = RandomFlip()
+        self.assertTrue(m.horizontal)
+        self.assertFalse(m.vertical)
+        self.assertEqual(.5, m.prob)
+
+    def test_flip(self):
+        x = np.random.normal(size=[20, 3, 4, 2])
+        m = RandomFlip(vertical=True, random_state=np.random.RandomState(1))
+        out_x, = m(x)
+        self.assertEqual(x.shape, out_x.shape)
+        self.assertIsNot(out_x, x)
+
+        rs = np.random.RandomState(1)
+        h_mask = rs.random_sample(20) < .5
+        v_mask = rs.random_sample(20) < .5
+        self.assertTrue(np.any(h_mask) and not np.all(h_mask))
+        expected = []
+        for img, h, v in zip(x, h_mask, v_mask):
+            if h:
+                img = img[:, ::-1]
+            if v:
+                img = img[::-1]
+            expected.append(img)
+        np.testing.assert_equal(out_x, np.stack(expected, axis=0))
+
+        # channels first
+        m = RandomFlip(vertical=True, channels_last=False,
+                       random_state=np.random.RandomState(1))
+        out_x, = m(nchw(x))
+        np.testing.assert_equal(out_x, nchw(np.stack(expected, axis=0)))
+
+    def test_prob(self):
+        x = np.random.normal(size=[5, 3, 4, 2])
+        np.testing.assert_equal(RandomFlip(prob=0.)(x)[0], x)
+        np.testing.assert_equal(RandomFlip(prob=1.)(x)[0], x[:, :, ::-1])
+
+
+class NormalizeChannelsTestCase(unittest.TestCase):
+
+    def test_normalize(self):
+        x = np.random.randint(0, 256, size=[4, 5, 6, 3]).astype(np.uint8)
+        mean = [120., 115., 100.]
+        std = [60., 61., 62.]
+        m = NormalizeChannels(mean, std)
+        self.assertEqual(np.float32, m.dtype)
+        out_x, = m(x)
+        self.assertEqual(np.float32, out_x.dtype)
+        expected = (x.astype(np.float64) - mean) / std
+        np.testing.assert_allclose(out_x, expected, rtol=1e-5)
+
+        # channels first
+        m = NormalizeChannels(mean, std, dtype=np.float64,
+                              channels_last=False)
+        out_x, = m(nchw(x))
+        self.assertEqual(np.float64, out_x.dtype)
+        np.testing.assert_allclose(out_x, nchw(expected))
+
+    def test_chained_flow(self):
+        x = np.random.randint(0, 256, size=[10, 8, 8, 3]).astype(np.uint8)
+        y = np.arange(10)
+        flow = DataFlow.arrays([x, y], batch_size=4). \
+            map(RandomCrop(8, padding=2)). \
+            map(RandomFlip()). \
+            map(NormalizeChannels([128.] * 3, [64.] * 3))
+        batches = list(flow)
+        self.assertEqual(3, len(batches))
+        for (batch_x, batch_y), size in zip(batches, [4, 4, 2]):
+            self.assertEqual((size, 8, 8, 3), batch_x.shape)
+            self.assertEqual(np.float32, batch_x.dtype)
+            self.assertEqual(size, len(batch_y))
@@ -0,0 +1,73 @@
+import time
+import unittest
+
+import numpy as np
+from mock import Mock
+
+from tfsnippet.dataflow import DataFlow, InstrumentedFlow
+
+
+class InstrumentedFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=3)
+        flow = source.instrument('gather')
+        self.assertIsInstance(flow, InstrumentedFlow)
+        self.assertIs(source, flow.source)
+        self.assertEquals('gather', flow.name)
+        self.assertEquals(10, flow.length_hint())
+        self.assertEquals({}, flow.get_metrics())
+
+    def test_metrics(self):
+        def slow(x):
+            time.sleep(.01)
+            return x,
+
+        x = np.arange(10)
+        flow = DataFlow.arrays([x], batch_size=3).map(slow).instrument('map')
+        batches = []
+        for b in flow:
+            batches.append(b[0])
+            time.sleep(.02)
+        np.testing.assert_equal(x, np.concatenate(batches))
+
+        metrics = flow.get_metrics(reset=False)
+        self.assertEquals(
+            {'data/map/wait_sec', 'data/map/produce_sec',
+             'data/map/consume_sec', 'data/map/batches_per_sec'},
+            set(metrics)
+        )
+        self.assertGreaterEqual(metrics['data/map/wait_sec'], .01)
+        self.assertEquals(metrics['data/map/wait_sec'],
+                          metrics['data/map/produce_sec'])
+        self.assertGreaterEqual(metrics['data/map/consume_sec'], .02)
+        self.assertLess(metrics['data/map/batches_per_sec'], 1. / .03)
+        self.assertEquals(metrics, flow.get_metrics())
+        self.assertEquals({}, flow.get_metrics())
+
+    def test_threading_metrics(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=3)
+        with source.threaded(prefetch=2) as threaded:
+            flow = threaded.instrument('prefetch')
+            self.assertEquals(4, len(list(flow)))
+            metrics = flow.get_metrics()
+            self.assertIn('data/prefetch/queue_size', metrics)
+            self.assertGreaterEqual(metrics['data/prefetch/queue_size'], 0.)
+            self.assertLessEqual(metrics['data/prefetch/queue_size'], 2.)
+            self.assertIn('data/prefetch/produce_sec', metrics)
+
+    def test_collect_metrics(self):
+        flow = DataFlow.arrays([np.arange(10)], batch_size=3).instrument('x')
+        loop = Mock()
+        flow.collect_metrics(loop)
+        self.assertFalse(loop.collect_metrics.called)
+
+        _ = list(flow)
+        flow.collect_metrics(loop)
+        metrics = loop.collect_metrics.call_args[0][0]
+        self.assertIn('data/x/batches_per_sec', metrics)
+        self.assertEquals({}, flow.get_metrics())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ import unittest
 import numpy as np
 import pytest
 
-from tfsnippet.dataflow import DataFlow
+from tfsnippet.dataflow import DataFlow, MapperFlow
 
 
 class MapperFlowTestCase(unittest.TestCase):
@@ -48,5 +48,29 @@ class MapperFlowTestCase(unittest.TestCase):
             np.testing.assert_equal([x, z, x], b)
 
 
+    def test_shard(self):
+        x = np.arange(10)
+        flow = DataFlow.arrays([x], batch_size=3).map(lambda x: (x * 2,))
+        shard = flow.shard(2, 1)
+        self.assertIsInstance(shard, MapperFlow)
+        np.testing.assert_equal(x[1::2] * 2, shard.get_arrays()[0])
+        np.testing.assert_equal(x[1::2], shard.source.the_arrays[0])
+
+    def test_state(self):
+        df = DataFlow.arrays([np.arange(10)], batch_size=3, shuffle=True). \
+            map(lambda x: (x * 2,))
+        it = iter(df)
+        _ = next(it)
+        state = df.get_state()
+        self.assertEquals(1, state['position'])
+        expected = list(it)
+
+        df.set_state(state)
+        batches = list(df)
+        self.assertEquals(len(expected), len(batches))
+        for a, b in zip(expected, batches):
+            np.testing.assert_equal(a, b)
+
+
 if __name__ == '__main__':
     unittest.main()
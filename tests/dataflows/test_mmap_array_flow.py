@@ -0,0 +1,80 @@
+import os
+import unittest
+
+import mock
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import DataFlow, MmapArrayFlow
+from tfsnippet.utils import TemporaryDirectory
+
+
+class MmapArrayFlowTestCase(unittest.TestCase):
+
+    def test_npy_files(self):
+        with TemporaryDirectory() as tmpdir:
+            x_path = os.path.join(tmpdir, 'x.npy')
+            y_path = os.path.join(tmpdir, 'y.npy')
+            x = np.arange(12, dtype=np.uint8)
+            y = np.arange(24, dtype=np.float32).reshape([12, 2])
+            np.save(x_path, x)
+            np.save(y_path, y)
+
+            df = DataFlow.npy_files([x_path, y_path], batch_size=5)
+            self.assertIsInstance(df, MmapArrayFlow)
+            self.assertEquals((x_path, y_path), df.paths)
+            self.assertEquals(2, df.array_count)
+            self.assertEquals(12, df.data_length)
+            self.assertEquals(((), (2,)), df.data_shapes)
+            self.assertEquals(5, df.batch_size)
+            self.assertFalse(df.is_shuffled)
+            self.assertFalse(df.skip_incomplete)
+            for a in df.the_arrays:
+                self.assertIsInstance(a, np.memmap)
+
+            # test iterating without shuffle
+            b = list(df)
+            self.assertEquals(3, len(b))
+            np.testing.assert_equal(x[:5], b[0][0])
+            np.testing.assert_equal(y[:5], b[0][1])
+            np.testing.assert_equal(x[10:], b[2][0])
+            np.testing.assert_equal(y[10:], b[2][1])
+            self.assertEquals(np.uint8, b[0][0].dtype)
+            self.assertFalse(b[0][0].flags.writeable)
+
+            # test iterating with shuffle
+            df = DataFlow.npy_files([x_path, y_path], batch_size=5,
+                                    shuffle=True, skip_incomplete=True)
+            self.assertTrue(df.is_shuffled)
+            self.assertTrue(df.skip_incomplete)
+            b = list(df)
+            self.assertEquals(2, len(b))
+            for bx, by in b:
+                np.testing.assert_equal(y[bx], by)
+
+            # release the memory-mapped files before cleanup
+            del df, b
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`paths` must not be empty'):
+            _ = MmapArrayFlow([], batch_size=5)
+
+        with TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'x.npz')
+            np.savez(path, x=np.arange(10))
+            npz_files = []
+
+            def load(*args, **kwargs):
+                npz_files.append(np_load(*args, **kwargs))
+                return npz_files[-1]
+
+            np_load = np.load
+            with mock.patch('numpy.load', load):
+                with pytest.raises(ValueError, match='Not a .npy file'):
+                    _ = MmapArrayFlow([path], batch_size=5)
+            self.assertEqual(1, len(npz_files))
+            self.assertIsNone(npz_files[0].fid)  # the file is closed
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import time
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import (DataFlow, ParallelMapperFlow,
+                                ThreadPoolMapperFlow)
+
+
+class _MyError(Exception):
+    pass
+
+
+def _add_mapper(x, y):
+    return x + y, x * y
+
+
+def _list_mapper(x):
+    return [x * 2]
+
+
+def _bad_output_mapper(x):
+    return x
+
+
+def _error_mapper(x):
+    if np.any(x >= 8):
+        raise _MyError()
+    return x,
+
+
+class ParallelMapperFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=3)
+        flow = source.parallel_map(_list_mapper, n_workers=3)
+        self.assertIsInstance(flow, ParallelMapperFlow)
+        self.assertIs(source, flow.source)
+        self.assertEquals(3, flow.n_workers)
+        self.assertTrue(flow.ordered)
+        self.assertEquals(6, flow.max_in_flight)
+
+        flow = source.parallel_map(_list_mapper, n_workers=2, ordered=False,
+                                   max_in_flight=1)
+        self.assertFalse(flow.ordered)
+        self.assertEquals(1, flow.max_in_flight)
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=3)
+        with pytest.raises(ValueError, match='`n_workers` must be at least 1'):
+            _ = source.parallel_map(_list_mapper, n_workers=0)
+        with pytest.raises(
+                ValueError, match='`max_in_flight` must be at least 1'):
+            _ = source.parallel_map(_list_mapper, n_workers=1,
+                                    max_in_flight=0)
+
+        with source.parallel_map(_bad_output_mapper, n_workers=2) as flow:
+            with pytest.raises(
+                    TypeError, match='The output of the ``mapper`` is '
+                                     'expected to be a tuple or a list'):
+                _ = list(flow)
+
+        with source.parallel_map(_error_mapper, n_workers=2) as flow:
+            with pytest.raises(_MyError):
+                _ = list(flow)
+
+    def test_ordered(self):
+        x = np.arange(100)
+        y = np.arange(100, 200)
+        source = DataFlow.arrays([x, y], batch_size=7)
+        with source.parallel_map(_add_mapper, n_workers=3,
+                                 max_in_flight=4) as flow:
+            for epoch in range(2):
+                batches = list(flow)
+                self.assertEquals(15, len(batches))
+                for i, (a, b) in enumerate(batches):
+                    s = slice(i * 7, (i + 1) * 7)
+                    np.testing.assert_equal(x[s] + y[s], a)
+                    np.testing.assert_equal(x[s] * y[s], b)
+
+            # interrupt an epoch, and the next epoch should start over
+            for a, b in flow:
+                break
+            batches = list(flow)
+            self.assertEquals(15, len(batches))
+            np.testing.assert_equal(x[:7] + y[:7], batches[0][0])
+
+    def test_unordered(self):
+        source = DataFlow.arrays([np.arange(100)], batch_size=7)
+        flow = source.parallel_map(_list_mapper, n_workers=3, ordered=False)
+        try:
+            batches = [b[0] for b in flow]
+            self.assertEquals(15, len(batches))
+            np.testing.assert_equal(
+                np.arange(100) * 2, np.sort(np.concatenate(batches)))
+        finally:
+            flow.close()
+
+        # test auto-init after close
+        batches = [b[0] for b in flow]
+        self.assertEquals(15, len(batches))
+        flow.close()
+
+
+class ThreadPoolMapperFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=3)
+        flow = source.threaded_map(lambda x: (x,), n_workers=3)
+        self.assertIsInstance(flow, ThreadPoolMapperFlow)
+        self.assertIs(source, flow.source)
+        self.assertEquals(3, flow.n_workers)
+        self.assertTrue(flow.ordered)
+        self.assertEquals(6, flow.max_in_flight)
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=3)
+        with source.threaded_map(lambda x: x, n_workers=2) as flow:
+            with pytest.raises(
+                    TypeError, match='The output of the ``mapper`` is '
+                                     'expected to be a tuple or a list'):
+                _ = list(flow)
+
+        with source.threaded_map(_error_mapper, n_workers=2) as flow:
+            with pytest.raises(_MyError):
+                _ = list(flow)
+
+    def test_ordered(self):
+        random_state = np.random.RandomState(1234)
+        delays = random_state.uniform(0., 0.01, size=100)
+
+        def mapper(x):
+            time.sleep(delays[x[0]])
+            return x * 2,
+
+        source = DataFlow.arrays([np.arange(100)], batch_size=7)
+        with source.threaded_map(mapper, n_workers=4) as flow:
+            for epoch in range(2):
+                batches = [b[0] for b in flow]
+                self.assertEquals(15, len(batches))
+                np.testing.assert_equal(
+                    np.arange(100) * 2, np.concatenate(batches))
+
+        flow = source.threaded_map(mapper, n_workers=4, ordered=False)
+        try:
+            batches = [b[0] for b in flow]
+            self.assertEquals(15, len(batches))
+            np.testing.assert_equal(
+                np.arange(100) * 2, np.sort(np.concatenate(batches)))
+        finally:
+            flow.close()
+
+    def test_compose(self):
+        x_flow = DataFlow.arrays([np.arange(10)], batch_size=4). \
+            threaded_map(lambda x: (x * 2,), n_workers=2)
+        y_flow = DataFlow.arrays([np.arange(10, 20)], batch_size=4). \
+            threaded_map(lambda y: (y + 1,), n_workers=2)
+        flow = DataFlow.gather([x_flow, y_flow]).threaded(prefetch=2)
+        try:
+            for epoch in range(2):
+                batches = list(flow)
+                self.assertEquals(3, len(batches))
+                np.testing.assert_equal(
+                    np.arange(10) * 2,
+                    np.concatenate([b[0] for b in batches])
+                )
+                np.testing.assert_equal(
+                    np.arange(11, 21),
+                    np.concatenate([b[1] for b in batches])
+                )
+        finally:
+            flow.close()
+            x_flow.close()
+            y_flow.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
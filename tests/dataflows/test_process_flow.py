@@ -0,0 +1,119 @@
+import time
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import DataFlow, ProcessFlow
+
+
+class _MyError(Exception):
+    pass
+
+
+def _error_mapper(x):
+    if np.any(x >= 8):
+        raise _MyError()
+    return x,
+
+
+class ProcessFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        source = DataFlow.arrays(
+            [np.arange(10, dtype=np.int64),
+             np.zeros([10, 3], dtype=np.float32)],
+            batch_size=4
+        )
+        flow = source.multiprocessed(prefetch=3)
+        self.assertIsInstance(flow, ProcessFlow)
+        self.assertIs(source, flow.source)
+        self.assertEquals(3, flow.prefetch_num)
+        self.assertEquals(4, flow.batch_size)
+        self.assertEquals(((), (3,)), flow.data_shapes)
+        self.assertEquals((np.int64, np.float32), flow.dtypes)
+
+    def test_errors(self):
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        with pytest.raises(
+                ValueError, match='`prefetch_num` must be at least 1'):
+            _ = ProcessFlow(source, prefetch=0)
+        with pytest.raises(
+                ValueError, match='`buffer_pool_size` must be at least 1'):
+            _ = ProcessFlow(source, prefetch=1, buffer_pool_size=0)
+        with pytest.raises(ValueError, match='`dtypes` must be specified'):
+            _ = source.map(lambda x: (x,)).multiprocessed(
+                1, batch_size=2, data_shapes=[()])
+        with pytest.raises(
+                ValueError, match='`data_shapes` must be specified'):
+            _ = source.map(lambda x: (x,)).multiprocessed(
+                1, batch_size=2, dtypes=[np.int32])
+        with pytest.raises(ValueError, match='`batch_size` must be specified'):
+            _ = source.map(lambda x: (x,)).multiprocessed(
+                1, data_shapes=[()], dtypes=[np.int32])
+
+        flow = source.map(_error_mapper).multiprocessed(
+            1, batch_size=2, data_shapes=[()],
+            dtypes=[source.the_arrays[0].dtype]
+        )
+        with flow:
+            with pytest.raises(
+                    RuntimeError, match='ProcessFlow worker process exited '
+                                        'because of error'):
+                _ = list(flow)
+
+    def test_iterator(self):
+        x = np.arange(50, dtype=np.float32)
+        y = np.arange(100).reshape([50, 2])
+        source = DataFlow.arrays([x, y], batch_size=8)
+
+        with source.multiprocessed(prefetch=2) as flow:
+            for epoch in range(2):
+                batches = [tuple(a.copy() for a in b) for b in flow]
+                self.assertEquals(7, len(batches))
+                for i, (a, b) in enumerate(batches):
+                    s = slice(i * 8, (i + 1) * 8)
+                    np.testing.assert_equal(x[s], a)
+                    np.testing.assert_equal(y[s], b)
+
+            # the mini-batches should be read-only
+            for a, b in flow:
+                self.assertFalse(a.flags.writeable)
+                self.assertFalse(b.flags.writeable)
+                break
+
+            # the interrupted epoch should not affect the next epoch
+            batches = [b[0].copy() for b in flow]
+            self.assertEquals(7, len(batches))
+            np.testing.assert_equal(x, np.concatenate(batches))
+
+        # test auto-init
+        flow = source.map(lambda x, y: (x * 2,)).multiprocessed(
+            prefetch=1, batch_size=8, data_shapes=[()], dtypes=[np.float32])
+        try:
+            batches = [b[0].copy() for b in flow]
+            np.testing.assert_equal(x * 2, np.concatenate(batches))
+        finally:
+            flow.close()
+
+    def test_buffer_pool(self):
+        x = np.arange(50, dtype=np.float32)
+        source = DataFlow.arrays([x], batch_size=4)
+        flow = source.multiprocessed(prefetch=2, buffer_pool_size=4)
+        self.assertEquals(1, source.multiprocessed(2).buffer_pool_size)
+        self.assertEquals(4, flow.buffer_pool_size)
+
+        # the mini-batches read ahead by the threaded flow should not be
+        # overwritten
+        with flow, flow.threaded(2) as df:
+            for epoch in range(2):
+                count = 0
+                for i, [a] in enumerate(df):
+                    time.sleep(.01)  # let the threaded flow read ahead
+                    np.testing.assert_equal(x[i * 4: (i + 1) * 4], a)
+                    count += 1
+                self.assertEquals(13, count)
+
+
+if __name__ == '__main__':
+    unittest.main()
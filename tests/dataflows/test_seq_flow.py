@@ -69,5 +69,35 @@ class SeqFlowTestCase(unittest.TestCase):
             np.arange(1, 9, 2), sorted(np.concatenate(b)))
 
 
+    def test_shard(self):
+        df = DataFlow.seq(1, 23, 2, batch_size=3, dtype=np.int64)
+        seq = np.arange(1, 23, 2)
+
+        shards = [df.shard(3, i) for i in range(3)]
+        for i, shard in enumerate(shards):
+            self.assertIsInstance(shard, SeqFlow)
+            self.assertEquals(3, shard.batch_size)
+            self.assertEquals(np.int64, shard.the_arrays[0].dtype)
+            np.testing.assert_equal(seq[i::3], shard.the_arrays[0])
+            np.testing.assert_equal(
+                seq[i::3], np.concatenate([b[0] for b in shard]))
+        self.assertEquals([4, 4, 3], [s.data_length for s in shards])
+        self.assertEquals((3, 23, 6), (shards[1].start, shards[1].stop,
+                                       shards[1].step))
+
+        shards = [df.shard(3, i, mode='contiguous') for i in range(3)]
+        self.assertEquals([3, 4, 4], [s.data_length for s in shards])
+        np.testing.assert_equal(
+            seq, np.concatenate([s.the_arrays[0] for s in shards]))
+
+        df = DataFlow.seq(0, 10, batch_size=3, shuffle=True)
+        shards = [df.shard(2, i) for i in range(2)]
+        self.assertTrue(shards[0].is_shuffled)
+        np.testing.assert_equal(
+            np.arange(10),
+            np.sort(np.concatenate([b[0] for s in shards for b in s]))
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,198 @@
+import os
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import DataFlow, ShardFileFlow
+from tfsnippet.dataflow.shard_file_flow import _sample_distinct
+from tfsnippet.utils import RandomStreams, TemporaryDirectory
+
+
+def save_npz_shards(tmpdir, lengths):
+    paths = []
+    start = 0
+    for i, length in enumerate(lengths):
+        path = os.path.join(tmpdir, 'shard-{}.npz'.format(i))
+        y = np.arange(start, start + length, dtype=np.int32)
+        np.savez(path, y=y, x=np.stack([y, -y], axis=-1).astype(np.float32))
+        paths.append(path)
+        start += length
+    return paths
+
+
+class ShardFileFlowTestCase(unittest.TestCase):
+
+    def test_sample_distinct(self):
+        rs = np.random.RandomState(1234)
+        for n, k in [(10, 10), (10, 6), (1000, 7), (1000, 400)]:
+            s = _sample_distinct(rs, n, k)
+            self.assertEqual(k, len(s))
+            self.assertEqual(k, len(np.unique(s)))
+            self.assertTrue(np.all((s >= 0) & (s < n)))
+
+    def test_props(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = save_npz_shards(tmpdir, [3, 4])
+            df = DataFlow.shard_files(paths, batch_size=2)
+            self.assertIsInstance(df, ShardFileFlow)
+            self.assertEqual(tuple(paths), df.paths)
+            self.assertEqual(2, df.batch_size)
+            self.assertEqual(('y', 'x'), df.keys)
+            self.assertFalse(df.is_shuffled)
+            self.assertFalse(df.skip_incomplete)
+            self.assertEqual(4, df.cycle_length)
+            self.assertEqual(1, df.block_length)
+            self.assertIsNone(df.shuffle_buffer_size)
+            self.assertEqual(1, df.prefetch_shards)
+            self.assertEqual(5, df.n_io_threads)
+            self.assertEqual({}, df.shard_stats)
+
+    def test_interleave(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = save_npz_shards(tmpdir, [3, 4, 0, 2])
+            # shard 0: 0, 1, 2; shard 1: 3, 4, 5, 6; shard 3: 7, 8
+
+            with DataFlow.shard_files(paths, batch_size=4, keys=['x', 'y'],
+                                      cycle_length=2, block_length=2) as df:
+                for epoch in range(2):
+                    b = list(df)
+                    self.assertEqual([4, 4, 1], [len(by) for _, by in b])
+                    y = np.concatenate([by for _, by in b])
+                    np.testing.assert_equal(
+                        [0, 1, 3, 4, 2, 5, 6, 7, 8], y)
+                    for bx, by in b:
+                        np.testing.assert_equal(bx[:, 0], by)
+                        np.testing.assert_equal(bx[:, 1], -by)
+
+                stats = df.shard_stats
+                self.assertEqual(set(paths), set(stats))
+                self.assertEqual(4, stats[paths[1]]['rows'])
+                self.assertEqual(4 * 4 + 4 * 8, stats[paths[1]]['bytes'])
+                self.assertGreaterEqual(stats[paths[1]]['read_sec'], 0.)
+
+            with DataFlow.shard_files(paths, batch_size=4, cycle_length=1,
+                                      skip_incomplete=True,
+                                      prefetch_shards=0) as df:
+                y = np.concatenate([by for by, _ in df])
+                np.testing.assert_equal(np.arange(8), y)
+
+    def test_shuffle(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = save_npz_shards(tmpdir, [10] * 8)
+
+            def get_epoch(seed, **kwargs):
+                with DataFlow.shard_files(
+                        paths, batch_size=7, shuffle=True, cycle_length=3,
+                        random_state=np.random.RandomState(seed),
+                        **kwargs) as df:
+                    return [by for by, _ in df]
+
+            # shuffle the shard order only
+            b = get_epoch(1234)
+            y = np.concatenate(b)
+            np.testing.assert_equal(np.arange(80), np.sort(y))
+            self.assertFalse(np.all(np.diff(y) == 1))
+
+            # shuffle the rows through a buffer
+            b = get_epoch(1234, shuffle_buffer_size=20)
+            self.assertEqual([7] * 11 + [3], [len(by) for by in b])
+            y = np.concatenate(b)
+            np.testing.assert_equal(np.arange(80), np.sort(y))
+
+            # the flow is reproducible with the same seed
+            b2 = get_epoch(1234, shuffle_buffer_size=20)
+            for by, by2 in zip(b, b2):
+                np.testing.assert_equal(by, by2)
+
+            b = get_epoch(1234, shuffle_buffer_size=20, skip_incomplete=True)
+            self.assertEqual([7] * 11, [len(by) for by in b])
+
+            # each epoch uses its own random stream with RandomStreams
+            def get_epochs(streams, n):
+                with DataFlow.shard_files(
+                        paths, batch_size=7, shuffle=True, cycle_length=3,
+                        shuffle_buffer_size=20,
+                        random_state=streams) as df:
+                    return [np.concatenate([by for by, _ in df])
+                            for _ in range(n)]
+
+            epochs = get_epochs(RandomStreams(1234), 2)
+            self.assertFalse(np.all(epochs[0] == epochs[1]))
+            for e, e2 in zip(epochs, get_epochs(RandomStreams(1234), 2)):
+                np.testing.assert_equal(e, e2)
+            df = DataFlow.shard_files(paths, batch_size=7,
+                                      random_state=RandomStreams(1234))
+            self.assertEqual(RandomStreams(1234, [1]),
+                             df.shard(2, 1)._random_state)
+
+    def test_max_shards_in_memory(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = save_npz_shards(tmpdir, [4] * 6)
+            with DataFlow.shard_files(paths, batch_size=1, cycle_length=2,
+                                      prefetch_shards=1) as df:
+                # count the shards submitted for reading
+                submitted = []
+                apply_async = df._pool.apply_async
+
+                def counted_apply_async(func, args):
+                    submitted.append(args[0])
+                    return apply_async(func, args)
+
+                df._pool.apply_async = counted_apply_async
+                it = iter(df)
+                _ = next(it)
+                self.assertEqual(3, len(submitted))
+
+                # each exhausted shard lets one more shard be read
+                for _ in range(6):
+                    _ = next(it)
+                self.assertEqual(3, len(submitted))
+                _ = next(it)
+                self.assertEqual(4, len(submitted))
+
+                self.assertEqual(24 - 8, len(list(it)))
+                self.assertEqual(paths, submitted)
+
+    def test_npy(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = []
+            for i in range(3):
+                paths.append(os.path.join(tmpdir, '{}.npy'.format(i)))
+                np.save(paths[-1], np.arange(i * 5, i * 5 + 5))
+            with DataFlow.shard_files(paths, batch_size=6) as df:
+                self.assertIsNone(df.keys)
+                b = list(df)
+                self.assertEqual([6, 6, 3], [len(bx) for bx, in b])
+                np.testing.assert_equal(
+                    np.arange(15), np.sort(np.concatenate([bx for bx, in b])))
+
+    def test_shard(self):
+        with TemporaryDirectory() as tmpdir:
+            paths = save_npz_shards(tmpdir, [2] * 5)
+            df = DataFlow.shard_files(paths, batch_size=2)
+            self.assertEqual(tuple(paths[1::2]),
+                             df.shard(2, 1).paths)
+            self.assertEqual(tuple(paths[:2]),
+                             df.shard(2, 0, mode='contiguous').paths)
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`paths` must not be empty'):
+            _ = ShardFileFlow([], batch_size=2)
+        with pytest.raises(ValueError, match='`cycle_length` must be at '
+                                             'least 1'):
+            _ = ShardFileFlow(['a.npy'], batch_size=2, cycle_length=0)
+        with pytest.raises(ValueError, match='`block_length` must be at '
+                                             'least 1'):
+            _ = ShardFileFlow(['a.npy'], batch_size=2, block_length=0)
+        with pytest.raises(ValueError, match='`shuffle_buffer_size` must be '
+                                             'at least `batch_size`'):
+            _ = ShardFileFlow(['a.npy'], batch_size=2, shuffle_buffer_size=1)
+
+        with TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'bad.npz')
+            np.savez(path, x=np.arange(3), y=np.arange(4))
+            with DataFlow.shard_files([path], batch_size=2) as df:
+                with pytest.raises(ValueError, match='must be at least 1-d, '
+                                                     'with the same length'):
+                    _ = list(df)
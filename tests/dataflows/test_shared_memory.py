@@ -0,0 +1,117 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import SharedMemoryRingBuffer
+
+
+class SharedMemoryRingBufferTestCase(unittest.TestCase):
+
+    def test_props(self):
+        ring = SharedMemoryRingBuffer(
+            n_slots=3, batch_size=4, data_shapes=[[2], ()],
+            dtypes=['float32', np.int64]
+        )
+        self.assertEquals(3, ring.n_slots)
+        self.assertEquals(4, ring.batch_size)
+        self.assertEquals(((2,), ()), ring.data_shapes)
+        self.assertEquals((np.dtype(np.float32), np.dtype(np.int64)),
+                          ring.dtypes)
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`n_slots` must be at least 1'):
+            _ = SharedMemoryRingBuffer(0, 4, [()], [np.int32])
+        with pytest.raises(
+                ValueError, match='`batch_size` must be at least 1'):
+            _ = SharedMemoryRingBuffer(1, 0, [()], [np.int32])
+        with pytest.raises(
+                ValueError, match='`data_shapes` and `dtypes` must have the '
+                                  'same length'):
+            _ = SharedMemoryRingBuffer(1, 4, [()], [np.int32, np.int32])
+        with pytest.raises(
+                ValueError, match='`n_held_slots` must be at least 1, and at '
+                                  'most `n_slots`'):
+            _ = SharedMemoryRingBuffer(1, 4, [()], [np.int32], n_held_slots=2)
+
+        ring = SharedMemoryRingBuffer(1, 4, [(2,)], [np.int32])
+        with pytest.raises(ValueError, match='Expected 1 arrays, but got 2'):
+            ring.put([np.zeros([4, 2]), np.zeros([4, 2])])
+        with pytest.raises(
+                ValueError, match='The mini-batch size 5 exceeds the slot '
+                                  'size 4'):
+            ring.put([np.zeros([5, 2])])
+        with pytest.raises(
+                ValueError, match='The shape of the array .* does not match '
+                                  'the data shape'):
+            ring.put([np.zeros([4, 3])])
+
+    def test_put_and_get(self):
+        ring = SharedMemoryRingBuffer(
+            n_slots=2, batch_size=4, data_shapes=[(2,), ()],
+            dtypes=[np.float32, np.int64]
+        )
+        x = np.arange(16, dtype=np.float32).reshape([8, 2])
+        y = np.arange(8)
+
+        ring.put([x[:4], y[:4]], tag=1)
+        ring.put([x[4:7], y[4:7]], tag=2)
+        ring.put_message(3, 'hello')
+
+        tag, (a, b), size = ring.get()
+        self.assertEquals(1, tag)
+        self.assertEquals(4, size)
+        np.testing.assert_equal(x[:4], a)
+        np.testing.assert_equal(y[:4], b)
+        self.assertEquals(np.float32, a.dtype)
+        self.assertFalse(a.flags.writeable)
+        self.assertFalse(b.flags.writeable)
+
+        tag, (a2, b2), size = ring.get()
+        self.assertEquals(2, tag)
+        self.assertEquals(3, size)
+        np.testing.assert_equal(x[4:7], a2)
+        np.testing.assert_equal(y[4:7], b2)
+
+        # the previous slot should have been recycled
+        ring.put([x[:1] + 100, y[:1] + 100])
+        np.testing.assert_equal(x[:1] + 100, a[:1])
+
+        tag, arrays, payload = ring.get()
+        self.assertEquals(3, tag)
+        self.assertIsNone(arrays)
+        self.assertEquals('hello', payload)
+
+        # drain the remaining mini-batch
+        ring.drain()
+        ring.put([x[:4], y[:4]])
+        ring.put([x[:4], y[:4]])
+
+    def test_held_slots(self):
+        ring = SharedMemoryRingBuffer(
+            n_slots=3, batch_size=2, data_shapes=[()], dtypes=[np.int32],
+            n_held_slots=2
+        )
+        self.assertEquals(2, ring.n_held_slots)
+        for i in range(3):
+            ring.put([np.array([i, i])])
+        (a,) = ring.get()[1]
+        (b,) = ring.get()[1]
+        (c,) = ring.get()[1]
+
+        # only the slot of the earliest mini-batch should have been recycled
+        ring.put([np.array([3, 3])])
+        np.testing.assert_equal([3, 3], a)
+        np.testing.assert_equal([1, 1], b)
+        np.testing.assert_equal([2, 2], c)
+
+        # release all the held slots
+        ring.release()
+        ring.put([np.array([4, 4])])
+        ring.put([np.array([5, 5])])
+        self.assertEquals([3, 4, 5], [int(ring.get()[1][0][0])
+                                      for _ in range(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,16 @@ import unittest
 
 import numpy as np
 import pytest
+import six
 import time
 
 from tfsnippet.dataflow import DataFlow, ThreadingFlow
 
+if six.PY2:
+    from Queue import Queue
+else:
+    from queue import Queue
+
 
 class _MyError(Exception):
     pass
@@ -19,11 +25,131 @@ class ThreadingFlowTestCase(unittest.TestCase):
             _ = ThreadingFlow(DataFlow.arrays([np.arange(10)], batch_size=2),
                               prefetch=0)
 
+        source = DataFlow.arrays([np.arange(10)], batch_size=2)
+        with pytest.raises(
+                ValueError, match='`prefetch` must be an integer or "auto"'):
+            _ = ThreadingFlow(source, prefetch='xyz')
+        with pytest.raises(
+                ValueError, match='`max_prefetch` must be at least 1'):
+            _ = ThreadingFlow(source, prefetch='auto', max_prefetch=0)
+        with pytest.raises(
+                ValueError, match='`max_prefetch` and `max_prefetch_bytes` '
+                                  'can only be specified if `prefetch` is '
+                                  '"auto"'):
+            _ = ThreadingFlow(source, prefetch=2, max_prefetch=3)
+
+        # the prefetched mini-batches must fit into the buffer pool
+        source = DataFlow.arrays([np.arange(10)], batch_size=2, shuffle=True,
+                                 buffer_pool_size=3)
+        with pytest.raises(
+                ValueError, match='recycles its mini-batches in '
+                                  '`buffer_pool_size` = 3 buffers, but up to '
+                                  '4 of them may be used at the same time'):
+            _ = ThreadingFlow(source, prefetch=2)
+        self.assertEquals(1, ThreadingFlow(source, prefetch=1).prefetch_num)
+        flow = ThreadingFlow(source, prefetch='auto')
+        self.assertEquals(1, flow.prefetch_num)
+        self.assertEquals(1, flow.max_prefetch)
+        flow = ThreadingFlow(
+            DataFlow.arrays([np.arange(10)], batch_size=2, shuffle=True,
+                            buffer_pool_size=8),
+            prefetch='auto'
+        )
+        self.assertEquals(6, flow.max_prefetch)
+        with pytest.raises(ValueError, match='up to 3 of them may be used'):
+            _ = ThreadingFlow(
+                DataFlow.arrays([np.arange(10)], batch_size=2, shuffle=True,
+                                buffer_pool_size=2),
+                prefetch='auto'
+            )
+
     def test_threaded(self):
         flow = DataFlow.arrays([np.arange(10)], batch_size=2). \
             threaded(prefetch=3)
         self.assertIsInstance(flow, ThreadingFlow)
         self.assertEquals(3, flow.prefetch_num)
+        self.assertFalse(flow.is_auto_prefetch)
+        self.assertIsNone(flow.max_prefetch)
+        self.assertIsNone(flow.max_prefetch_bytes)
+        self.assertEquals(0, flow.batch_count)
+        self.assertEquals(0, flow.stall_count)
+        self.assertEquals(0., flow.stall_time)
+        self.assertIsNone(flow.producer_time)
+        self.assertIsNone(flow.consumer_time)
+
+        flow = DataFlow.arrays([np.arange(10)], batch_size=2). \
+            threaded(prefetch='auto')
+        self.assertTrue(flow.is_auto_prefetch)
+        self.assertEquals(2, flow.prefetch_num)
+        self.assertEquals(32, flow.max_prefetch)
+        self.assertIsNone(flow.max_prefetch_bytes)
+
+        flow = DataFlow.arrays([np.arange(10)], batch_size=2). \
+            threaded(prefetch='auto', max_prefetch=1, max_prefetch_bytes=100)
+        self.assertEquals(1, flow.prefetch_num)
+        self.assertEquals(1, flow.max_prefetch)
+        self.assertEquals(100, flow.max_prefetch_bytes)
+
+    def test_statistics(self):
+        with DataFlow.arrays([np.arange(10)], batch_size=2). \
+                threaded(prefetch=2) as flow:
+            for epoch in range(2):
+                for _ in flow:
+                    time.sleep(.01)
+            self.assertEquals(10, flow.batch_count)
+            self.assertLessEqual(flow.stall_count, 10)
+            self.assertGreater(flow.consumer_time, .005)
+            self.assertLess(flow.producer_time, flow.consumer_time)
+            self.assertEquals(2, flow.prefetch_num)
+
+    def test_auto_prefetch_grow(self):
+        def make_flow(**kwargs):
+            flow = DataFlow.seq(0, 10, batch_size=1). \
+                threaded(prefetch='auto', **kwargs)
+            flow._batch_queue = Queue(flow.prefetch_num)
+            # the source flow is as fast as the consumer on average
+            flow._producer_time = flow._consumer_time = .01
+            flow._batch_bytes = 8
+            return flow
+
+        # a stall caused by the jitter of the source flow should grow the
+        # prefetch number, while getting a prefetched mini-batch should not
+        flow = make_flow(max_prefetch=4)
+        flow._adjust_prefetch(stalled=True, queue_size=0)
+        self.assertEquals(3, flow.prefetch_num)
+        self.assertEquals(3, flow._batch_queue.maxsize)
+        flow._adjust_prefetch(stalled=False, queue_size=1)
+        self.assertEquals(3, flow.prefetch_num)
+
+        # a stall caused by a slower source flow should not grow it
+        flow._producer_time = .02
+        flow._adjust_prefetch(stalled=True, queue_size=0)
+        self.assertEquals(3, flow.prefetch_num)
+
+        # the prefetch number should be limited by `max_prefetch`
+        flow._producer_time = .01
+        for _ in range(3):
+            flow._adjust_prefetch(stalled=True, queue_size=0)
+        self.assertEquals(4, flow.prefetch_num)
+        self.assertEquals(4, flow._batch_queue.maxsize)
+
+        # the memory bound should limit the prefetch number
+        flow = make_flow(max_prefetch=8, max_prefetch_bytes=24)
+        for _ in range(5):
+            flow._adjust_prefetch(stalled=True, queue_size=0)
+        self.assertEquals(3, flow.prefetch_num)
+
+    def test_auto_prefetch_shrink(self):
+        # the source flow is much faster than the consumer,
+        # thus the prefetched mini-batches are never used
+        source = DataFlow.seq(0, 100, batch_size=1)
+        with source.threaded(prefetch='auto', max_prefetch=8) as flow:
+            flow.AUTO_SHRINK_WINDOW = 8
+            flow._set_queue_size(8)
+            for _ in flow:
+                time.sleep(.002)
+            self.assertLessEqual(flow.prefetch_num, 2)
+            self.assertLess(flow.stall_count, 10)
 
     def test_iterator(self):
         epoch_counter = [0]
@@ -91,6 +217,29 @@ class ThreadingFlowTestCase(unittest.TestCase):
                 self.assertTrue((560 + i * 2 == a[0]) or (660 + i * 2 == a[0]))
                 self.assertTrue((561 + i * 2 == a[1]) or (661 + i * 2 == a[1]))
 
+    def test_state(self):
+        source = DataFlow.arrays([np.arange(20)], batch_size=3, shuffle=True)
+        with source.threaded(prefetch=5) as df:
+            it = iter(df)
+            _ = next(it)
+            _ = next(it)
+            time.sleep(.1)  # let the worker go ahead
+            state = df.get_state()
+            self.assertEquals(2, state['position'])
+            expected = list(it)
+            self.assertEquals(0, df.get_state()['position'])
+
+            df.set_state(state)
+            batches = list(df)
+            self.assertEquals(len(expected), len(batches))
+            for a, b in zip(expected, batches):
+                np.testing.assert_equal(a, b)
+
+        with pytest.raises(NotImplementedError,
+                           match='does not support checkpointing'):
+            _ = DataFlow.iterator_factory(lambda: iter([])). \
+                threaded(prefetch=1).get_state()
+
     def test_auto_init(self):
         epoch_counter = [0]
 
@@ -0,0 +1,136 @@
+import unittest
+
+import numpy as np
+import pytest
+
+from tfsnippet.dataflow import DataFlow, WeightedFlow
+from tfsnippet.dataflow.weighted_flow import _build_alias_table
+
+
+def _alias_probs(prob, alias):
+    n = len(prob)
+    ret = prob / n
+    np.add.at(ret, alias, (1. - prob) / n)
+    return ret
+
+
+class BuildAliasTableTestCase(unittest.TestCase):
+
+    def test_build_alias_table(self):
+        random_state = np.random.RandomState(1234)
+        for i in range(200):
+            n = random_state.randint(1, 50)
+            if i % 3 == 0:
+                weights = random_state.exponential(size=n)
+            elif i % 3 == 1:
+                weights = random_state.randint(0, 3, size=n).astype(np.float64)
+            else:
+                weights = random_state.pareto(.5, size=n)
+            if np.sum(weights) == 0:
+                continue
+            prob, alias = _build_alias_table(weights)
+            self.assertTrue(np.all(prob >= 0.))
+            self.assertTrue(np.all(prob <= 1.))
+            np.testing.assert_allclose(
+                weights / np.sum(weights), _alias_probs(prob, alias),
+                atol=1e-9
+            )
+
+        # test all zero weights
+        prob, alias = _build_alias_table(np.zeros(3))
+        np.testing.assert_equal([1, 1, 1], prob)
+        np.testing.assert_equal([0, 1, 2], alias)
+
+
+class WeightedFlowTestCase(unittest.TestCase):
+
+    def test_props(self):
+        x = np.arange(10)
+        df = DataFlow.weighted([x], weights=np.ones(10), batch_size=3)
+        self.assertIsInstance(df, WeightedFlow)
+        self.assertEquals((x,), df.the_arrays)
+        self.assertEquals(1, df.array_count)
+        self.assertEquals(10, df.data_length)
+        self.assertEquals(3, df.batch_size)
+        self.assertEquals(4, df.steps_per_epoch)
+        self.assertFalse(df.return_indices)
+        self.assertEquals(2, df.block_size)
+        np.testing.assert_equal(np.ones(10), df.weights)
+
+        df = DataFlow.weighted([x], weights=np.ones(10), batch_size=3,
+                               steps_per_epoch=7, return_indices=True,
+                               block_size=5)
+        self.assertEquals(7, df.steps_per_epoch)
+        self.assertTrue(df.return_indices)
+        self.assertEquals(5, df.block_size)
+
+    def test_errors(self):
+        x = np.arange(10)
+        with pytest.raises(ValueError, match='`arrays` must not be empty'):
+            _ = WeightedFlow([], np.ones(10), batch_size=3)
+        with pytest.raises(ValueError, match='`arrays` must not be empty'):
+            _ = WeightedFlow([np.zeros([0])], np.ones(0), batch_size=3)
+        with pytest.raises(ValueError,
+                           match='`arrays` must have the same data length'):
+            _ = WeightedFlow([x, x[:5]], np.ones(10), batch_size=3)
+        with pytest.raises(ValueError, match='`batch_size` must be at least 1'):
+            _ = WeightedFlow([x], np.ones(10), batch_size=0)
+        with pytest.raises(ValueError,
+                           match='`steps_per_epoch` must be at least 1'):
+            _ = WeightedFlow([x], np.ones(10), batch_size=3,
+                             steps_per_epoch=0)
+        with pytest.raises(ValueError, match='`block_size` must be at least 1'):
+            _ = WeightedFlow([x], np.ones(10), batch_size=3, block_size=0)
+        with pytest.raises(ValueError, match='`weights` must be non-negative'):
+            _ = WeightedFlow([x], -np.ones(10), batch_size=3)
+        with pytest.raises(ValueError,
+                           match='The sum of `weights` must be positive'):
+            _ = WeightedFlow([x], np.zeros(10), batch_size=3)
+
+        df = WeightedFlow([x], np.ones(10), batch_size=3)
+        with pytest.raises(IndexError, match='`indices` out of range'):
+            df.update_weights([10], 1.)
+        with pytest.raises(ValueError,
+                           match='The sum of `weights` must be positive'):
+            df.update_weights(np.arange(10), 0.)
+        np.testing.assert_equal(np.ones(10), df.weights)
+
+    def test_sampling(self):
+        x = np.arange(20)
+        y = np.arange(20, 40)
+        weights = np.arange(20, dtype=np.float64) % 5
+        df = DataFlow.weighted([x, y], weights=weights, batch_size=1000,
+                               steps_per_epoch=20, return_indices=True,
+                               block_size=3,
+                               random_state=np.random.RandomState(1234))
+        batches = list(df)
+        self.assertEquals(20, len(batches))
+        for bx, by, idx in batches:
+            self.assertEquals((1000,), bx.shape)
+            np.testing.assert_equal(x[idx], bx)
+            np.testing.assert_equal(y[idx], by)
+
+        idx = np.concatenate([b[2] for b in batches])
+        freq = np.bincount(idx, minlength=20) / float(len(idx))
+        np.testing.assert_allclose(weights / np.sum(weights), freq, atol=.01)
+
+    def test_update_weights(self):
+        x = np.arange(20)
+        df = DataFlow.weighted([x], weights=np.ones(20), batch_size=1000,
+                               steps_per_epoch=20, block_size=4,
+                               random_state=np.random.RandomState(1234))
+        df.update_weights([0, 1, 2, 17], [0., 0., 10., 5.])
+        df.update_weights(np.arange(8, 12), 0.)
+        weights = np.ones(20)
+        weights[[0, 1, 2, 17]] = [0., 0., 10., 5.]
+        weights[8: 12] = 0.
+        np.testing.assert_equal(weights, df.weights)
+
+        idx = np.concatenate([b[0] for b in df])
+        freq = np.bincount(idx, minlength=20) / float(len(idx))
+        np.testing.assert_allclose(weights / np.sum(weights), freq, atol=.01)
+        self.assertEquals(0, np.sum(np.isin(idx, [0, 1, 8, 9, 10, 11])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -80,6 +80,24 @@ class BaseTrainerTestCase(tf.test.TestCase):
         self.assertEquals('HookList()', repr(t.after_steps))
         self.assertEquals('HookList()', repr(t.after_epochs))
 
+    def test_data_metrics_hooks(self):
+        loop = Mock(valid_metric_name='valid_loss')
+        flow1, flow2 = Mock(), Mock()
+        t = BaseTrainer(loop)
+        t.collect_data_metrics_after_steps([flow1], 1)
+        t.collect_data_metrics_after_epochs([flow1, flow2], 1)
+
+        t.after_steps.call_hooks()
+        flow1.collect_metrics.assert_called_once_with(loop)
+        self.assertFalse(flow2.collect_metrics.called)
+        t.after_epochs.call_hooks()
+        self.assertEquals(2, flow1.collect_metrics.call_count)
+        flow2.collect_metrics.assert_called_once_with(loop)
+
+        self.assertEquals(2, t.remove_data_metrics_hooks())
+        self.assertEquals('HookList()', repr(t.after_steps))
+        self.assertEquals('HookList()', repr(t.after_epochs))
+
     def test_run(self):
         with self.test_session() as session:
             df = DataFlow.arrays([np.arange(6, dtype=np.float32)], batch_size=4)
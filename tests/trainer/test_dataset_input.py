@@ -0,0 +1,99 @@
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from tfsnippet.dataflow import DataFlow
+from tfsnippet.trainer import DatasetInput
+
+
+class DataFlowToTFDatasetTestCase(tf.test.TestCase):
+
+    def test_to_tf_dataset(self):
+        x = np.arange(10, dtype=np.float32)
+        y = np.arange(10, 20, dtype=np.int32)
+        df = DataFlow.arrays([x, y], batch_size=4)
+
+        # test without mark_last
+        dataset = df.to_tf_dataset([tf.float32, tf.int32], [[None], [None]],
+                                   prefetch=2)
+        iterator = dataset.make_initializable_iterator()
+        batch_x, batch_y = iterator.get_next()
+        self.assertEquals([None], batch_x.get_shape().as_list())
+
+        with self.test_session() as sess:
+            for epoch in range(2):
+                sess.run(iterator.initializer)
+                for i in range(3):
+                    a, b = sess.run([batch_x, batch_y])
+                    np.testing.assert_equal(x[i * 4: (i + 1) * 4], a)
+                    np.testing.assert_equal(y[i * 4: (i + 1) * 4], b)
+                with self.assertRaises(tf.errors.OutOfRangeError):
+                    _ = sess.run(batch_x)
+
+        # test with mark_last
+        dataset = df.to_tf_dataset([tf.float32, tf.int32], mark_last=True)
+        iterator = dataset.make_initializable_iterator()
+        batch_x, batch_y, is_last = iterator.get_next()
+        self.assertEquals([], is_last.get_shape().as_list())
+
+        with self.test_session() as sess:
+            sess.run(iterator.initializer)
+            self.assertEquals(
+                [False, False, True],
+                [bool(sess.run(is_last)) for _ in range(3)]
+            )
+
+        # test with mark_last on a flow which reuses the mini-batch memory
+        df = DataFlow.arrays([x, y], batch_size=4, shuffle=True,
+                             buffer_pool_size=1)
+        dataset = df.to_tf_dataset([tf.float32, tf.int32], mark_last=True)
+        iterator = dataset.make_initializable_iterator()
+        batch_x, batch_y, is_last = iterator.get_next()
+
+        with self.test_session() as sess:
+            sess.run(iterator.initializer)
+            batches = [sess.run([batch_x, batch_y]) for _ in range(3)]
+            np.testing.assert_equal(
+                x, np.sort(np.concatenate([a for a, _ in batches])))
+            for a, b in batches:
+                np.testing.assert_equal(a + 10, b)
+
+
+class DatasetInputTestCase(tf.test.TestCase):
+
+    def test_props(self):
+        df = DataFlow.arrays([np.arange(10, dtype=np.int32)], batch_size=4)
+        d = DatasetInput(df, [tf.int32], [[None]])
+        self.assertIs(df, d.data_flow)
+        self.assertEquals(1, len(d.inputs))
+        self.assertEquals(tf.int32, d.inputs[0].dtype)
+        self.assertIsInstance(d.initializer, tf.Operation)
+
+    def test_iter_epoch(self):
+        x = np.arange(10, dtype=np.int32)
+        df = DataFlow.arrays([x], batch_size=4)
+        d = DatasetInput(df, [tf.int32], [[None]], prefetch=2)
+        [input_x] = d.inputs
+        output = input_x * 2
+
+        with self.test_session() as sess:
+            for epoch in range(2):
+                values = []
+                for _ in d.iter_epoch(sess):
+                    values.append(d.run_batch(sess, output))
+                self.assertEquals(3, len(values))
+                np.testing.assert_equal(x * 2, np.concatenate(values))
+
+        # test empty data flow
+        df = DataFlow.arrays([np.arange(0, dtype=np.int32)], batch_size=4)
+        d = DatasetInput(df, [tf.int32], [[None]])
+        with self.test_session() as sess:
+            values = []
+            for _ in d.iter_epoch(sess):
+                values.append(d.run_batch(sess, d.inputs[0]))
+            self.assertEquals([None], values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -102,6 +102,54 @@ class EvaluatorTestCase(tf.test.TestCase):
                     self.assertEquals(56, call_feed_dict[ph2])
                     self.assertNotIn(ph3, call_feed_dict)
 
+    def test_run_dataset_input(self):
+        df = DataFlow.arrays([np.arange(6, dtype=np.float32)], batch_size=4)
+        data_input = DatasetInput(df, [tf.float32], [[None]])
+        [input_x] = data_input.inputs
+        ph = tf.placeholder(tf.float32, shape=[])
+
+        with pytest.raises(ValueError, match='`inputs` must be empty when '
+                                             '`data_flow` is a `DatasetInput`'):
+            _ = Evaluator(Mock(), tf.reduce_mean(input_x), [input_x],
+                          data_input)
+
+        with self.test_session():
+            # test default loss weight and feed dict
+            with TrainLoop([], max_epoch=1) as loop:
+                v = Evaluator(loop, tf.reduce_mean(input_x) + ph, [],
+                              data_input, feed_dict={ph: 1.})
+                for epoch in loop.iter_epochs():
+                    v.run()
+                    np.testing.assert_almost_equal(
+                        3.5, v.last_metrics_dict['valid_loss'])
+                    v.run({ph: 2.})
+                    np.testing.assert_almost_equal(
+                        4.5, v.last_metrics_dict['valid_loss'])
+
+            # test None loss weight
+            with TrainLoop([], max_epoch=1) as loop:
+                v = Evaluator(loop, tf.reduce_mean(input_x), [], data_input,
+                              batch_weight_func=None)
+                for epoch in loop.iter_epochs():
+                    v.run()
+                    np.testing.assert_almost_equal(
+                        3.0, v.last_metrics_dict['valid_loss'])
+
+            # test custom loss weight
+            batch_weight_func = Mock(wraps=lambda x: x[0] + 1.)
+            with TrainLoop([], max_epoch=1) as loop:
+                v = Evaluator(loop, tf.reduce_mean(input_x), [], data_input,
+                              batch_weight_func=batch_weight_func)
+                for epoch in loop.iter_epochs():
+                    v.run()
+                    np.testing.assert_almost_equal(
+                        (1.5 * 1. + 4.5 * 5.) / 6.,
+                        v.last_metrics_dict['valid_loss']
+                    )
+                self.assertEquals(2, len(batch_weight_func.call_args_list))
+                np.testing.assert_equal(
+                    [4, 5], batch_weight_func.call_args_list[1][0][0])
+
 
 if __name__ == '__main__':
     unittest.main()
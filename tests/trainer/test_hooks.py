@@ -11,7 +11,8 @@ class HookPriorityTestCase(unittest.TestCase):
     def test_priority(self):
         self.assertLess(HookPriority.VALIDATION, HookPriority.DEFAULT)
         self.assertLess(HookPriority.DEFAULT, HookPriority.ANNEALING)
-        self.assertLess(HookPriority.ANNEALING, HookPriority.LOGGING)
+        self.assertLess(HookPriority.ANNEALING, HookPriority.DATA_METRICS)
+        self.assertLess(HookPriority.DATA_METRICS, HookPriority.LOGGING)
 
 
 class HookEntryTestCase(unittest.TestCase):
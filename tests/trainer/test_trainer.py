@@ -55,6 +55,35 @@ class TrainerTestCase(tf.test.TestCase):
                 {'loss_x': 60}, loop.collect_metrics.call_args_list[0][0][0])
             np.testing.assert_equal([10, 11, 12, 13, 14], session.run(var))
 
+    def test_run_dataset_input(self):
+        df = DataFlow.arrays([np.arange(10, 20, dtype=np.int32)], batch_size=5)
+        data_input = DatasetInput(df, [tf.int32], [[5]])
+        [input_x] = data_input.inputs
+        var = tf.get_variable('var', shape=[5], dtype=tf.int32,
+                              initializer=tf.zeros_initializer())
+        train_op = tf.assign(var, input_x)
+
+        with pytest.raises(ValueError, match='`inputs` must be empty when '
+                                             '`data_flow` is a `DatasetInput`'):
+            _ = Trainer(Mock(), train_op, [input_x], data_input)
+
+        with self.test_session() as session, \
+                TrainLoop([var], max_epoch=2, early_stopping=False) as loop:
+            loop.collect_metrics = Mock(wraps=loop.collect_metrics)
+            t = Trainer(loop, train_op, [], data_input,
+                        metrics={'loss_x': tf.reduce_sum(input_x)})
+            ensure_variables_initialized()
+            t.run()
+
+            self.assertEquals(2, loop.epoch)
+            self.assertEquals(4, loop.step)
+            self.assertEquals(
+                [{'loss_x': 60}, {'loss_x': 85}] * 2,
+                [a[0][0] for a in loop.collect_metrics.call_args_list
+                 if a[0] and 'loss_x' in a[0][0]]
+            )
+            np.testing.assert_equal([15, 16, 17, 18, 19], session.run(var))
+
 
 class LossTrainerTestCase(tf.test.TestCase):
 
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 import numpy as np
@@ -129,6 +130,72 @@ class SplitNumpyArraysTestCase(unittest.TestCase):
         np.testing.assert_equal(left, np.arange(9))
         np.testing.assert_equal(right, [9])
 
+    def test_split_with_random_streams(self):
+        streams = RandomStreams(1234)
+        x = np.arange(100)
+        left, right = split_numpy_arrays([x], size=10, random_state=streams)
+        left2, right2 = split_numpy_arrays([x], size=10, random_state=streams)
+        np.testing.assert_equal(left, left2)
+        np.testing.assert_equal(right, right2)
+        np.testing.assert_equal(
+            x, np.sort(np.concatenate([left[0], right[0]])))
+
+
+class RandomStreamsTestCase(unittest.TestCase):
+
+    def test_props(self):
+        streams = RandomStreams(1234, key=[1, 2])
+        self.assertEqual(1234, streams.seed)
+        self.assertEqual((1, 2), streams.key)
+        self.assertEqual('RandomStreams(seed=1234, key=(1, 2))',
+                         repr(streams))
+        self.assertEqual(RandomStreams(1234, (1, 2)), streams)
+        self.assertEqual(hash(RandomStreams(1234, (1, 2))), hash(streams))
+        self.assertNotEqual(RandomStreams(1234, (1,)), streams)
+        self.assertEqual(RandomStreams(1234, (1, 2, 3)), streams.child(3))
+        self.assertEqual(streams, pickle.loads(pickle.dumps(streams)))
+
+    def test_stream(self):
+        def draw(streams, *counters):
+            return streams.stream(*counters).randint(0, 1 << 30, size=8)
+
+        streams = RandomStreams(1234)
+        self.assertIsInstance(streams.stream(0), np.random.RandomState)
+
+        # the same seed and counters give the same stream
+        np.testing.assert_equal(draw(streams, 0), draw(streams, 0))
+        np.testing.assert_equal(draw(streams.child(1), 2),
+                                draw(RandomStreams(1234, [1]), 2))
+        np.testing.assert_equal(draw(RandomStreams(2 ** 70), 3),
+                                draw(RandomStreams(2 ** 70), 3))
+
+        # different seeds, counters or keys give different streams
+        samples = [
+            draw(streams), draw(streams, 0), draw(streams, 1),
+            draw(streams, 0, 0), draw(streams.child(0)),
+            draw(streams.child(1), 0), draw(streams.child(0), 1),
+            draw(RandomStreams(1235), 0), draw(streams, 1, 0),
+            draw(streams.child(0, 1)), draw(streams.child(1, 0)),
+            draw(streams.child(2 ** 32)), draw(streams.child(0), 1, 0),
+        ]
+        for i in range(len(samples)):
+            for j in range(i + 1, len(samples)):
+                self.assertFalse(np.all(samples[i] == samples[j]))
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match='`seed` must be a non-negative '
+                                             'integer'):
+            _ = RandomStreams(-1)
+        with pytest.raises(ValueError, match='`key` must be non-negative '
+                                             'integers'):
+            _ = RandomStreams(1, key=[-1])
+        with pytest.raises(ValueError, match='`key` must be non-negative '
+                                             'integers'):
+            _ = RandomStreams(1).child(-1)
+        with pytest.raises(ValueError, match='`counters` must be '
+                                             'non-negative integers'):
+            _ = RandomStreams(1).stream(0, -1)
+
 
 if __name__ == '__main__':
     unittest.main()
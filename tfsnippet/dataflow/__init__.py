@@ -1,17 +1,39 @@
-from . import (array_flow, base, data_mappers, gather_flow,
-               iterator_flow, mapper_flow, seq_flow, threading_flow)
+from . import (array_collector, array_flow, base, bucketed_flow,
+               buffer_pool, cache_flow, data_mappers, file_list_flow,
+               gather_flow, image_mappers, instrumented_flow, iterator_flow,
+               mapper_flow, mmap_array_flow, parallel_mapper_flow,
+               process_flow, seq_flow, shard_file_flow, shared_memory,
+               threading_flow, weighted_flow)
 
 __all__ = sum(
-    [m.__all__ for m in [array_flow, base, data_mappers, gather_flow,
-                         iterator_flow, mapper_flow, seq_flow, threading_flow]],
+    [m.__all__ for m in [array_collector, array_flow, base, bucketed_flow,
+                         buffer_pool, cache_flow, data_mappers,
+                         file_list_flow, gather_flow, image_mappers,
+                         instrumented_flow, iterator_flow, mapper_flow,
+                         mmap_array_flow, parallel_mapper_flow, process_flow,
+                         seq_flow, shard_file_flow, shared_memory,
+                         threading_flow, weighted_flow]],
     []
 )
 
+from .array_collector import *
 from .array_flow import *
 from .base import *
+from .bucketed_flow import *
+from .buffer_pool import *
+from .cache_flow import *
 from .data_mappers import *
+from .file_list_flow import *
 from .gather_flow import *
+from .image_mappers import *
+from .instrumented_flow import *
 from .iterator_flow import *
 from .mapper_flow import *
+from .mmap_array_flow import *
+from .parallel_mapper_flow import *
+from .process_flow import *
 from .seq_flow import *
+from .shard_file_flow import *
+from .shared_memory import *
 from .threading_flow import *
+from .weighted_flow import *
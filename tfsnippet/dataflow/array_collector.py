@@ -0,0 +1,120 @@
+import numpy as np
+
+__all__ = ['ArrayCollector']
+
+
+class ArrayCollector(object):
+    """
+    Collecting mini-batches of arrays into whole arrays.
+
+    The mini-batches are copied into preallocated arrays, instead of being
+    kept in lists and concatenated at last, thus the peak memory usage is
+    roughly the size of the collected arrays.  If the total `length` is
+    known, the arrays are allocated with exactly this length.  Otherwise
+    (or if more data than `length` are collected), the arrays are grown
+    geometrically.
+
+    Usage::
+
+        collector = ArrayCollector(length=flow.length_hint())
+        for batch in flow:
+            collector.collect(batch)
+        arrays = collector.get_arrays()
+    """
+
+    GROWTH_FACTOR = 2
+    """The factor to grow the arrays when they are full."""
+
+    def __init__(self, length=None):
+        """
+        Construct an :class:`ArrayCollector`.
+
+        Args:
+            length (int): The expected total length of the collected
+                arrays. (default :obj:`None`, unknown)
+        """
+        if length is not None and length < 0:
+            raise ValueError('`length` must be non-negative: got {!r}'.
+                             format(length))
+        self._length = length
+        self._buffers = None  # type: list[np.ndarray]
+        self._size = 0
+
+    @property
+    def length(self):
+        """Get the expected total length of the collected arrays."""
+        return self._length
+
+    @property
+    def size(self):
+        """Get the number of data collected so far."""
+        return self._size
+
+    def _reallocate(self, i, capacity, dtype):
+        old = self._buffers[i]
+        buf = np.empty((capacity,) + old.shape[1:], dtype=dtype)
+        buf[:self._size] = old[:self._size]
+        self._buffers[i] = buf
+
+    def collect(self, arrays):
+        """
+        Collect a mini-batch of arrays.
+
+        Args:
+            arrays (Iterable[np.ndarray]): The arrays of the mini-batch.
+                They must have the same length.
+        """
+        arrays = [np.asarray(a) for a in arrays]
+        batch_size = len(arrays[0]) if arrays else 0
+        for a in arrays:
+            if len(a) != batch_size:
+                raise ValueError('Arrays in a mini-batch must have the '
+                                 'same length.')
+
+        # allocate the buffers on the first mini-batch
+        if self._buffers is None:
+            capacity = self._length
+            if capacity is None or capacity < batch_size:
+                capacity = batch_size * self.GROWTH_FACTOR
+            self._buffers = [np.empty((capacity,) + a.shape[1:], dtype=a.dtype)
+                             for a in arrays]
+        elif len(arrays) != len(self._buffers):
+            raise ValueError('Expected {} arrays in a mini-batch, got {}.'.
+                             format(len(self._buffers), len(arrays)))
+
+        stop = self._size + batch_size
+        for i, a in enumerate(arrays):
+            buf = self._buffers[i]
+            if a.shape[1:] != buf.shape[1:]:
+                raise ValueError(
+                    'Shape mismatch: expected data shape {!r}, got {!r}.'.
+                    format(buf.shape[1:], a.shape[1:])
+                )
+            dtype = np.result_type(buf.dtype, a.dtype)
+            if stop > len(buf) or dtype != buf.dtype:
+                capacity = len(buf)
+                while capacity < stop:
+                    capacity = max(capacity * self.GROWTH_FACTOR, stop)
+                self._reallocate(i, capacity, dtype)
+                buf = self._buffers[i]
+            buf[self._size: stop] = a
+        self._size = stop
+
+    def get_arrays(self):
+        """
+        Get the collected arrays.
+
+        Returns:
+            tuple[np.ndarray]: The collected arrays.  The over-allocated
+                arrays are shrunk to the collected size, such that the
+                spare capacity is released.
+
+        Raises:
+            ValueError: If no mini-batch has been collected.
+        """
+        if self._buffers is None:
+            raise ValueError('No mini-batch has been collected.')
+        for i, buf in enumerate(self._buffers):
+            if len(buf) > self._size:
+                self._reallocate(i, self._size, buf.dtype)
+        return tuple(self._buffers)
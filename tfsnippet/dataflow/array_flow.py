@@ -1,8 +1,9 @@
 import numpy as np
 from numpy.random import RandomState
 
-from tfsnippet.utils import minibatch_slices_iterator
+from tfsnippet.utils import RandomStreams, minibatch_slices_iterator
 from .base import ExtraInfoDataFlow
+from .buffer_pool import BufferPool
 
 __all__ = ['ArrayFlow']
 
@@ -13,6 +14,25 @@ def _make_readonly(arr):
     return arr
 
 
+def _shard_slice(length, num_shards, index, mode):
+    """
+    Get the slice of the `index`-th shard out of `num_shards` shards.
+
+    Args:
+        length (int): The total length of the data.
+        num_shards (int): Number of the shards.
+        index (int): Index of the shard.
+        mode (str): Either "interleave" or "contiguous".
+
+    Returns:
+        slice: The slice of the shard.
+    """
+    if mode == 'interleave':
+        return slice(index, length, num_shards)
+    return slice(length * index // num_shards,
+                 length * (index + 1) // num_shards)
+
+
 class ArrayFlow(ExtraInfoDataFlow):
     """
     Using numpy-like arrays as data source flow.
@@ -23,10 +43,44 @@ class ArrayFlow(ExtraInfoDataFlow):
                                      skip_incomplete=True)
         for batch_x, batch_y in array_flow:
             ...
+
+    For disk-backed (e.g., memory-mapped) arrays, a fully random shuffling
+    causes scattered random reads.  Block-shuffling can be used instead,
+    which trades some randomness for (nearly) sequential reads::
+
+        array_flow = DataFlow.arrays([x, y], batch_size=256, shuffle='block',
+                                     shuffle_chunk_size=1024,
+                                     shuffle_buffer_size=65536)
+
+    For shuffled flows, the mini-batches can be gathered into preallocated
+    buffers instead of newly allocated arrays, by specifying
+    `buffer_pool_size`.  See :class:`BufferPool` for choosing the size.
+
+    Also for shuffled flows, the indices of each mini-batch can be sorted
+    before gathering, by specifying ``sort_batch_indices = True``.  This
+    keeps the composition of each mini-batch random, but makes the gathering
+    walk through the memory in order, which is friendly to the CPU caches,
+    the TLB, and memory-mapped files.  The items in each mini-batch will then
+    be in ascending order of their indices, unless ``restore_batch_order =
+    True`` is also specified.
+
+    If `random_state` is a :class:`~tfsnippet.utils.RandomStreams`, each
+    epoch is shuffled by its own random stream ``random_state.stream(epoch)``,
+    instead of a shared stateful :class:`RandomState`.  The shuffling of
+    each epoch is then reproducible regardless of how the flows share the
+    random generator, and each shard obtained by :meth:`shard` uses the
+    child streams ``random_state.child(index)``.  Otherwise, the flow
+    shuffles by its own :class:`RandomState`, seeded from `random_state`
+    at the first use, so that :meth:`get_state` and :meth:`set_state` never
+    touch a :class:`RandomState` shared with other flows (e.g., the global
+    one).
     """
 
     def __init__(self, arrays, batch_size,
-                 shuffle=False, skip_incomplete=False, random_state=None):
+                 shuffle=False, skip_incomplete=False, random_state=None,
+                 shuffle_chunk_size=None, shuffle_buffer_size=None,
+                 buffer_pool_size=None, sort_batch_indices=False,
+                 restore_batch_order=False):
         """
         Construct an :class:`ArrayFlow`.
 
@@ -35,15 +89,57 @@ class ArrayFlow(ExtraInfoDataFlow):
                 mini-batches.  These arrays should be at least 1-d,
                 with identical first dimension.
             batch_size (int): Size of each mini-batch.
-            shuffle (bool): Whether or not to shuffle data before iterating?
-                (default :obj:`False`)
+            shuffle (bool or str): Whether or not to shuffle data before
+                iterating?  If ``"block"``, use block-shuffling instead of
+                fully random shuffling.  (default :obj:`False`)
             skip_incomplete (bool): Whether or not to exclude the last
                 mini-batch if it is incomplete? (default :obj:`False`)
-            random_state (RandomState): Optional numpy RandomState for
-                shuffling data before each epoch.  (default :obj:`None`,
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling data before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for shuffling each
+                epoch with its own random stream.  (default :obj:`None`,
                 use the global :class:`RandomState`).
+            shuffle_chunk_size (int): Size of each contiguous chunk for
+                block-shuffling.  (default :obj:`None`, `batch_size`)
+            shuffle_buffer_size (int): Size of the shuffle buffer for
+                block-shuffling.  (default :obj:`None`,
+                ``16 * shuffle_chunk_size``)
+            buffer_pool_size (int): If specified, gather the shuffled
+                mini-batches into this number of preallocated buffers for
+                each array, which are recycled in round-robin.  A buffer
+                is overwritten after `buffer_pool_size` more mini-batches
+                are produced.  (default :obj:`None`, allocate new arrays
+                for each mini-batch)
+            sort_batch_indices (bool): Whether or not to sort the indices
+                of each shuffled mini-batch before gathering?
+                (default :obj:`False`)
+            restore_batch_order (bool): Whether or not to permute the items
+                of each mini-batch gathered by sorted indices back to their
+                shuffled order?  The permutation requires an extra copy of
+                the mini-batch in memory.  It can only be :obj:`True` if
+                `sort_batch_indices` is :obj:`True`. (default :obj:`False`)
         """
         # validate parameters
+        if shuffle not in (False, True, 'block'):
+            raise ValueError('`shuffle` must be one of {False, True, '
+                             '\'block\'}.')
+        if shuffle == 'block':
+            if shuffle_chunk_size is None:
+                shuffle_chunk_size = batch_size
+            if shuffle_buffer_size is None:
+                shuffle_buffer_size = 16 * shuffle_chunk_size
+            if shuffle_chunk_size < 1:
+                raise ValueError('`shuffle_chunk_size` must be at least 1.')
+            if shuffle_buffer_size < shuffle_chunk_size:
+                raise ValueError('`shuffle_buffer_size` must be at least '
+                                 '`shuffle_chunk_size`.')
+        else:
+            shuffle_chunk_size = shuffle_buffer_size = None
+        if buffer_pool_size is not None and buffer_pool_size < 1:
+            raise ValueError('`buffer_pool_size` must be at least 1.')
+        if restore_batch_order and not sort_batch_indices:
+            raise ValueError('`restore_batch_order` can only be True if '
+                             '`sort_batch_indices` is True.')
         arrays = tuple(arrays)
         if not arrays:
             raise ValueError('`arrays` must not be empty.')
@@ -64,39 +160,291 @@ class ArrayFlow(ExtraInfoDataFlow):
             data_shapes=tuple(a.shape[1:] for a in arrays),
             batch_size=batch_size,
             skip_incomplete=skip_incomplete,
-            is_shuffled=shuffle
+            is_shuffled=bool(shuffle)
         )
         self._arrays = arrays
+        self._shuffle_chunk_size = shuffle_chunk_size
+        self._shuffle_buffer_size = shuffle_buffer_size
         self._random_state = random_state or np.random
+        self._buffer_pool_size = buffer_pool_size
+        self._sort_batch_indices = sort_batch_indices
+        self._restore_batch_order = restore_batch_order
 
         # internal indices buffer
         self._indices_buffer = None
 
+        # internal states for checkpointing
+        self._epoch_counter = 0  # number of shuffled epochs, for streams
+        self._epoch_position = None  # number of yielded batches in the epoch
+        self._epoch_random_state = None  # random state at the epoch start
+        self._shuffle_random_state = None  # type: RandomState
+        self._is_resuming = False
+
+        # internal buffer pools for gathering the shuffled mini-batches
+        if buffer_pool_size is not None:
+            self._buffer_pools = tuple(
+                BufferPool(buffer_pool_size, batch_size, a.shape[1:], a.dtype)
+                if isinstance(a, np.ndarray) else None
+                for a in arrays
+            )
+        else:
+            self._buffer_pools = None
+
     @property
     def the_arrays(self):
         """Get the tuple of arrays accessed by this :class:`ArrayFlow`."""
         return self._arrays
 
-    def _minibatch_iterator(self):
-        # shuffle the source arrays if necessary
+    @property
+    def shuffle_chunk_size(self):
+        """
+        Get the size of each contiguous chunk for block-shuffling.
+
+        Returns:
+            int or None: The chunk size, or :obj:`None` if block-shuffling
+                is not enabled.
+        """
+        return self._shuffle_chunk_size
+
+    @property
+    def shuffle_buffer_size(self):
+        """
+        Get the size of the shuffle buffer for block-shuffling.
+
+        Returns:
+            int or None: The buffer size, or :obj:`None` if block-shuffling
+                is not enabled.
+        """
+        return self._shuffle_buffer_size
+
+    @property
+    def buffer_pool_size(self):
+        """
+        Get the number of preallocated buffers for each array.
+
+        Returns:
+            int or None: The number of buffers, or :obj:`None` if the
+                buffer pool is not enabled.
+        """
+        return self._buffer_pool_size
+
+    @property
+    def sort_batch_indices(self):
+        """
+        Whether or not to sort the indices of each shuffled mini-batch
+        before gathering?
+        """
+        return self._sort_batch_indices
+
+    @property
+    def restore_batch_order(self):
+        """
+        Whether or not to permute the items of each mini-batch gathered by
+        sorted indices back to their shuffled order?
+        """
+        return self._restore_batch_order
+
+    def _shard(self, num_shards, index, mode):
+        s = _shard_slice(self.data_length, num_shards, index, mode)
+        if self._shuffle_chunk_size is not None:
+            shuffle = 'block'
+        else:
+            shuffle = self.is_shuffled
+        return ArrayFlow(
+            arrays=[a[s] for a in self.the_arrays],
+            batch_size=self.batch_size,
+            shuffle=shuffle,
+            skip_incomplete=self.skip_incomplete,
+            random_state=self._shard_random_state(index),
+            shuffle_chunk_size=self._shuffle_chunk_size,
+            shuffle_buffer_size=self._shuffle_buffer_size,
+            buffer_pool_size=self._buffer_pool_size,
+            sort_batch_indices=self._sort_batch_indices,
+            restore_batch_order=self._restore_batch_order
+        )
+
+    def _shard_random_state(self, index):
+        """Get the random state for the `index`-th shard."""
+        if isinstance(self._random_state, RandomStreams):
+            return self._random_state.child(index)
+        return self._random_state
+
+    def _get_shuffle_random_state(self):
+        """
+        Get the private random state for shuffling, which is seeded from
+        `random_state` at the first use.  Its state, instead of the state
+        of `random_state`, is saved for checkpointing.
+        """
+        if self._shuffle_random_state is None:
+            self._shuffle_random_state = RandomState(
+                self._random_state.randint(0, 2 ** 31 - 1))
+        return self._shuffle_random_state
+
+    def _capture_random_state(self):
         if self.is_shuffled:
-            if self._indices_buffer is None:
-                t = np.int32 if self._data_length < (1 << 31) else np.int64
-                self._indices_buffer = np.arange(self._data_length, dtype=t)
-            self._random_state.shuffle(self._indices_buffer)
-
-            def get_slice(s):
-                return tuple(
-                    _make_readonly(a[self._indices_buffer[s]])
-                    for a in self.the_arrays
-                )
+            if isinstance(self._random_state, RandomStreams):
+                return self._epoch_counter
+            return self._get_shuffle_random_state().get_state()
+
+    def get_state(self):
+        if self._epoch_position is None:
+            return {'position': 0,
+                    'random_state': self._capture_random_state()}
+        return {'position': self._epoch_position,
+                'random_state': self._epoch_random_state}
+
+    def set_state(self, state):
+        if isinstance(self._random_state, RandomStreams):
+            if state['random_state'] is not None:
+                self._epoch_counter = state['random_state']
+        elif state['random_state'] is not None:
+            if self._shuffle_random_state is None:
+                self._shuffle_random_state = RandomState()
+            self._shuffle_random_state.set_state(state['random_state'])
+        self._epoch_position = state['position']
+        self._epoch_random_state = state['random_state']
+        self._is_resuming = True
+
+    def _gather_shuffled(self, indices):
+        """
+        Gather the rows of each array at specified shuffled `indices`,
+        sorting the indices before gathering if required.
+
+        Args:
+            indices (np.ndarray): The indices of the rows.
+
+        Returns:
+            tuple[np.ndarray]: The read-only gathered arrays.
+        """
+        if not self._sort_batch_indices:
+            return self._gather(indices)
+        if not self._restore_batch_order:
+            return self._gather(np.sort(indices))
+
+        order = np.argsort(indices)
+        reverse_order = np.empty_like(order)
+        reverse_order[order] = np.arange(len(order))
+        return tuple(
+            _make_readonly(a[reverse_order])
+            for a in self._gather(indices[order])
+        )
+
+    def _gather(self, indices):
+        """
+        Gather the rows of each array at specified `indices`.
+
+        Args:
+            indices (np.ndarray): The indices of the rows.
+
+        Returns:
+            tuple[np.ndarray]: The read-only gathered arrays.
+        """
+        if self._buffer_pools is None:
+            return tuple(_make_readonly(a[indices]) for a in self.the_arrays)
+
+        ret = []
+        for a, pool in zip(self.the_arrays, self._buffer_pools):
+            if pool is None:
+                ret.append(_make_readonly(a[indices]))
+            else:
+                # `mode='clip'` avoids the internal buffering of `np.take`,
+                # and the indices are always valid anyway.
+                buf = pool.next_buffer(len(indices))
+                np.take(a, indices, axis=0, out=buf, mode='clip')
+                ret.append(_make_readonly(buf))
+        return tuple(ret)
+
+    def _block_shuffle(self, indices, random_state):
+        """
+        Block-shuffle the `indices` in place.
+
+        The indices are firstly divided into contiguous chunks of size
+        `shuffle_chunk_size`, whose order is then shuffled.  After that,
+        each consecutive `shuffle_buffer_size` indices (in the shuffled
+        chunk order) are shuffled within the buffer.
+
+        Consequently, each mini-batch is drawn from at most
+        ``shuffle_buffer_size / shuffle_chunk_size + 1`` contiguous chunks
+        of the data, which is less random than a full shuffling, but turns
+        the scattered reads of a disk-backed array into (nearly) sequential
+        reads.  Larger buffers (or smaller chunks) give more randomness,
+        while smaller buffers (or larger chunks) give better locality.
+        """
+        length = len(indices)
+        chunk_size = self._shuffle_chunk_size
+        buffer_size = self._shuffle_buffer_size
+
+        # shuffle the order of the chunks
+        chunk_starts = np.arange(0, length, chunk_size, dtype=indices.dtype)
+        random_state.shuffle(chunk_starts)
+        chunk_lengths = np.minimum(chunk_starts + chunk_size, length) - \
+            chunk_starts
+        chunk_offsets = np.cumsum(chunk_lengths) - chunk_lengths
+        indices[:] = np.arange(length, dtype=indices.dtype) + np.repeat(
+            chunk_starts - chunk_offsets, chunk_lengths)
+
+        # shuffle the indices within each buffer
+        for start in range(0, length, buffer_size):
+            random_state.shuffle(indices[start: start + buffer_size])
+
+    def _shuffle_indices(self):
+        """Shuffle the indices buffer for a new epoch."""
+        if self._indices_buffer is None:
+            t = np.int32 if self._data_length < (1 << 31) else np.int64
+            self._indices_buffer = np.arange(self._data_length, dtype=t)
+        else:
+            # start from the same order, so that each epoch only depends on
+            # the random state at the epoch start, which is what
+            # :meth:`get_state` saves for checkpointing
+            self._indices_buffer[:] = np.arange(self._data_length)
+        if isinstance(self._random_state, RandomStreams):
+            random_state = self._random_state.stream(self._epoch_counter)
+            self._epoch_counter += 1
+        else:
+            random_state = self._get_shuffle_random_state()
+        if self._shuffle_chunk_size is not None:
+            self._block_shuffle(self._indices_buffer, random_state)
         else:
-            def get_slice(s):
-                return tuple(_make_readonly(a[s]) for a in self.the_arrays)
-
-        # now iterator through the mini-batches
-        for batch_s in minibatch_slices_iterator(
-                length=self.data_length,
-                batch_size=self.batch_size,
-                skip_incomplete=self.skip_incomplete):
-            yield get_slice(batch_s)
+            random_state.shuffle(self._indices_buffer)
+
+    def _minibatch_iterator(self):
+        # the number of mini-batches to skip, if resuming from a state
+        skip = 0
+        if self._is_resuming:
+            skip = self._epoch_position
+            self._is_resuming = False
+            batch_count = self.data_length // self.batch_size
+            if not self.skip_incomplete and \
+                    self.data_length % self.batch_size:
+                batch_count += 1
+            if skip and skip >= batch_count:
+                # the saved epoch has been completed, so start a new epoch,
+                # after consuming the randomness of the saved epoch
+                if self.is_shuffled:
+                    self._shuffle_indices()
+                skip = 0
+
+        try:
+            # shuffle the source arrays if necessary
+            if self.is_shuffled:
+                self._epoch_random_state = self._capture_random_state()
+                self._shuffle_indices()
+
+                def get_slice(s):
+                    return self._gather_shuffled(self._indices_buffer[s])
+            else:
+                def get_slice(s):
+                    return tuple(_make_readonly(a[s]) for a in self.the_arrays)
+
+            # now iterator through the mini-batches
+            self._epoch_position = skip
+            offset = skip * self.batch_size
+            for batch_s in minibatch_slices_iterator(
+                    length=self.data_length - offset,
+                    batch_size=self.batch_size,
+                    skip_incomplete=self.skip_incomplete):
+                self._epoch_position += 1
+                yield get_slice(
+                    slice(batch_s.start + offset, batch_s.stop + offset))
+        finally:
+            self._epoch_position = None
@@ -69,28 +69,39 @@ class DataFlow(object):
         """
         Iterate through the data-flow, collecting mini-batches into arrays.
 
+        The mini-batches are copied into preallocated arrays (see
+        :class:`~tfsnippet.dataflow.ArrayCollector`), whose length is
+        taken from :meth:`length_hint` if it is known.
+
         Returns:
             tuple[np.ndarray]: The collected arrays.
 
         Raises:
             ValueError: If this data-flow is empty.
         """
-        arrays_buf = []
-        it = iter(self)
-        try:
-            batch = next(it)
-        except StopIteration:
+        from .array_collector import ArrayCollector
+        collector = ArrayCollector(length=self.length_hint())
+        is_empty = True
+        for batch in self:
+            collector.collect(batch)
+            is_empty = False
+        if is_empty:
             raise ValueError('{!r} is empty, cannot convert to arrays'.
                              format(self))
-        try:
-            arrays_buf = [[arr] for arr in batch]
-            while True:
-                batch = next(it)
-                for i, arr in enumerate(batch):
-                    arrays_buf[i].append(arr)
-        except StopIteration:
-            pass
-        return tuple(np.concatenate(arr) for arr in arrays_buf)
+        return collector.get_arrays()
+
+    def length_hint(self):
+        """
+        Get the estimated total length of the data in an epoch.
+
+        The arrays in :meth:`get_arrays` are preallocated according to
+        this length, if it is known.
+
+        Returns:
+            int or None: The estimated total length, or :obj:`None` if it
+                is unknown.
+        """
+        return None
 
     def to_arrays_flow(self, batch_size, shuffle=False, skip_incomplete=False,
                        random_state=None):
@@ -106,9 +117,11 @@ class DataFlow(object):
                 (default :obj:`False`)
             skip_incomplete (bool): Whether or not to exclude the last
                 mini-batch if it is incomplete? (default :obj:`False`)
-            random_state (RandomState): Optional numpy RandomState for
-                shuffling data before each epoch.  (default :obj:`None`,
-                use the global :class:`RandomState`).
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling data before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
 
         Returns:
             tfsnippet.dataflow.ArrayFlow: The constructed ArrayFlow.
@@ -118,6 +131,77 @@ class DataFlow(object):
                          shuffle=shuffle, skip_incomplete=skip_incomplete,
                          random_state=random_state)
 
+    def to_tf_dataset(self, output_types, output_shapes=None, prefetch=None,
+                      mark_last=False):
+        """
+        Convert this data-flow to a :class:`tf.data.Dataset`.
+
+        Each iteration through the dataset (e.g., after initializing an
+        initializable iterator of the dataset) will iterate through one
+        epoch of this data-flow.  The mini-batches are converted into
+        tensors in the background threads of TensorFlow, thus they can
+        be prefetched while the training operation is running, instead of
+        being copied by ``feed_dict`` on each ``session.run``.
+
+        Args:
+            output_types (Iterable[tf.DType]): The data types of the arrays
+                in each mini-batch.
+            output_shapes (Iterable[tf.TensorShape]): The shapes of the
+                arrays in each mini-batch, including the batch dimension.
+                (default :obj:`None`, unknown shapes)
+            prefetch (int): If specified, prefetch this number of
+                mini-batches by :meth:`tf.data.Dataset.prefetch`.
+                (default :obj:`None`)
+            mark_last (bool): If :obj:`True`, append a boolean scalar to
+                each mini-batch, which is :obj:`True` only for the last
+                mini-batch of the epoch.  This allows the consumer to stop
+                exactly after the last mini-batch, without catching a
+                :class:`tf.errors.OutOfRangeError`.  Since the next
+                mini-batch must be obtained to decide whether or not a
+                mini-batch is the last one, each mini-batch is copied
+                before the next one is obtained, such that a source flow
+                which reuses the memory of its mini-batches (e.g., with a
+                buffer pool) is also supported. (default :obj:`False`)
+
+        Returns:
+            tf.data.Dataset: The dataset.
+        """
+        import tensorflow as tf
+
+        output_types = tuple(output_types)
+        if output_shapes is not None:
+            output_shapes = tuple(tf.TensorShape(s) for s in output_shapes)
+        if mark_last:
+            if output_shapes is None:
+                output_shapes = tuple(tf.TensorShape(None)
+                                      for _ in output_types)
+            output_types += (tf.bool,)
+            output_shapes += (tf.TensorShape([]),)
+
+        def generator():
+            if not mark_last:
+                for batch in self:
+                    yield tuple(batch)
+                return
+
+            # look ahead for the next mini-batch, holding a copy of the
+            # current one, in case its memory is reused by the source flow
+            it = iter(self)
+            try:
+                batch = tuple(np.array(a) for a in next(it))
+            except StopIteration:
+                return
+            for next_batch in it:
+                yield batch + (False,)
+                batch = tuple(np.array(a) for a in next_batch)
+            yield batch + (True,)
+
+        dataset = tf.data.Dataset.from_generator(
+            generator, output_types=output_types, output_shapes=output_shapes)
+        if prefetch:
+            dataset = dataset.prefetch(prefetch)
+        return dataset
+
     @property
     def current_batch(self):
         """
@@ -169,20 +253,172 @@ class DataFlow(object):
         from .mapper_flow import MapperFlow
         return MapperFlow(self, mapper)
 
-    def threaded(self, prefetch):
+    def cast(self, dtype, scale=None, shift=None, indices=None,
+             buffer_pool_size=None):
+        """
+        Construct a :class:`~tfsnippet.dataflow.MapperFlow`, which converts
+        the arrays of each mini-batch from this flow into another data type,
+        with optional scaling and shifting.  See
+        :class:`~tfsnippet.dataflow.CastArrays`.
+
+        Args:
+            dtype (np.dtype): The data type to convert the arrays into.
+            scale: If specified, multiply the converted arrays by this.
+            shift: If specified, add this to the converted (and scaled)
+                arrays.
+            indices (Iterable[int]): The indices of the arrays to convert
+                in each mini-batch. (default :obj:`None`, all the arrays)
+            buffer_pool_size (int): If specified, convert the mini-batches
+                into this number of preallocated buffers for each array.
+                (default :obj:`None`, allocate new arrays for each
+                mini-batch)
+
+        Returns:
+            tfsnippet.dataflow.MapperFlow: The data flow with the arrays
+                converted.
+        """
+        from .data_mappers import CastArrays
+        return self.map(CastArrays(dtype, scale=scale, shift=shift,
+                                   indices=indices,
+                                   buffer_pool_size=buffer_pool_size))
+
+    def parallel_map(self, mapper, n_workers, ordered=True,
+                     max_in_flight=None):
+        """
+        Construct a :class:`~tfsnippet.dataflow.ParallelMapperFlow`.
+
+        Args:
+            mapper ((\*np.ndarray) -> tuple[np.ndarray])): The mapper
+                function, which transforms numpy arrays into a tuple
+                of other numpy arrays.
+            n_workers (int): Number of worker processes.
+            ordered (bool): Whether or not to keep the order of the
+                mini-batches from this flow? (default :obj:`True`)
+            max_in_flight (int): Maximum number of mini-batches being
+                mapped or waiting to be consumed.
+                (default :obj:`None`, ``2 * n_workers``)
+
+        Returns:
+            tfsnippet.dataflow.ParallelMapperFlow: The data flow with
+                `mapper` applied in worker processes.
+        """
+        from .parallel_mapper_flow import ParallelMapperFlow
+        return ParallelMapperFlow(self, mapper, n_workers=n_workers,
+                                  ordered=ordered, max_in_flight=max_in_flight)
+
+    def threaded_map(self, mapper, n_workers, ordered=True,
+                     max_in_flight=None):
+        """
+        Construct a :class:`~tfsnippet.dataflow.ThreadPoolMapperFlow`.
+
+        Args:
+            mapper ((\*np.ndarray) -> tuple[np.ndarray])): The mapper
+                function, which transforms numpy arrays into a tuple
+                of other numpy arrays.  It must be thread-safe.
+            n_workers (int): Number of worker threads.
+            ordered (bool): Whether or not to keep the order of the
+                mini-batches from this flow? (default :obj:`True`)
+            max_in_flight (int): Maximum number of mini-batches being
+                mapped or waiting to be consumed.
+                (default :obj:`None`, ``2 * n_workers``)
+
+        Returns:
+            tfsnippet.dataflow.ThreadPoolMapperFlow: The data flow with
+                `mapper` applied in worker threads.
+        """
+        from .parallel_mapper_flow import ThreadPoolMapperFlow
+        return ThreadPoolMapperFlow(self, mapper, n_workers=n_workers,
+                                    ordered=ordered,
+                                    max_in_flight=max_in_flight)
+
+    def cache(self, max_bytes=None, spill_dir=None):
+        """
+        Construct a :class:`~tfsnippet.dataflow.CacheFlow` from this flow.
+
+        Args:
+            max_bytes (int): Maximum number of bytes to be cached in memory.
+                The mini-batches exceeding this budget will be spilled into
+                memory-mapped files. (default :obj:`None`, no limit)
+            spill_dir (str): The directory, where to create the temporary
+                directory for the spilled mini-batches.
+                (default :obj:`None`, the system temporary directory)
+
+        Returns:
+            tfsnippet.dataflow.CacheFlow: The data flow which records the
+                mini-batches of this flow during the first epoch, and
+                replays them in the following epochs.
+        """
+        from .cache_flow import CacheFlow
+        return CacheFlow(self, max_bytes=max_bytes, spill_dir=spill_dir)
+
+    def threaded(self, prefetch, max_prefetch=None, max_prefetch_bytes=None):
         """
         Construct a :class:`~tfsnippet.dataflow.ThreadingFlow` from this flow.
 
         Args:
-            prefetch (int): Number of mini-batches to prefetch ahead.
-                It should be at least 1.
+            prefetch (int or str): Number of mini-batches to prefetch ahead.
+                It should be at least 1, or "auto" to adjust the number
+                automatically.
+            max_prefetch (int): Maximum number of mini-batches to prefetch
+                in auto mode. (default :obj:`None`, 32)
+            max_prefetch_bytes (int): Maximum number of bytes of the
+                prefetched mini-batches in auto mode.
+                (default :obj:`None`, no limit)
 
         Returns:
             tfsnippet.dataflow.ThreadingFlow: The background threaded
                 data flow to prefetch mini-batches from this flow.
         """
         from .threading_flow import ThreadingFlow
-        return ThreadingFlow(self, prefetch=prefetch)
+        return ThreadingFlow(self, prefetch=prefetch,
+                             max_prefetch=max_prefetch,
+                             max_prefetch_bytes=max_prefetch_bytes)
+
+    def instrument(self, name):
+        """
+        Construct a :class:`~tfsnippet.dataflow.InstrumentedFlow` from this
+        flow, to measure the timing statistics of this flow.
+
+        Args:
+            name (str): Name of this stage in the metric names.
+
+        Returns:
+            tfsnippet.dataflow.InstrumentedFlow: The data flow which
+                measures the timing statistics of this flow.
+        """
+        from .instrumented_flow import InstrumentedFlow
+        return InstrumentedFlow(self, name=name)
+
+    def multiprocessed(self, prefetch, batch_size=None, data_shapes=None,
+                       dtypes=None, buffer_pool_size=1):
+        """
+        Construct a :class:`~tfsnippet.dataflow.ProcessFlow` from this flow.
+
+        Args:
+            prefetch (int): Number of mini-batches to prefetch ahead.
+                It should be at least 1.
+            batch_size (int): Maximum size of each mini-batch from this
+                flow.  (default :obj:`None`, infer from this flow)
+            data_shapes (Iterable[tuple[int]]): The shapes of data in a
+                mini-batch from this flow, excluding the batch dimension.
+                (default :obj:`None`, infer from this flow)
+            dtypes (Iterable[np.dtype]): The data types of the arrays in a
+                mini-batch from this flow.
+                (default :obj:`None`, infer from this flow)
+            buffer_pool_size (int): Number of the obtained mini-batches
+                whose shared memory is held by the consumer.  The shared
+                memory of a mini-batch is recycled after `buffer_pool_size`
+                more mini-batches are obtained. (default 1)
+
+        Returns:
+            tfsnippet.dataflow.ProcessFlow: The background process data
+                flow to prefetch mini-batches from this flow, transferring
+                mini-batches through shared memory.
+        """
+        from .process_flow import ProcessFlow
+        return ProcessFlow(self, prefetch=prefetch, batch_size=batch_size,
+                           data_shapes=data_shapes, dtypes=dtypes,
+                           buffer_pool_size=buffer_pool_size)
 
     def select(self, indices):
         """
@@ -201,9 +437,113 @@ class DataFlow(object):
         indices = tuple(indices)
         return self.map(lambda *arrays: tuple(arrays[i] for i in indices))
 
+    def shard(self, num_shards, index, mode='interleave'):
+        """
+        Construct a :class:`DataFlow`, which iterates through one of the
+        `num_shards` disjoint shards of the data in this flow.
+
+        The data is split by slicing the underlying arrays (or sequence)
+        of the data source, instead of dropping the mini-batches after they
+        are produced, so each worker only reads its own shard.  If this flow
+        is shuffled, the shard is shuffled on its own, thus every epoch
+        still covers the data exactly once across all the shards.  For
+        example, in a data-parallel training with multiple workers::
+
+            train_flow = DataFlow.arrays([x, y], batch_size=64, shuffle=True)
+            train_flow = train_flow.shard(num_workers, worker_index)
+
+        Sharding is supported by :class:`~tfsnippet.dataflow.ArrayFlow`
+        (including :class:`~tfsnippet.dataflow.SeqFlow`), by
+        :class:`~tfsnippet.dataflow.ShardFileFlow` (which assigns the shard
+        files to the shards), and by :class:`~tfsnippet.dataflow.MapperFlow`
+        over a flow which supports sharding.
+
+        Args:
+            num_shards (int): Number of the shards.
+            index (int): Index of the shard, in ``[0, num_shards)``.
+            mode (str): Either "interleave", which takes every `num_shards`
+                items starting from the `index`-th item, or "contiguous",
+                which takes a contiguous range of items.  The contiguous
+                mode is preferred for disk-backed arrays.
+                (default "interleave")
+
+        Returns:
+            DataFlow: The sharded data flow.
+
+        Raises:
+            NotImplementedError: If this flow does not support sharding.
+        """
+        if num_shards < 1:
+            raise ValueError('`num_shards` must be at least 1.')
+        if index < 0 or index >= num_shards:
+            raise ValueError('`index` must be in [0, num_shards): got {}.'.
+                             format(index))
+        if mode not in ('interleave', 'contiguous'):
+            raise ValueError('`mode` must be one of {{\'interleave\', '
+                             '\'contiguous\'}}: got {!r}.'.format(mode))
+        return self._shard(num_shards, index, mode)
+
+    def _shard(self, num_shards, index, mode):
+        """
+        Subclasses should override this to implement :meth:`shard`.
+        The arguments have already been validated.
+        """
+        raise NotImplementedError('{} does not support sharding.'.
+                                  format(self.__class__.__name__))
+
+    def get_state(self):
+        """
+        Get the iteration state of this flow, for resuming the iteration
+        after restarting the program.  For example::
+
+            # save the state along with the checkpoint
+            with open(state_path, 'wb') as f:
+                pickle.dump(train_flow.get_state(), f)
+
+            # restore the state after restarting
+            with open(state_path, 'rb') as f:
+                train_flow.set_state(pickle.load(f))
+
+        The state is a picklable dict, with the key ``"position"`` being
+        the number of mini-batches obtained from the current epoch.
+        After :meth:`set_state` is called, the next iteration through this
+        flow continues the saved epoch right after the last obtained
+        mini-batch, without producing the skipped mini-batches.  If no
+        epoch is in progress, the next iteration starts a new epoch, with
+        the same shuffling as it would have without restarting.
+
+        Checkpointing is supported by :class:`~tfsnippet.dataflow.ArrayFlow`
+        (including :class:`~tfsnippet.dataflow.SeqFlow`), and by
+        :class:`~tfsnippet.dataflow.MapperFlow`,
+        :class:`~tfsnippet.dataflow.GatherFlow` and
+        :class:`~tfsnippet.dataflow.ThreadingFlow` over flows which support
+        checkpointing.
+
+        Returns:
+            dict: The iteration state.
+
+        Raises:
+            NotImplementedError: If this flow does not support checkpointing.
+        """
+        raise NotImplementedError('{} does not support checkpointing.'.
+                                  format(self.__class__.__name__))
+
+    def set_state(self, state):
+        """
+        Restore the iteration state of this flow.  See :meth:`get_state`.
+
+        Args:
+            state (dict): The iteration state obtained by :meth:`get_state`.
+
+        Raises:
+            NotImplementedError: If this flow does not support checkpointing.
+        """
+        raise NotImplementedError('{} does not support checkpointing.'.
+                                  format(self.__class__.__name__))
+
     # -------- here starts the factory methods for data flows --------
     @staticmethod
-    def gather(flows):
+    def gather(flows, parallel=False, prefetch=1):
         """
         Gather multiple data flows into a single flow.
 
@@ -211,6 +551,10 @@ class DataFlow(object):
             flows(Iterable[DataFlow]): The data flows to gather.
                 At least one data flow should be specified, otherwise a
                 :class:`ValueError` will be raised.
+            parallel (bool): Whether or not to iterate the data flows
+                in parallel background threads? (default :obj:`False`)
+            prefetch (int): Number of mini-batches to prefetch ahead from
+                each of the data flows, in parallel mode. (default 1)
 
         Returns:
             tfsnippet.dataflow.GatherFlow: The gathered data flow.
@@ -220,7 +564,7 @@ class DataFlow(object):
             TypeError: If a specified flow is not a :class:`DataFlow`.
         """
         from .gather_flow import GatherFlow
-        return GatherFlow(tuple(flows))
+        return GatherFlow(tuple(flows), parallel=parallel, prefetch=prefetch)
 
     @staticmethod
     def seq(start, stop, step=1, batch_size=None, shuffle=False,
@@ -238,9 +582,11 @@ class DataFlow(object):
             skip_incomplete (bool): Whether or not to exclude the last
                 mini-batch if it is incomplete? (default :obj:`False`)
             dtype: Data type of the numbers. (default ``np.int32``)
-            random_state (RandomState): Optional numpy RandomState for
-                shuffling data before each epoch.  (default :obj:`None`,
-                use the global :class:`RandomState`).
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling data before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
 
         Returns:
             tfsnippet.dataflow.SeqFlow: The data flow from number sequence.
@@ -254,7 +600,9 @@ class DataFlow(object):
 
     @staticmethod
     def arrays(arrays, batch_size, shuffle=False, skip_incomplete=False,
-               random_state=None):
+               random_state=None, shuffle_chunk_size=None,
+               shuffle_buffer_size=None, buffer_pool_size=None,
+               sort_batch_indices=False, restore_batch_order=False):
         """
         Construct an :class:`~tfsnippet.dataflow.ArrayFlow`.
 
@@ -263,13 +611,30 @@ class DataFlow(object):
                 mini-batches.  These arrays should be at least 1-d,
                 with identical first dimension.
             batch_size (int): Size of each mini-batch.
-            shuffle (bool): Whether or not to shuffle data before iterating?
-                (default :obj:`False`)
+            shuffle (bool or str): Whether or not to shuffle data before
+                iterating?  If ``"block"``, use block-shuffling instead of
+                fully random shuffling.  (default :obj:`False`)
             skip_incomplete (bool): Whether or not to exclude the last
                 mini-batch if it is incomplete? (default :obj:`False`)
-            random_state (RandomState): Optional numpy RandomState for
-                shuffling data before each epoch.  (default :obj:`None`,
-                use the global :class:`RandomState`).
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling data before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+            shuffle_chunk_size (int): Size of each contiguous chunk for
+                block-shuffling.  (default :obj:`None`, `batch_size`)
+            shuffle_buffer_size (int): Size of the shuffle buffer for
+                block-shuffling.  (default :obj:`None`,
+                ``16 * shuffle_chunk_size``)
+            buffer_pool_size (int): If specified, gather the shuffled
+                mini-batches into this number of preallocated buffers for
+                each array.  (default :obj:`None`)
+            sort_batch_indices (bool): Whether or not to sort the indices
+                of each shuffled mini-batch before gathering?
+                (default :obj:`False`)
+            restore_batch_order (bool): Whether or not to permute the items
+                of each mini-batch gathered by sorted indices back to their
+                shuffled order?  (default :obj:`False`)
 
         Returns:
             tfsnippet.dataflow.ArrayFlow: The data flow from arrays.
@@ -277,7 +642,241 @@ class DataFlow(object):
         from .array_flow import ArrayFlow
         return ArrayFlow(
             arrays=arrays, batch_size=batch_size, shuffle=shuffle,
-            skip_incomplete=skip_incomplete, random_state=random_state
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            shuffle_chunk_size=shuffle_chunk_size,
+            shuffle_buffer_size=shuffle_buffer_size,
+            buffer_pool_size=buffer_pool_size,
+            sort_batch_indices=sort_batch_indices,
+            restore_batch_order=restore_batch_order
+        )
+
+    @staticmethod
+    def bucketed(sequences, batch_size, bucket_boundaries, lengths=None,
+                 aux_arrays=None, shuffle=False, skip_incomplete=False,
+                 random_state=None, pad_value=0, with_mask=False,
+                 mask_dtype=np.float32):
+        """
+        Construct a :class:`~tfsnippet.dataflow.BucketedFlow`.
+
+        Args:
+            sequences: List of sequence arrays.  Each sequence array should
+                be either a list of numpy arrays, whose first dimensions are
+                the sequence lengths, or a padded numpy-like array, whose
+                second dimension is the sequence dimension.
+            batch_size (int): Size of each mini-batch.
+            bucket_boundaries (Iterable[int]): The increasing boundaries of
+                the buckets.
+            lengths (np.ndarray): The lengths of the sequences.  Required
+                if none of the sequence arrays is a list of arrays.
+                (default :obj:`None`, inferred from the sequence arrays)
+            aux_arrays: List of numpy-like arrays, whose rows should be
+                gathered along with the sequences, without padding.
+                (default :obj:`None`)
+            shuffle (bool): Whether or not to shuffle the sequences within
+                the buckets, and the mini-batches across the buckets,
+                before each epoch? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch of each bucket if it is incomplete?
+                (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                use the global :class:`RandomState`).
+            pad_value: The value for padding the lists of arrays.
+                (default 0)
+            with_mask (bool): Whether or not to produce a mask array at the
+                end of each mini-batch? (default :obj:`False`)
+            mask_dtype: The data type of the mask array.
+                (default ``np.float32``)
+
+        Returns:
+            tfsnippet.dataflow.BucketedFlow: The data flow from sequences.
+        """
+        from .bucketed_flow import BucketedFlow
+        return BucketedFlow(
+            sequences=sequences, batch_size=batch_size,
+            bucket_boundaries=bucket_boundaries, lengths=lengths,
+            aux_arrays=aux_arrays, shuffle=shuffle,
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            pad_value=pad_value, with_mask=with_mask, mask_dtype=mask_dtype
+        )
+
+    @staticmethod
+    def weighted(arrays, weights, batch_size, steps_per_epoch=None,
+                 return_indices=False, block_size=None, random_state=None):
+        """
+        Construct a :class:`~tfsnippet.dataflow.WeightedFlow`.
+
+        Args:
+            arrays: List of numpy-like arrays, to be sampled through
+                mini-batches.  These arrays should be at least 1-d,
+                with identical first dimension.
+            weights (np.ndarray): The non-negative weights of the examples.
+            batch_size (int): Size of each mini-batch.
+            steps_per_epoch (int): Number of mini-batches in each epoch.
+                (default :obj:`None`, ``ceil(data_length / batch_size)``)
+            return_indices (bool): Whether or not to produce the indices of
+                the sampled examples at the end of each mini-batch?
+                (default :obj:`False`)
+            block_size (int): Number of examples in each block of the
+                two-level alias table.  (default :obj:`None`,
+                ``ceil(sqrt(data_length / batch_size))``)
+            random_state (RandomState): Optional numpy RandomState for
+                sampling.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+
+        Returns:
+            tfsnippet.dataflow.WeightedFlow: The data flow sampling from
+                arrays according to the weights.
+        """
+        from .weighted_flow import WeightedFlow
+        return WeightedFlow(
+            arrays=arrays, weights=weights, batch_size=batch_size,
+            steps_per_epoch=steps_per_epoch, return_indices=return_indices,
+            block_size=block_size, random_state=random_state
+        )
+
+    @staticmethod
+    def npy_files(paths, batch_size, shuffle=False, skip_incomplete=False,
+                  random_state=None, shuffle_chunk_size=None,
+                  shuffle_buffer_size=None, buffer_pool_size=None,
+                  sort_batch_indices=False, restore_batch_order=False):
+        """
+        Construct a :class:`~tfsnippet.dataflow.MmapArrayFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the ``.npy`` files, to be
+                iterated through mini-batches.  These arrays should be
+                at least 1-d, with identical first dimension.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool or str): Whether or not to shuffle data before
+                iterating?  If ``"block"``, use block-shuffling instead of
+                fully random shuffling.  (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling data before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+            shuffle_chunk_size (int): Size of each contiguous chunk for
+                block-shuffling.  (default :obj:`None`, `batch_size`)
+            shuffle_buffer_size (int): Size of the shuffle buffer for
+                block-shuffling.  (default :obj:`None`,
+                ``16 * shuffle_chunk_size``)
+            buffer_pool_size (int): If specified, gather the shuffled
+                mini-batches into this number of preallocated buffers for
+                each array.  (default :obj:`None`)
+            sort_batch_indices (bool): Whether or not to sort the indices
+                of each shuffled mini-batch before gathering?
+                (default :obj:`False`)
+            restore_batch_order (bool): Whether or not to permute the items
+                of each mini-batch gathered by sorted indices back to their
+                shuffled order?  (default :obj:`False`)
+
+        Returns:
+            tfsnippet.dataflow.MmapArrayFlow: The data flow from
+                memory-mapped ``.npy`` files.
+        """
+        from .mmap_array_flow import MmapArrayFlow
+        return MmapArrayFlow(
+            paths=paths, batch_size=batch_size, shuffle=shuffle,
+            skip_incomplete=skip_incomplete, random_state=random_state,
+            shuffle_chunk_size=shuffle_chunk_size,
+            shuffle_buffer_size=shuffle_buffer_size,
+            buffer_pool_size=buffer_pool_size,
+            sort_batch_indices=sort_batch_indices,
+            restore_batch_order=restore_batch_order
+        )
+
+    @staticmethod
+    def shard_files(paths, batch_size, keys=None, shuffle=False,
+                    skip_incomplete=False, cycle_length=4, block_length=1,
+                    shuffle_buffer_size=None, prefetch_shards=1,
+                    n_io_threads=None, random_state=None):
+        """
+        Construct a :class:`~tfsnippet.dataflow.ShardFileFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the ``.npy`` or ``.npz`` shard
+                files.
+            batch_size (int): Size of each mini-batch.
+            keys (Iterable[str]): Names of the arrays to read from each
+                ``.npz`` file.  (default :obj:`None`, all the arrays in the
+                first shard file)
+            shuffle (bool): Whether or not to shuffle the shard order
+                before each epoch? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            cycle_length (int): Number of shards to interleave at the same
+                time. (default 4)
+            block_length (int): Number of consecutive rows to take from
+                each shard in turn. (default 1)
+            shuffle_buffer_size (int): If specified, shuffle the rows
+                through a buffer of this number of rows.
+                (default :obj:`None`)
+            prefetch_shards (int): Number of shards to read ahead of the
+                open shards. (default 1)
+            n_io_threads (int): Number of I/O threads.
+                (default :obj:`None`, ``cycle_length + prefetch_shards``)
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling the shards and the rows, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+
+        Returns:
+            tfsnippet.dataflow.ShardFileFlow: The data flow from the shard
+                files.
+        """
+        from .shard_file_flow import ShardFileFlow
+        return ShardFileFlow(
+            paths=paths, batch_size=batch_size, keys=keys, shuffle=shuffle,
+            skip_incomplete=skip_incomplete, cycle_length=cycle_length,
+            block_length=block_length,
+            shuffle_buffer_size=shuffle_buffer_size,
+            prefetch_shards=prefetch_shards, n_io_threads=n_io_threads,
+            random_state=random_state
+        )
+
+    @staticmethod
+    def files(paths, loader, batch_size, shuffle=False, skip_incomplete=False,
+              n_io_threads=4, prefetch=1, buffer_pool_size=None,
+              random_state=None):
+        """
+        Construct a :class:`~tfsnippet.dataflow.FileListFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the files, one file per item.
+            loader ((str) -> np.ndarray or tuple[np.ndarray]): The function
+                to read and decode a file, called from the I/O threads.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool): Whether or not to shuffle the files before
+                iterating? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            n_io_threads (int): Number of I/O threads. (default 4)
+            prefetch (int): Number of mini-batches to load ahead of the
+                consumer. (default 1)
+            buffer_pool_size (int): If specified, load the mini-batches
+                into preallocated buffers, which are overwritten after
+                `buffer_pool_size` more mini-batches are obtained.
+                (default :obj:`None`, allocate new arrays for each
+                mini-batch)
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling the files before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+
+        Returns:
+            tfsnippet.dataflow.FileListFlow: The data flow from the files.
+        """
+        from .file_list_flow import FileListFlow
+        return FileListFlow(
+            paths=paths, loader=loader, batch_size=batch_size,
+            shuffle=shuffle, skip_incomplete=skip_incomplete,
+            n_io_threads=n_io_threads, prefetch=prefetch,
+            buffer_pool_size=buffer_pool_size, random_state=random_state
         )
 
     @staticmethod
@@ -345,6 +944,11 @@ class ExtraInfoDataFlow(DataFlow):
         """
         return self._data_length
 
+    def length_hint(self):
+        if self._skip_incomplete and self._batch_size:
+            return self._data_length // self._batch_size * self._batch_size
+        return self._data_length
+
     @property
     def data_shapes(self):
         """
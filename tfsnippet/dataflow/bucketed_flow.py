@@ -0,0 +1,232 @@
+import numpy as np
+
+from .base import DataFlow
+
+__all__ = ['BucketedFlow']
+
+
+class BucketedFlow(DataFlow):
+    """
+    Using variable-length sequences as data source flow, grouping the
+    sequences of similar lengths into mini-batches.
+
+    The sequences are assigned into buckets according to their lengths,
+    and each mini-batch is drawn from a single bucket.  Each mini-batch is
+    then padded only to the maximum length within itself, instead of the
+    maximum length of the whole dataset, which saves most of the compute
+    wasted on padding.
+
+    Usage::
+
+        # `x` is a list of 1-d token arrays, `y` is an array of labels
+        flow = DataFlow.bucketed(
+            [x], batch_size=64, bucket_boundaries=[10, 20, 40, 80],
+            aux_arrays=[y], shuffle=True, with_mask=True
+        )
+        for batch_x, batch_y, batch_mask in flow:
+            # batch_x.shape == (64, max_length_of_this_batch)
+            # batch_mask.shape == (64, max_length_of_this_batch)
+            ...
+
+    Each mini-batch contains the padded sequence arrays, followed by the
+    auxiliary arrays, and then the mask array if `with_mask` is
+    :obj:`True`.  The sequence arrays may be lists of arrays, whose first
+    dimensions are the sequence lengths, or already padded numpy arrays
+    with the sequence dimension as the second axis (in which case the
+    `lengths` must be specified, and the padding positions are taken
+    from the arrays as they are).
+
+    If `shuffle` is :obj:`True`, the sequences are shuffled within each
+    bucket, and the mini-batches are shuffled across the buckets, before
+    each epoch.  Otherwise the mini-batches are produced bucket by bucket,
+    in the order of the sequences within each bucket.
+    """
+
+    def __init__(self, sequences, batch_size, bucket_boundaries, lengths=None,
+                 aux_arrays=None, shuffle=False, skip_incomplete=False,
+                 random_state=None, pad_value=0, with_mask=False,
+                 mask_dtype=np.float32):
+        """
+        Construct a :class:`BucketedFlow`.
+
+        Args:
+            sequences: List of sequence arrays.  Each sequence array should
+                be either a list of numpy arrays, whose first dimensions are
+                the sequence lengths, or a padded numpy-like array, whose
+                second dimension is the sequence dimension.
+            batch_size (int): Size of each mini-batch.
+            bucket_boundaries (Iterable[int]): The increasing boundaries of
+                the buckets.  ``k`` boundaries produce ``k + 1`` buckets:
+                ``length < b[0]``, ``b[0] <= length < b[1]``, ...,
+                ``length >= b[k-1]``.
+            lengths (np.ndarray): The lengths of the sequences.  Required
+                if none of the sequence arrays is a list of arrays.
+                (default :obj:`None`, inferred from the sequence arrays)
+            aux_arrays: List of numpy-like arrays, whose rows should be
+                gathered along with the sequences, without padding.
+                (default :obj:`None`)
+            shuffle (bool): Whether or not to shuffle the sequences within
+                the buckets, and the mini-batches across the buckets,
+                before each epoch? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch of each bucket if it is incomplete?
+                (default :obj:`False`)
+            random_state (RandomState): Optional numpy RandomState for
+                shuffling data before each epoch.  (default :obj:`None`,
+                use the global :class:`RandomState`).
+            pad_value: The value for padding the lists of arrays.
+                (default 0)
+            with_mask (bool): Whether or not to produce a mask array of
+                shape ``(batch_size, max_length)`` at the end of each
+                mini-batch, indicating the valid positions?
+                (default :obj:`False`)
+            mask_dtype: The data type of the mask array.
+                (default ``np.float32``)
+        """
+        # validate parameters
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1.')
+        sequences = tuple(sequences)
+        if not sequences:
+            raise ValueError('`sequences` must not be empty.')
+        aux_arrays = tuple(aux_arrays or ())
+
+        if lengths is None:
+            for seq in sequences:
+                if isinstance(seq, (list, tuple)):
+                    lengths = np.asarray([len(s) for s in seq], dtype=np.int64)
+                    break
+            else:
+                raise ValueError('`lengths` must be specified, since it '
+                                 'cannot be inferred from padded arrays.')
+        lengths = np.asarray(lengths)
+        if len(lengths.shape) != 1:
+            raise ValueError('`lengths` must be a 1-d array.')
+        for a in sequences + aux_arrays:
+            if len(a) != len(lengths):
+                raise ValueError('`sequences`, `aux_arrays` and `lengths` '
+                                 'must have the same data length.')
+
+        bucket_boundaries = tuple(bucket_boundaries)
+        if any(a >= b for a, b in zip(bucket_boundaries[:-1],
+                                      bucket_boundaries[1:])):
+            raise ValueError('`bucket_boundaries` must be increasing.')
+
+        # memorize the parameters
+        self._sequences = sequences
+        self._aux_arrays = aux_arrays
+        self._lengths = lengths
+        self._bucket_boundaries = bucket_boundaries
+        self._batch_size = batch_size
+        self._is_shuffled = shuffle
+        self._skip_incomplete = skip_incomplete
+        self._random_state = random_state or np.random
+        self._pad_value = pad_value
+        self._with_mask = with_mask
+        self._mask_dtype = mask_dtype
+
+        # assign the sequences into buckets
+        bucket_ids = np.searchsorted(
+            np.asarray(bucket_boundaries, dtype=lengths.dtype), lengths,
+            side='right'
+        )
+        order = np.argsort(bucket_ids, kind='mergesort')
+        counts = np.bincount(bucket_ids, minlength=len(bucket_boundaries) + 1)
+        self._buckets = tuple(np.split(order, np.cumsum(counts)[:-1]))
+
+    @property
+    def lengths(self):
+        """Get the lengths of the sequences."""
+        return self._lengths
+
+    @property
+    def bucket_boundaries(self):
+        """Get the boundaries of the buckets."""
+        return self._bucket_boundaries
+
+    @property
+    def bucket_sizes(self):
+        """Get the number of sequences in each bucket."""
+        return tuple(len(b) for b in self._buckets)
+
+    @property
+    def batch_size(self):
+        """Get the size of each mini-batch."""
+        return self._batch_size
+
+    @property
+    def is_shuffled(self):
+        """Whether or not the data are shuffled before each epoch?"""
+        return self._is_shuffled
+
+    @property
+    def skip_incomplete(self):
+        """
+        Whether or not to exclude the last mini-batch of each bucket if it
+        is incomplete?
+        """
+        return self._skip_incomplete
+
+    @property
+    def with_mask(self):
+        """Whether or not to produce a mask array in each mini-batch?"""
+        return self._with_mask
+
+    def _epoch_batches(self):
+        """
+        Get the indices of the sequences in each mini-batch of an epoch.
+
+        Returns:
+            list[np.ndarray]: The indices of the mini-batches.
+        """
+        batches = []
+        for bucket in self._buckets:
+            if self._is_shuffled:
+                bucket = bucket.copy()
+                self._random_state.shuffle(bucket)
+            for start in range(0, len(bucket), self._batch_size):
+                batch = bucket[start: start + self._batch_size]
+                if len(batch) < self._batch_size and self._skip_incomplete:
+                    break
+                batches.append(batch)
+        if self._is_shuffled:
+            self._random_state.shuffle(batches)
+        return batches
+
+    def _pad(self, seq, indices, max_length):
+        """
+        Gather the sequences at `indices`, padded to `max_length`.
+
+        Args:
+            seq: The sequence array, either a list of arrays, or a padded
+                numpy-like array.
+            indices (np.ndarray): The indices of the sequences.
+            max_length (int): The maximum length of the sequences.
+
+        Returns:
+            np.ndarray: The padded sequences.
+        """
+        if not isinstance(seq, (list, tuple)):
+            return np.asarray(seq[indices, :max_length])
+
+        first = np.asarray(seq[indices[0]])
+        ret = np.full((len(indices), max_length) + first.shape[1:],
+                      self._pad_value, dtype=first.dtype)
+        for i, idx in enumerate(indices):
+            s = seq[idx]
+            ret[i, :len(s)] = s
+        return ret
+
+    def _minibatch_iterator(self):
+        for indices in self._epoch_batches():
+            batch_lengths = self._lengths[indices]
+            max_length = int(np.max(batch_lengths))
+            batch = [self._pad(seq, indices, max_length)
+                     for seq in self._sequences]
+            batch.extend(np.asarray(a[indices]) for a in self._aux_arrays)
+            if self._with_mask:
+                batch.append(
+                    (np.arange(max_length) < batch_lengths[:, None]).
+                    astype(self._mask_dtype)
+                )
+            yield tuple(batch)
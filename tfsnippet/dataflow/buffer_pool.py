@@ -0,0 +1,110 @@
+import numpy as np
+
+__all__ = ['BufferPool']
+
+
+class BufferPool(object):
+    """
+    A pool of preallocated mini-batch buffers, recycled in round-robin.
+
+    This is used by data flows and data mappers to avoid allocating new
+    arrays for every mini-batch.  A buffer obtained from the pool will be
+    overwritten after another `pool_size` buffers are obtained, thus the
+    `pool_size` must be at least the number of mini-batches which may be
+    alive at the same time.  For example, if the mini-batches are consumed
+    by a :class:`ThreadingFlow` with ``prefetch = k``, there might be
+    ``k + 2`` mini-batches alive: ``k`` in the queue, one being enqueued by
+    the background worker, and one being used by the consumer.
+
+    Usage::
+
+        pool = BufferPool(pool_size=4, batch_size=256, data_shape=(784,),
+                          dtype=np.float32)
+        buf = pool.next_buffer(len(indices))
+        np.take(x, indices, axis=0, out=buf, mode='clip')
+    """
+
+    def __init__(self, pool_size, batch_size, data_shape, dtype):
+        """
+        Construct a :class:`BufferPool`.
+
+        Args:
+            pool_size (int): Number of buffers in the pool.
+                It should be at least 1.
+            batch_size (int): Maximum size of each mini-batch.
+            data_shape (tuple[int]): The shape of data in a mini-batch.
+                The batch dimension is not included.
+            dtype (np.dtype): The data type of the buffers.
+        """
+        if pool_size < 1:
+            raise ValueError('`pool_size` must be at least 1')
+        self._pool_size = pool_size
+        self._batch_size = batch_size
+        self._data_shape = tuple(data_shape)
+        self._dtype = np.dtype(dtype)
+        self._buffers = [None] * pool_size
+        self._next_index = 0
+
+    @property
+    def pool_size(self):
+        """Get the number of buffers in the pool."""
+        return self._pool_size
+
+    @property
+    def batch_size(self):
+        """Get the maximum size of each mini-batch."""
+        return self._batch_size
+
+    @property
+    def data_shape(self):
+        """Get the shape of data in a mini-batch."""
+        return self._data_shape
+
+    @property
+    def dtype(self):
+        """Get the data type of the buffers."""
+        return self._dtype
+
+    def next_buffer(self, size=None):
+        """
+        Get the next buffer in the pool.
+
+        The buffers are allocated lazily, and recycled in round-robin.
+
+        Args:
+            size (int): Size of the mini-batch.  It should not be larger
+                than `batch_size`.  (default :obj:`None`, `batch_size`)
+
+        Returns:
+            np.ndarray: A writeable view of the buffer, with shape
+                ``(size,) + data_shape``.
+        """
+        if size is None:
+            size = self._batch_size
+        elif size > self._batch_size:
+            raise ValueError('`size` must not be larger than `batch_size`: '
+                             '{} vs {}.'.format(size, self._batch_size))
+        buf = self._buffers[self._next_index]
+        if buf is None:
+            buf = self._buffers[self._next_index] = np.empty(
+                (self._batch_size,) + self._data_shape, dtype=self._dtype)
+        self._next_index = (self._next_index + 1) % self._pool_size
+        return buf[:size]
+
+
+def _check_buffer_pool_size(source, n_alive):
+    """
+    Check that the mini-batches of `source` will not be overwritten while
+    `n_alive` of them are being used, if `source` recycles its mini-batches
+    in a pool of `buffer_pool_size` buffers.
+
+    Raises:
+        ValueError: If `n_alive` exceeds the `buffer_pool_size` of `source`.
+    """
+    pool_size = getattr(source, 'buffer_pool_size', None)
+    if pool_size is not None and pool_size < n_alive:
+        raise ValueError(
+            'The source flow {!r} recycles its mini-batches in '
+            '`buffer_pool_size` = {} buffers, but up to {} of them may be '
+            'used at the same time.'.format(source, pool_size, n_alive)
+        )
@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from tfsnippet.utils import AutoInitAndCloseable
+from .base import DataFlow
+
+__all__ = ['CacheFlow']
+
+
+class CacheFlow(DataFlow, AutoInitAndCloseable):
+    """
+    Data flow which caches the mini-batches of the source flow.
+
+    The mini-batches are recorded lazily, while the first epoch is being
+    iterated, and are replayed from the cache in the following epochs.
+    Thus an expensive source flow (e.g., with mappers which decode or
+    sample the data) is only iterated once, instead of once per epoch.
+
+    Usage::
+
+        test_flow = DataFlow.arrays([x_test], batch_size=256). \\
+            map(input_x_sampler).cache(max_bytes=2 ** 30)
+
+    If `max_bytes` is specified, the mini-batches are kept in memory until
+    the budget is exceeded, after which the remaining mini-batches are
+    spilled into files under `spill_dir`, and replayed via memory-mapping.
+    The spilled files are removed when the flow is closed.
+
+    If the first epoch is interrupted, the partially recorded mini-batches
+    are discarded, and the next epoch will record again.  The replayed
+    mini-batches are read-only, and are always the same as those from the
+    recorded epoch, thus the source flow should not be shuffled.
+    """
+
+    def __init__(self, source, max_bytes=None, spill_dir=None):
+        """
+        Construct a :class:`CacheFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            max_bytes (int): Maximum number of bytes to be cached in memory.
+                (default :obj:`None`, cache all the mini-batches in memory)
+            spill_dir (str): The directory, where to create the temporary
+                directory for the spilled mini-batches.
+                (default :obj:`None`, the system temporary directory)
+        """
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError('`max_bytes` must be at least 0')
+
+        # memorize the parameters
+        self._source = source
+        self._max_bytes = max_bytes
+        self._spill_dir = spill_dir
+
+        # internal states for the cache
+        self._batches = None
+        self._memory_bytes = 0
+        self._spilled_bytes = 0
+        self._temp_dir = None
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    def length_hint(self):
+        return self._source.length_hint()
+
+    @property
+    def max_bytes(self):
+        """Get the maximum number of bytes to be cached in memory."""
+        return self._max_bytes
+
+    @property
+    def spill_dir(self):
+        """Get the directory for the spilled mini-batches."""
+        return self._spill_dir
+
+    @property
+    def is_cached(self):
+        """Whether or not a complete epoch has been cached?"""
+        return self._batches is not None
+
+    @property
+    def memory_bytes(self):
+        """Get the number of bytes cached in memory."""
+        return self._memory_bytes
+
+    @property
+    def spilled_bytes(self):
+        """Get the number of bytes spilled into files."""
+        return self._spilled_bytes
+
+    def _init(self):
+        pass
+
+    def _close(self):
+        self._clear_cache()
+
+    def _clear_cache(self):
+        self._batches = None
+        self._memory_bytes = self._spilled_bytes = 0
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def _record(self):
+        self._clear_cache()
+        batches = []  # the in-memory batches, or the spilled records
+        spill_files = None
+
+        try:
+            for batch in self._source:
+                batch = tuple(np.asarray(a) for a in batch)
+                nbytes = sum(a.nbytes for a in batch)
+
+                if spill_files is None and (
+                        self._max_bytes is None or
+                        self._memory_bytes + nbytes <= self._max_bytes):
+                    # copy the arrays, since the source flow may re-use
+                    # its buffers for the next mini-batch
+                    cached = tuple(np.array(a, copy=True) for a in batch)
+                    for a in cached:
+                        a.setflags(write=False)
+                    batches.append(cached)
+                    self._memory_bytes += nbytes
+
+                else:
+                    if spill_files is None:
+                        self._temp_dir = tempfile.mkdtemp(
+                            prefix='cache_flow_', dir=self._spill_dir)
+                        spill_files = [
+                            open(os.path.join(self._temp_dir,
+                                              '{}.bin'.format(i)), 'wb')
+                            for i in range(len(batch))
+                        ]
+                    record = []
+                    for f, a in zip(spill_files, batch):
+                        record.append((f.tell(), a.nbytes, a.dtype, a.shape))
+                        np.ascontiguousarray(a).tofile(f)
+                    batches.append(record)
+                    self._spilled_bytes += nbytes
+
+                yield batch
+        finally:
+            if spill_files is not None:
+                for f in spill_files:
+                    f.close()
+
+        # the source flow has been exhausted, memory-map the spilled files
+        if spill_files is not None:
+            mmaps = []
+            for f in spill_files:
+                if os.path.getsize(f.name) > 0:
+                    mmaps.append(np.memmap(f.name, dtype=np.uint8, mode='r'))
+                else:
+                    mmaps.append(np.zeros([0], dtype=np.uint8))
+            for i, b in enumerate(batches):
+                if not isinstance(b, tuple):
+                    batches[i] = tuple(
+                        m[offset: offset + nbytes].view(dtype).reshape(shape)
+                        for m, (offset, nbytes, dtype, shape) in zip(mmaps, b)
+                    )
+        self._batches = batches
+
+    def _minibatch_iterator(self):
+        self.init()
+        if self._batches is not None:
+            for b in self._batches:
+                yield b
+        else:
+            for b in self._record():
+                yield b
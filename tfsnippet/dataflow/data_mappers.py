@@ -1,11 +1,32 @@
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from tfsnippet.utils import AutoInitAndCloseable
 from .base import DataFlow
+from .buffer_pool import BufferPool
 
 __all__ = [
-    'DataMapper', 'SlidingWindow'
+    'DataMapper', 'SlidingWindow', 'CastArrays', 'BernoulliSampler'
 ]
 
 
+def _next_pooled_buffer(pools, key, pool_size, array, dtype):
+    """
+    Get the next preallocated buffer for `array` from ``pools[key]``.
+
+    The buffer pool is (re-)created lazily, whenever a mini-batch is
+    larger than the buffers in the pool, or has a different data shape.
+    """
+    pool = pools.get(key)
+    if pool is None or pool.batch_size < len(array) or \
+            pool.data_shape != array.shape[1:]:
+        pool = pools[key] = BufferPool(
+            pool_size, len(array), array.shape[1:], dtype)
+    return pool.next_buffer(len(array))
+
+
 class DataMapper(object):
     """
     Base class for all data mappers.
@@ -50,9 +71,30 @@ class SlidingWindow(DataMapper):
         # or equivalently
         sw_flow = DataFlow.seq(
             0, len(data) - sw.window_size + 1, batch_size=64).map(sw)
+
+    By default, the windows are gathered by fancy-indexing `data_array`
+    with ``batch_size * window_size`` indices, which allocates a new array
+    for each mini-batch.  If ``strided = True``, a read-only view of all
+    the windows is constructed by :func:`np.lib.stride_tricks.as_strided`
+    (which requires `data_array` to be a :class:`np.ndarray`), such that a
+    mini-batch of contiguous windows (e.g., from a non-shuffled flow) is
+    just a zero-copy slice of this view::
+
+        sw = SlidingWindow(data, window_size=100, strided=True)
+        for [windows] in sw.as_flow(batch_size=64):
+            # `windows` is a read-only view of `data`
+            ...
+
+    For non-contiguous windows (e.g., from a shuffled flow), a copy is
+    unavoidable.  The windows are then copied as whole blocks from the
+    strided view into a newly allocated array.  Alternatively, in either
+    mode, the windows can be gathered by a batched :func:`np.take` into
+    `buffer_pool_size` preallocated buffers, if specified.  See
+    :class:`BufferPool` for choosing the size.
     """
 
-    def __init__(self, data_array, window_size):
+    def __init__(self, data_array, window_size, strided=False,
+                 buffer_pool_size=None):
         """
         Construct a :class:`SlidingWindow`.
 
@@ -60,12 +102,43 @@ class SlidingWindow(DataMapper):
             data_array (np.ndarray): The array from which to extract
                 sliding windows.
             window_size (int): Size of each window.
+            strided (bool): Whether or not to produce the windows from a
+                strided view of `data_array`? (default :obj:`False`)
+            buffer_pool_size (int): If specified, gather the non-contiguous
+                windows into this number of preallocated buffers, which are
+                recycled in round-robin.  A buffer is overwritten after
+                `buffer_pool_size` more mini-batches are produced.
+                (default :obj:`None`, allocate new arrays for each
+                mini-batch)
         """
+        if buffer_pool_size is not None and buffer_pool_size < 1:
+            raise ValueError('`buffer_pool_size` must be at least 1.')
+        if strided and not isinstance(data_array, np.ndarray):
+            raise TypeError('`data_array` must be a numpy array if '
+                            '`strided` is True.')
+
         self._data_array = data_array
         self._window_size = window_size
+        self._strided = strided
+        self._buffer_pool_size = buffer_pool_size
+        self._buffer_pool = None
         offset_dtype = (np.int32 if window_size < (1 << 32) else np.int64)
         self._offset = np.arange(0, window_size, 1, dtype=offset_dtype)
 
+        if strided:
+            # the view of all windows, with the i-th window starting at the
+            # i-th element of `data_array`
+            windows = as_strided(
+                data_array,
+                shape=((max(len(data_array) - window_size + 1, 0),
+                        window_size) + data_array.shape[1:]),
+                strides=(data_array.strides[:1] + data_array.strides)
+            )
+            windows.setflags(write=False)
+            self._windows = windows
+        else:
+            self._windows = None
+
     def as_flow(self, batch_size, shuffle=False, skip_incomplete=False):
         """
         Get a :class:`DataFlow` which iterates through mini-batches of
@@ -99,9 +172,322 @@ class SlidingWindow(DataMapper):
         """Get the window size."""
         return self._window_size
 
+    @property
+    def strided(self):
+        """Whether or not to produce the windows from a strided view?"""
+        return self._strided
+
+    @property
+    def buffer_pool_size(self):
+        """
+        Get the number of preallocated buffers for gathering windows.
+
+        Returns:
+            int or None: The number of buffers, or :obj:`None` if the
+                windows are gathered into newly allocated arrays.
+        """
+        return self._buffer_pool_size
+
+    def _next_buffer(self, size):
+        """
+        Get the next preallocated buffer for `size` windows.
+
+        The buffer pool is (re-)created lazily, whenever a mini-batch is
+        larger than the buffers in the pool.
+        """
+        pool = self._buffer_pool
+        if pool is None or pool.batch_size < size:
+            pool = self._buffer_pool = BufferPool(
+                self._buffer_pool_size, size,
+                (self._window_size,) + self._data_array.shape[1:],
+                self._data_array.dtype
+            )
+        return pool.next_buffer(size)
+
     def _transform(self, indices):
-        return (
-            self._data_array[
-                indices.reshape(indices.shape + (1,)) + self._offset
-            ],
+        indices = np.asarray(indices)
+        if self._strided:
+            # contiguous windows are produced as a slice of the strided view
+            if len(indices.shape) == 1 and len(indices) > 0:
+                start = int(indices[0])
+                if 0 <= start and \
+                        start + len(indices) <= len(self._windows) and \
+                        np.all(np.diff(indices) == 1):
+                    return (self._windows[start: start + len(indices)],)
+            # fancy-indexing the strided view copies each window as a whole
+            if self._buffer_pool_size is None:
+                return (self._windows[indices],)
+
+        window_indices = indices.reshape(indices.shape + (1,)) + self._offset
+        if self._buffer_pool_size is None:
+            return (self._data_array[window_indices],)
+
+        # the windows are gathered from `data_array` rather than the strided
+        # view, since `np.take` would otherwise check the memory overlap
+        # between `out` and the self-overlapping view, which is very slow.
+        # `mode='clip'` avoids the internal buffering of `np.take`, while
+        # out-of-range indices are checked beforehand.
+        if window_indices.size > 0 and (
+                np.min(window_indices) < 0 or
+                np.max(window_indices) >= len(self._data_array)):
+            raise IndexError('`indices` out of range.')
+        buf = self._next_buffer(indices.size).reshape(
+            window_indices.shape + self._data_array.shape[1:])
+        np.take(self._data_array, window_indices, axis=0, out=buf,
+                mode='clip')
+        buf.setflags(write=False)
+        return (buf,)
+
+
+class CastArrays(DataMapper):
+    """
+    :class:`DataMapper` for converting the arrays of each mini-batch into
+    another data type, with optional scaling and shifting, i.e.,
+    ``x.astype(dtype) * scale + shift``.
+
+    This allows keeping a dataset in its compact data type (e.g., the
+    ``uint8`` pixels of images), and converting only the mini-batches.
+    For example, to normalize the MNIST digits into ``float32`` values
+    within ``[0, 1]``::
+
+        (x_train, y_train), _ = load_mnist()
+        train_flow = DataFlow.arrays([x_train, y_train], batch_size=64). \\
+            cast(np.float32, scale=1. / 255, indices=[0])
+
+    If `buffer_pool_size` is specified, the mini-batches are converted into
+    this number of preallocated buffers for each array, which are recycled
+    in round-robin.  See :class:`BufferPool` for choosing the size.
+    """
+
+    def __init__(self, dtype, scale=None, shift=None, indices=None,
+                 buffer_pool_size=None):
+        """
+        Construct a :class:`CastArrays`.
+
+        Args:
+            dtype (np.dtype): The data type to convert the arrays into.
+            scale: If specified, multiply the converted arrays by this.
+            shift: If specified, add this to the converted (and scaled)
+                arrays.
+            indices (Iterable[int]): The indices of the arrays to convert
+                in each mini-batch. (default :obj:`None`, all the arrays)
+            buffer_pool_size (int): If specified, convert the mini-batches
+                into this number of preallocated buffers for each array,
+                which are recycled in round-robin.  A buffer is overwritten
+                after `buffer_pool_size` more mini-batches are produced.
+                (default :obj:`None`, allocate new arrays for each
+                mini-batch)
+        """
+        if buffer_pool_size is not None and buffer_pool_size < 1:
+            raise ValueError('`buffer_pool_size` must be at least 1.')
+        self._dtype = np.dtype(dtype)
+        self._scale = scale
+        self._shift = shift
+        self._indices = (frozenset(indices) if indices is not None
+                         else None)
+        self._buffer_pool_size = buffer_pool_size
+        self._buffer_pools = {}
+
+    @property
+    def dtype(self):
+        """Get the data type to convert the arrays into."""
+        return self._dtype
+
+    @property
+    def scale(self):
+        """Get the scale to multiply the converted arrays by."""
+        return self._scale
+
+    @property
+    def shift(self):
+        """Get the shift to add to the converted arrays."""
+        return self._shift
+
+    @property
+    def buffer_pool_size(self):
+        """
+        Get the number of preallocated buffers for each array.
+
+        Returns:
+            int or None: The number of buffers, or :obj:`None` if the
+                arrays are converted into newly allocated arrays.
+        """
+        return self._buffer_pool_size
+
+    def _convert(self, index, array):
+        array = np.asarray(array)
+        if self._scale is None and self._shift is None and \
+                array.dtype == self._dtype:
+            return array
+
+        if self._buffer_pool_size is None:
+            buf = np.array(array, dtype=self._dtype)
+        else:
+            buf = _next_pooled_buffer(self._buffer_pools, index,
+                                      self._buffer_pool_size, array,
+                                      self._dtype)
+            np.copyto(buf, array, casting='unsafe')
+        if self._scale is not None:
+            np.multiply(buf, self._scale, out=buf, casting='unsafe')
+        if self._shift is not None:
+            np.add(buf, self._shift, out=buf, casting='unsafe')
+        if self._buffer_pool_size is not None:
+            buf.setflags(write=False)
+        return buf
+
+    def _transform(self, *arrays):
+        return tuple(
+            self._convert(i, a)
+            if self._indices is None or i in self._indices else a
+            for i, a in enumerate(arrays)
+        )
+
+
+class BernoulliSampler(DataMapper, AutoInitAndCloseable):
+    """
+    :class:`DataMapper` for binarizing probabilities by Bernoulli sampling,
+    i.e., each output element is 1 with the probability of the input
+    element, and 0 otherwise.
+
+    This is typically used for the dynamic binarization of the MNIST digits,
+    normalized into ``[0, 1]``::
+
+        train_flow = DataFlow.arrays([x_train], batch_size=64). \\
+            map(BernoulliSampler())
+
+    The random numbers are drawn by NumPy from `random_state`.  For large
+    mini-batches, the sampling can be split into chunks, and run in
+    `n_threads` worker threads, each with its own :class:`RandomState`
+    derived from `random_state`.  The worker threads are started on the
+    first use, and should be terminated by :meth:`close` (or by using the
+    sampler as a context manager)::
+
+        with BernoulliSampler(n_threads=4) as sampler:
+            for [batch_x] in train_flow.map(sampler):
+                ...
+
+    If `buffer_pool_size` is specified, the samples are written into this
+    number of preallocated buffers for each array, which are recycled in
+    round-robin.  See :class:`BufferPool` for choosing the size.
+    """
+
+    def __init__(self, dtype=np.int32, indices=None, random_state=None,
+                 n_threads=None, min_thread_size=65536,
+                 buffer_pool_size=None):
+        """
+        Construct a :class:`BernoulliSampler`.
+
+        Args:
+            dtype (np.dtype): The data type of the samples.
+                (default ``np.int32``)
+            indices (Iterable[int]): The indices of the arrays to sample
+                in each mini-batch. (default :obj:`None`, all the arrays)
+            random_state (RandomState): Optional numpy RandomState for
+                sampling.  (default :obj:`None`, use the global
+                :class:`RandomState`)
+            n_threads (int): If specified, split the sampling of each
+                mini-batch into this number of chunks, sampled in worker
+                threads. (default :obj:`None`, sample in the caller thread)
+            min_thread_size (int): Minimum number of elements in a
+                mini-batch, to be sampled in the worker threads.
+                (default 65536)
+            buffer_pool_size (int): If specified, write the samples into
+                this number of preallocated buffers for each array, which
+                are recycled in round-robin.  A buffer is overwritten after
+                `buffer_pool_size` more mini-batches are produced.
+                (default :obj:`None`, allocate new arrays for each
+                mini-batch)
+        """
+        if n_threads is not None and n_threads < 1:
+            raise ValueError('`n_threads` must be at least 1.')
+        if buffer_pool_size is not None and buffer_pool_size < 1:
+            raise ValueError('`buffer_pool_size` must be at least 1.')
+        self._dtype = np.dtype(dtype)
+        self._indices = (frozenset(indices) if indices is not None
+                         else None)
+        self._random_state = random_state or np.random
+        self._n_threads = n_threads
+        self._min_thread_size = min_thread_size
+        self._buffer_pool_size = buffer_pool_size
+        self._buffer_pools = {}
+
+        # the random states and the pool of the worker threads
+        self._thread_random_states = None
+        self._thread_pool = None
+
+    @property
+    def dtype(self):
+        """Get the data type of the samples."""
+        return self._dtype
+
+    @property
+    def n_threads(self):
+        """Get the number of worker threads, or :obj:`None` if disabled."""
+        return self._n_threads
+
+    @property
+    def buffer_pool_size(self):
+        """
+        Get the number of preallocated buffers for each array.
+
+        Returns:
+            int or None: The number of buffers, or :obj:`None` if the
+                samples are written into newly allocated arrays.
+        """
+        return self._buffer_pool_size
+
+    def _init(self):
+        if self._n_threads is not None:
+            self._thread_random_states = [
+                np.random.RandomState(
+                    self._random_state.randint(0, 2 ** 31 - 1))
+                for _ in range(self._n_threads)
+            ]
+            self._thread_pool = ThreadPool(self._n_threads)
+
+    def _close(self):
+        try:
+            if self._thread_pool is not None:
+                self._thread_pool.terminate()
+                self._thread_pool.join()
+        finally:
+            self._thread_pool = None
+            self._thread_random_states = None
+
+    @staticmethod
+    def _sample_chunk(random_state, probs, out):
+        uniform = random_state.random_sample(probs.shape)
+        np.less(uniform, probs, out=out, casting='unsafe')
+
+    def _sample(self, index, probs):
+        probs = np.asarray(probs)
+        if self._buffer_pool_size is None:
+            out = np.empty(probs.shape, dtype=self._dtype)
+        else:
+            out = _next_pooled_buffer(self._buffer_pools, index,
+                                      self._buffer_pool_size, probs,
+                                      self._dtype)
+
+        if self._n_threads is None or probs.size < self._min_thread_size:
+            self._sample_chunk(self._random_state, probs, out)
+        else:
+            self.init()
+            bounds = np.linspace(0, len(probs), self._n_threads + 1). \
+                astype(np.int64)
+            self._thread_pool.map(
+                lambda args: self._sample_chunk(*args),
+                [(rs, probs[a: b], out[a: b])
+                 for rs, a, b in zip(self._thread_random_states,
+                                     bounds[:-1], bounds[1:])]
+            )
+
+        if self._buffer_pool_size is not None:
+            out.setflags(write=False)
+        return out
+
+    def _transform(self, *arrays):
+        return tuple(
+            self._sample(i, a)
+            if self._indices is None or i in self._indices else a
+            for i, a in enumerate(arrays)
         )
@@ -0,0 +1,269 @@
+from collections import deque
+from functools import partial
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from tfsnippet.utils import (AutoInitAndCloseable, RandomStreams,
+                             minibatch_slices_iterator)
+from .base import ExtraInfoDataFlow
+from .buffer_pool import BufferPool
+
+__all__ = ['FileListFlow']
+
+
+def _load_arrays(loader, path):
+    """Load the arrays of a file, as a tuple of numpy arrays."""
+    arrays = loader(path)
+    if not isinstance(arrays, (tuple, list)):
+        arrays = (arrays,)
+    return tuple(np.asarray(a) for a in arrays)
+
+
+class FileListFlow(ExtraInfoDataFlow, AutoInitAndCloseable):
+    """
+    Using a list of files as data source flow, each file being one data
+    item (e.g., an image, or a per-example ``.npy`` file).
+
+    The files are read and decoded by a `loader` function, running in a
+    pool of I/O threads, such that the reading of many small files (e.g.,
+    from network storage) is overlapped.  Each mini-batch is assembled in
+    order, by writing the decoded items directly into the rows of the batch
+    arrays, and the next `prefetch` mini-batches are being loaded while the
+    current one is consumed.  The batch arrays are newly allocated for each
+    mini-batch, unless `buffer_pool_size` is specified, in which case they
+    are recycled from a :class:`BufferPool`.  In either case, the batch
+    arrays are read-only.
+
+    Usage::
+
+        def load_image(path):
+            with open(path, 'rb') as f:
+                return np.asarray(Image.open(f).convert('RGB'))
+
+        with DataFlow.files(image_paths, load_image, batch_size=64,
+                            shuffle=True, n_io_threads=16) as df:
+            for epoch in epochs:
+                for [batch_x] in df:
+                    ...
+
+    The loader should return a numpy array, or a tuple of numpy arrays,
+    for each file.  The first file is loaded at construction, to determine
+    the count, the shapes and the data types of the arrays.  All the other
+    files must produce arrays of the same count and shapes.  The loader is
+    called from multiple threads simultaneously, thus it must be
+    thread-safe.  It is most effective if it releases the GIL for most of
+    its time, e.g., doing file I/O or calling native decoders.
+    """
+
+    def __init__(self, paths, loader, batch_size, shuffle=False,
+                 skip_incomplete=False, n_io_threads=4, prefetch=1,
+                 buffer_pool_size=None, random_state=None):
+        """
+        Construct a :class:`FileListFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the files, one file per item.
+            loader ((str) -> np.ndarray or tuple[np.ndarray]): The function
+                to read and decode a file.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool): Whether or not to shuffle the files before
+                iterating? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            n_io_threads (int): Number of I/O threads. (default 4)
+            prefetch (int): Number of mini-batches to load ahead of the
+                consumer.  It should be at least 0. (default 1)
+            buffer_pool_size (int): If specified, load the mini-batches
+                into preallocated buffers, which are recycled in
+                round-robin.  A buffer is overwritten after
+                `buffer_pool_size` more mini-batches are obtained by the
+                consumer, since another ``prefetch + 1`` buffers are kept
+                for the mini-batches being loaded.  (default :obj:`None`,
+                allocate new arrays for each mini-batch)
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling the files before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+        """
+        # validate parameters
+        paths = tuple(paths)
+        if not paths:
+            raise ValueError('`paths` must not be empty.')
+        if n_io_threads < 1:
+            raise ValueError('`n_io_threads` must be at least 1.')
+        if prefetch < 0:
+            raise ValueError('`prefetch` must be at least 0.')
+        if buffer_pool_size is not None and buffer_pool_size < 1:
+            raise ValueError('`buffer_pool_size` must be at least 1.')
+
+        # load the first file to determine the shapes and types of data
+        arrays = _load_arrays(loader, paths[0])
+
+        # memorize the parameters
+        super(FileListFlow, self).__init__(
+            array_count=len(arrays),
+            data_length=len(paths),
+            data_shapes=tuple(a.shape for a in arrays),
+            batch_size=batch_size,
+            skip_incomplete=skip_incomplete,
+            is_shuffled=bool(shuffle)
+        )
+        self._paths = paths
+        self._loader = loader
+        self._dtypes = tuple(a.dtype for a in arrays)
+        self._n_io_threads = n_io_threads
+        self._prefetch = prefetch
+        self._buffer_pool_size = buffer_pool_size
+        self._random_state = random_state or np.random
+        if buffer_pool_size is not None:
+            self._buffer_pools = tuple(
+                BufferPool(prefetch + 1 + buffer_pool_size, batch_size,
+                           a.shape, a.dtype)
+                for a in arrays
+            )
+        else:
+            self._buffer_pools = None
+
+        # internal states
+        self._pool = None
+        self._indices_buffer = None
+        self._epoch_counter = 0
+
+    @property
+    def paths(self):
+        """Get the paths of the files."""
+        return self._paths
+
+    @property
+    def loader(self):
+        """Get the function to read and decode a file."""
+        return self._loader
+
+    @property
+    def dtypes(self):
+        """Get the data types of the arrays in each mini-batch."""
+        return self._dtypes
+
+    @property
+    def n_io_threads(self):
+        """Get the number of I/O threads."""
+        return self._n_io_threads
+
+    @property
+    def prefetch(self):
+        """Get the number of mini-batches to load ahead of the consumer."""
+        return self._prefetch
+
+    @property
+    def buffer_pool_size(self):
+        """
+        Get the number of mini-batches the consumer may hold before the
+        preallocated buffers are recycled.
+
+        Returns:
+            int or None: The number of mini-batches, or :obj:`None` if the
+                buffer pool is not enabled.
+        """
+        return self._buffer_pool_size
+
+    def _init(self):
+        self._pool = ThreadPool(self._n_io_threads)
+
+    def _close(self):
+        try:
+            self._pool.terminate()
+            self._pool.join()
+        finally:
+            self._pool = None
+
+    def _load_into(self, buffers, task):
+        """Load the file of `task` into a row of the `buffers`."""
+        row, path = task
+        arrays = _load_arrays(self._loader, path)
+        if len(arrays) != len(buffers):
+            raise ValueError('Expected {} arrays from file {!r}, got {}.'.
+                             format(len(buffers), path, len(arrays)))
+        for buf, a in zip(buffers, arrays):
+            if a.shape != buf.shape[1:]:
+                raise ValueError(
+                    'Shape mismatch: expected data shape {!r} from file '
+                    '{!r}, got {!r}.'.format(buf.shape[1:], path, a.shape)
+                )
+            buf[row] = a
+
+    def _submit(self, indices):
+        """
+        Submit a mini-batch of files to the I/O threads.
+
+        Args:
+            indices (np.ndarray): The indices of the files.
+
+        Returns:
+            (tuple[np.ndarray], AsyncResult): The batch arrays being filled,
+                and the asynchronous result of the loading tasks.
+        """
+        if self._buffer_pools is None:
+            buffers = tuple(
+                np.empty((len(indices),) + shape, dtype=dtype)
+                for shape, dtype in zip(self.data_shapes, self._dtypes)
+            )
+        else:
+            buffers = tuple(pool.next_buffer(len(indices))
+                            for pool in self._buffer_pools)
+        tasks = [(row, self._paths[i]) for row, i in enumerate(indices)]
+        chunk_size = max(1, len(tasks) // self._n_io_threads)
+        result = self._pool.map_async(
+            partial(self._load_into, buffers), tasks, chunksize=chunk_size)
+        return buffers, result
+
+    def _minibatch_iterator(self):
+        self.init()
+
+        # shuffle the files if necessary
+        if self._indices_buffer is None:
+            t = np.int32 if self.data_length < (1 << 31) else np.int64
+            self._indices_buffer = np.arange(self.data_length, dtype=t)
+        if self.is_shuffled:
+            if isinstance(self._random_state, RandomStreams):
+                random_state = self._random_state.stream(self._epoch_counter)
+                self._epoch_counter += 1
+                self._indices_buffer[:] = np.arange(self.data_length)
+            else:
+                random_state = self._random_state
+            random_state.shuffle(self._indices_buffer)
+        indices = self._indices_buffer
+
+        # submit the mini-batches, keeping `prefetch` of them ahead of
+        # the one being consumed
+        slices = minibatch_slices_iterator(
+            length=self.data_length, batch_size=self.batch_size,
+            skip_incomplete=self.skip_incomplete
+        )
+        pending = deque()
+
+        def submit_next():
+            s = next(slices, None)
+            if s is not None:
+                pending.append(self._submit(indices[s]))
+
+        pool = self._pool
+        try:
+            for _ in range(self._prefetch + 1):
+                submit_next()
+
+            while pending:
+                buffers, result = pending.popleft()
+                result.get()  # wait for the mini-batch, and re-raise any error
+                submit_next()
+                for buf in buffers:
+                    buf.setflags(write=False)
+                yield buffers
+        finally:
+            # if the epoch is interrupted, wait for the submitted mini-batches,
+            # such that they do not write into the recycled buffers of the
+            # next epoch.  The results of a terminated pool never arrive.
+            if self._pool is pool:
+                for _, result in pending:
+                    result.wait()
@@ -1,4 +1,14 @@
+from threading import Thread
+
+import six
+
 from .base import DataFlow
+from .buffer_pool import _check_buffer_pool_size
+
+if six.PY2:
+    from Queue import Queue, Empty
+else:
+    from queue import Queue, Empty
 
 __all__ = ['GatherFlow']
 
@@ -12,9 +22,18 @@ class GatherFlow(DataFlow):
         x_flow = DataFlow.arrays([x], batch_size=256)
         y_flow = DataFlow.arrays([y], batch_size=256)
         xy_flow = DataFlow.gather([x_flow, y_flow])
+
+    If ``parallel = True``, each of the data flows is iterated in its own
+    background thread during an epoch, and the mini-batches are joined in
+    the consumer thread, such that the time taken to obtain a gathered
+    mini-batch is the maximum (instead of the sum) of the time taken by
+    the data flows.  This is useful if the data flows read from different
+    storage backends, or the data flows release the GIL for most of their
+    time.  In either mode, the iteration stops as soon as any one of the
+    data flows is exhausted.
     """
 
-    def __init__(self, flows):
+    def __init__(self, flows, parallel=False, prefetch=1):
         """
         Construct an :class:`IteratorFlow`.
 
@@ -22,6 +41,12 @@ class GatherFlow(DataFlow):
             flows(Iterable[DataFlow]): The data flows to gather.
                 At least one data flow should be specified, otherwise a
                 :class:`ValueError` will be raised.
+            parallel (bool): Whether or not to iterate the data flows
+                in parallel background threads? (default :obj:`False`)
+            prefetch (int): Number of mini-batches to prefetch ahead from
+                each of the data flows, in parallel mode.  If a data flow
+                recycles its mini-batches in `buffer_pool_size` buffers,
+                it must not exceed ``buffer_pool_size - 2``. (default 1)
 
         Raises:
             ValueError: If not even one data flow is specified.
@@ -33,7 +58,21 @@ class GatherFlow(DataFlow):
         for flow in flows:
             if not isinstance(flow, DataFlow):
                 raise TypeError('Not a DataFlow: {!r}'.format(flow))
+        if prefetch < 1:
+            raise ValueError('`prefetch` must be at least 1')
+        if parallel:
+            # `prefetch` mini-batches in the queue, one being enqueued by
+            # the worker, and one being used by the consumer
+            for flow in flows:
+                _check_buffer_pool_size(flow, prefetch + 2)
         self._flows = flows
+        self._parallel = parallel
+        self._prefetch = prefetch
+
+        # internal states for checkpointing
+        self._epoch_position = None  # number of yielded batches in the epoch
+        self._flow_states = None  # states of the flows, in parallel mode
+        self._is_resuming = False
 
     @property
     def flows(self):
@@ -45,6 +84,109 @@ class GatherFlow(DataFlow):
         """
         return self._flows
 
+    @property
+    def parallel(self):
+        """Whether or not to iterate the data flows in parallel?"""
+        return self._parallel
+
+    @property
+    def prefetch(self):
+        """Get the number of mini-batches to prefetch from each flow."""
+        return self._prefetch
+
+    def get_state(self):
+        if self._flow_states is not None:
+            # the flows have gone ahead in parallel mode, so use the states
+            # recorded along with the yielded mini-batches
+            flow_states = [s if s is not None else f.get_state()
+                           for f, s in zip(self._flows, self._flow_states)]
+        else:
+            flow_states = [f.get_state() for f in self._flows]
+        return {'position': self._epoch_position or 0, 'flows': flow_states}
+
+    def set_state(self, state):
+        for flow, flow_state in zip(self._flows, state['flows']):
+            flow.set_state(flow_state)
+        self._epoch_position = state['position']
+        self._is_resuming = True
+
     def _minibatch_iterator(self):
-        for batches in zip(*self._flows):
-            yield sum([tuple(b) for b in batches], ())
+        if not self._is_resuming:
+            self._epoch_position = 0
+        self._is_resuming = False
+
+        try:
+            if self._parallel:
+                for b in self._parallel_minibatch_iterator():
+                    self._epoch_position += 1
+                    yield b
+            else:
+                for batches in zip(*self._flows):
+                    self._epoch_position += 1
+                    yield sum([tuple(b) for b in batches], ())
+        finally:
+            self._epoch_position = None
+
+    def _parallel_minibatch_iterator(self):
+        # the workers of the current epoch.  New queues are used for each
+        # epoch, such that the late batches of an interrupted epoch are
+        # discarded.
+        stopping = [False]
+        queues = [Queue(self._prefetch) for _ in self._flows]
+
+        def worker_func(flow, queue):
+            try:
+                # record the state of the flow along with each mini-batch,
+                # if the flow supports checkpointing
+                try:
+                    flow.get_state()
+                    has_state = True
+                except NotImplementedError:
+                    has_state = False
+
+                for b in flow:
+                    if stopping[0]:
+                        return
+                    state = flow.get_state() if has_state else None
+                    queue.put((True, (tuple(b), state)))
+            except Exception as ex:
+                queue.put((False, ex))
+            else:
+                # put the epoch ending mark into the queue
+                queue.put((True, None))
+
+        workers = []
+        for flow, queue in zip(self._flows, queues):
+            worker = Thread(target=worker_func, args=(flow, queue))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        try:
+            while True:
+                batches = []
+                flow_states = []
+                for queue in queues:
+                    success, payload = queue.get()
+                    if not success:
+                        raise payload
+                    if payload is None:
+                        return
+                    batches.append(payload[0])
+                    flow_states.append(payload[1])
+                self._flow_states = flow_states
+                yield sum(batches, ())
+        finally:
+            self._flow_states = None
+
+            # prevent the workers from further work, and exhaust the
+            # remaining queue items to notify the blocked workers
+            stopping[0] = True
+            for worker, queue in zip(workers, queues):
+                while worker.is_alive():
+                    try:
+                        while True:
+                            queue.get_nowait()
+                    except Empty:
+                        pass
+                    worker.join(.01)
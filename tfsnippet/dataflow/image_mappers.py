@@ -0,0 +1,326 @@
+import numpy as np
+
+from .data_mappers import DataMapper
+
+__all__ = [
+    'ImageMapper', 'RandomCrop', 'RandomShift', 'RandomFlip',
+    'NormalizeChannels',
+]
+
+
+def _pair(value, name):
+    """Convert `value` into a pair of integers."""
+    if isinstance(value, (tuple, list)):
+        value = tuple(int(v) for v in value)
+        if len(value) != 2:
+            raise ValueError('`{}` must be an integer or a pair of integers: '
+                             'got {!r}.'.format(name, value))
+        return value
+    return int(value), int(value)
+
+
+class ImageMapper(DataMapper):
+    """
+    Base class for the data mappers which transform mini-batches of images.
+
+    The images are 4-d arrays, in the shape of ``(N, H, W, C)`` if
+    `channels_last` is :obj:`True`, or ``(N, C, H, W)`` otherwise.
+    The whole mini-batch of images is transformed at once, by vectorized
+    NumPy operations instead of per-image Python loops.  The mappers can
+    be chained in a single :meth:`~tfsnippet.dataflow.DataFlow.map`, e.g.::
+
+        train_flow = DataFlow.arrays([x_train, y_train], batch_size=64,
+                                     shuffle=True)
+        train_flow = train_flow.map(RandomCrop(32, padding=4)). \\
+            map(RandomFlip()). \\
+            map(NormalizeChannels(mean=[125.3, 123.0, 113.9],
+                                  std=[63.0, 62.1, 66.7]))
+    """
+
+    def __init__(self, channels_last=True, indices=(0,), random_state=None):
+        """
+        Construct a :class:`ImageMapper`.
+
+        Args:
+            channels_last (bool): Whether or not the channel axis is the
+                last axis of the images? (default :obj:`True`)
+            indices (Iterable[int]): The indices of the image arrays in
+                each mini-batch. (default ``(0,)``, the first array)
+            random_state (RandomState): Optional numpy RandomState for
+                the random transformations.  (default :obj:`None`,
+                use the global :class:`RandomState`)
+        """
+        self._channels_last = bool(channels_last)
+        self._indices = frozenset(indices)
+        self._random_state = random_state or np.random
+
+    @property
+    def channels_last(self):
+        """Whether or not the channel axis is the last axis of the images?"""
+        return self._channels_last
+
+    @property
+    def spatial_axes(self):
+        """Get the axes of the height and the width of the images."""
+        return (1, 2) if self._channels_last else (2, 3)
+
+    def _transform_images(self, images):
+        """
+        Subclasses should override this to transform a mini-batch of images.
+
+        Args:
+            images (np.ndarray): The 4-d array of images.
+
+        Returns:
+            np.ndarray: The transformed images.
+        """
+        raise NotImplementedError()
+
+    def _transform(self, *arrays):
+        ret = []
+        for i, a in enumerate(arrays):
+            if i in self._indices:
+                a = np.asarray(a)
+                if len(a.shape) != 4:
+                    raise ValueError('The images must be 4-d arrays: got '
+                                     'shape {!r}.'.format(a.shape))
+                a = self._transform_images(a)
+            ret.append(a)
+        return tuple(ret)
+
+    def _crop(self, images, offset_y, offset_x, height, width):
+        """
+        Crop each image at its own offset, by a single fancy-indexing.
+
+        Args:
+            images (np.ndarray): The 4-d array of images.
+            offset_y (np.ndarray): The top offsets of the crops.
+            offset_x (np.ndarray): The left offsets of the crops.
+            height (int): The height of the crops.
+            width (int): The width of the crops.
+
+        Returns:
+            np.ndarray: The cropped images.
+        """
+        n = np.arange(len(images))
+        rows = offset_y[:, None] + np.arange(height)
+        cols = offset_x[:, None] + np.arange(width)
+        if self._channels_last:
+            return images[n[:, None, None], rows[:, :, None], cols[:, None, :]]
+        channels = np.arange(images.shape[1])
+        return images[n[:, None, None, None], channels[None, :, None, None],
+                      rows[:, None, :, None], cols[:, None, None, :]]
+
+    def _pad(self, images, padding):
+        """Pad the height and the width of the images with zeros."""
+        pad_y, pad_x = padding
+        if not pad_y and not pad_x:
+            return images
+        pad_width = [(0, 0)] * 4
+        axis_y, axis_x = self.spatial_axes
+        pad_width[axis_y] = (pad_y, pad_y)
+        pad_width[axis_x] = (pad_x, pad_x)
+        return np.pad(images, pad_width, mode='constant')
+
+
+class RandomCrop(ImageMapper):
+    """
+    :class:`ImageMapper` for cropping each image at a random position,
+    after padding the images with zeros.
+    """
+
+    def __init__(self, size, padding=0, channels_last=True, indices=(0,),
+                 random_state=None):
+        """
+        Construct a :class:`RandomCrop`.
+
+        Args:
+            size (int or (int, int)): The height and width of the crops.
+            padding (int or (int, int)): The number of zeros to pad at each
+                side of the height and width. (default 0)
+            channels_last (bool): Whether or not the channel axis is the
+                last axis of the images? (default :obj:`True`)
+            indices (Iterable[int]): The indices of the image arrays in
+                each mini-batch. (default ``(0,)``, the first array)
+            random_state (RandomState): Optional numpy RandomState for
+                the random crops.  (default :obj:`None`, use the global
+                :class:`RandomState`)
+        """
+        super(RandomCrop, self).__init__(
+            channels_last=channels_last, indices=indices,
+            random_state=random_state
+        )
+        self._size = _pair(size, 'size')
+        self._padding = _pair(padding, 'padding')
+
+    @property
+    def size(self):
+        """Get the height and width of the crops."""
+        return self._size
+
+    @property
+    def padding(self):
+        """Get the number of zeros to pad at each side."""
+        return self._padding
+
+    def _transform_images(self, images):
+        images = self._pad(images, self._padding)
+        axis_y, axis_x = self.spatial_axes
+        height, width = self._size
+        max_y = images.shape[axis_y] - height
+        max_x = images.shape[axis_x] - width
+        if max_y < 0 or max_x < 0:
+            raise ValueError('The crop size {!r} is larger than the padded '
+                             'images: {!r}.'.format(self._size, images.shape))
+        offset_y = self._random_state.randint(0, max_y + 1, size=len(images))
+        offset_x = self._random_state.randint(0, max_x + 1, size=len(images))
+        return self._crop(images, offset_y, offset_x, height, width)
+
+
+class RandomShift(ImageMapper):
+    """
+    :class:`ImageMapper` for translating each image by a random offset,
+    filling the uncovered area with zeros.
+    """
+
+    def __init__(self, max_shift, channels_last=True, indices=(0,),
+                 random_state=None):
+        """
+        Construct a :class:`RandomShift`.
+
+        Args:
+            max_shift (int or (int, int)): The maximum number of pixels to
+                shift along the height and the width.
+            channels_last (bool): Whether or not the channel axis is the
+                last axis of the images? (default :obj:`True`)
+            indices (Iterable[int]): The indices of the image arrays in
+                each mini-batch. (default ``(0,)``, the first array)
+            random_state (RandomState): Optional numpy RandomState for
+                the random shifts.  (default :obj:`None`, use the global
+                :class:`RandomState`)
+        """
+        super(RandomShift, self).__init__(
+            channels_last=channels_last, indices=indices,
+            random_state=random_state
+        )
+        self._max_shift = _pair(max_shift, 'max_shift')
+
+    @property
+    def max_shift(self):
+        """Get the maximum number of pixels to shift."""
+        return self._max_shift
+
+    def _transform_images(self, images):
+        # a shifted image is a crop of the zero-padded image, with the
+        # same size as the original image
+        axis_y, axis_x = self.spatial_axes
+        height, width = images.shape[axis_y], images.shape[axis_x]
+        max_y, max_x = self._max_shift
+        images = self._pad(images, self._max_shift)
+        offset_y = self._random_state.randint(0, 2 * max_y + 1,
+                                              size=len(images))
+        offset_x = self._random_state.randint(0, 2 * max_x + 1,
+                                              size=len(images))
+        return self._crop(images, offset_y, offset_x, height, width)
+
+
+class RandomFlip(ImageMapper):
+    """
+    :class:`ImageMapper` for flipping each image at random.
+    """
+
+    def __init__(self, horizontal=True, vertical=False, prob=.5,
+                 channels_last=True, indices=(0,), random_state=None):
+        """
+        Construct a :class:`RandomFlip`.
+
+        Args:
+            horizontal (bool): Whether or not to flip the images
+                horizontally? (default :obj:`True`)
+            vertical (bool): Whether or not to flip the images vertically?
+                The horizontal and vertical flips are decided independently.
+                (default :obj:`False`)
+            prob (float): The probability to flip each image. (default .5)
+            channels_last (bool): Whether or not the channel axis is the
+                last axis of the images? (default :obj:`True`)
+            indices (Iterable[int]): The indices of the image arrays in
+                each mini-batch. (default ``(0,)``, the first array)
+            random_state (RandomState): Optional numpy RandomState for
+                the random flips.  (default :obj:`None`, use the global
+                :class:`RandomState`)
+        """
+        super(RandomFlip, self).__init__(
+            channels_last=channels_last, indices=indices,
+            random_state=random_state
+        )
+        self._horizontal = horizontal
+        self._vertical = vertical
+        self._prob = prob
+
+    @property
+    def horizontal(self):
+        """Whether or not to flip the images horizontally?"""
+        return self._horizontal
+
+    @property
+    def vertical(self):
+        """Whether or not to flip the images vertically?"""
+        return self._vertical
+
+    @property
+    def prob(self):
+        """Get the probability to flip each image."""
+        return self._prob
+
+    def _transform_images(self, images):
+        images = np.array(images)
+        axis_y, axis_x = self.spatial_axes
+        for enabled, axis in ((self._horizontal, axis_x),
+                              (self._vertical, axis_y)):
+            if enabled:
+                mask = self._random_state.random_sample(len(images)) < \
+                    self._prob
+                # the batch axis is kept by boolean indexing, so the flipped
+                # axis is the same as in `images`
+                images[mask] = np.flip(images[mask], axis)
+        return images
+
+
+class NormalizeChannels(ImageMapper):
+    """
+    :class:`ImageMapper` for normalizing each channel of the images by
+    its mean and standard deviation, i.e., ``(x - mean) / std``.
+    """
+
+    def __init__(self, mean, std, dtype=np.float32, channels_last=True,
+                 indices=(0,)):
+        """
+        Construct a :class:`NormalizeChannels`.
+
+        Args:
+            mean (Iterable[float]): The mean of each channel.
+            std (Iterable[float]): The standard deviation of each channel.
+            dtype (np.dtype): The data type of the normalized images.
+                (default ``np.float32``)
+            channels_last (bool): Whether or not the channel axis is the
+                last axis of the images? (default :obj:`True`)
+            indices (Iterable[int]): The indices of the image arrays in
+                each mini-batch. (default ``(0,)``, the first array)
+        """
+        super(NormalizeChannels, self).__init__(
+            channels_last=channels_last, indices=indices)
+        self._dtype = np.dtype(dtype)
+        shape = (-1,) if channels_last else (-1, 1, 1)
+        self._mean = np.asarray(mean, dtype=self._dtype).reshape(shape)
+        self._std = np.asarray(std, dtype=self._dtype).reshape(shape)
+
+    @property
+    def dtype(self):
+        """Get the data type of the normalized images."""
+        return self._dtype
+
+    def _transform_images(self, images):
+        out = np.empty(images.shape, dtype=self._dtype)
+        np.subtract(images, self._mean, out=out, casting='unsafe')
+        np.divide(out, self._std, out=out)
+        return out
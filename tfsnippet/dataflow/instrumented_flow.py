@@ -0,0 +1,156 @@
+import time
+
+from .base import DataFlow
+from .threading_flow import ThreadingFlow
+
+__all__ = ['InstrumentedFlow']
+
+
+class InstrumentedFlow(DataFlow):
+    """
+    Data flow which measures the timing statistics of the source flow.
+
+    Usage::
+
+        array_flow = DataFlow.arrays([x, y], batch_size=256, shuffle=True)
+        gather_flow = array_flow.instrument('gather')
+        augment_flow = gather_flow.map(augment).instrument('augment')
+        train_flow = augment_flow.threaded(5).instrument('prefetch')
+
+        trainer = Trainer(...)
+        trainer.collect_data_metrics_after_steps(
+            [gather_flow, augment_flow, train_flow], freq=100)
+        trainer.log_after_steps(100)
+
+    The following metrics are reported by :meth:`get_metrics`, averaged
+    over the mini-batches since the last call:
+
+    *  ``data/<name>/wait_sec``: seconds the consumer has waited for each
+       mini-batch from the source flow.
+    *  ``data/<name>/produce_sec``: seconds taken to produce each
+       mini-batch.  This is the same as `wait_sec`, unless the source flow
+       is a :class:`ThreadingFlow`, whose background worker produces the
+       mini-batches ahead of the consumer.
+    *  ``data/<name>/consume_sec``: seconds spent by the consumer on each
+       mini-batch, before asking for the next one.
+    *  ``data/<name>/batches_per_sec``: number of mini-batches per second.
+    *  ``data/<name>/queue_size``: number of prefetched mini-batches in the
+       queue when the consumer asks for a mini-batch, only if the source
+       flow is a :class:`ThreadingFlow`.
+
+    The time measured for a stage includes the time taken by all the
+    flows before it, thus the time taken by the stage itself is the
+    difference between its time and the time of the previous stage.
+    The metric names do not end with "time", such that they are not
+    excluded from the summaries by the default `summary_skip_pattern`
+    of :class:`~tfsnippet.scaffold.TrainLoop`.
+    """
+
+    METRIC_PREFIX = 'data/'
+    """The prefix of the metric names."""
+
+    def __init__(self, source, name):
+        """
+        Construct an :class:`InstrumentedFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            name (str): Name of this stage in the metric names.
+        """
+        self._source = source
+        self._name = name
+        self.reset_metrics()
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def name(self):
+        """Get the name of this stage in the metric names."""
+        return self._name
+
+    def length_hint(self):
+        return self._source.length_hint()
+
+    def get_state(self):
+        return self._source.get_state()
+
+    def set_state(self, state):
+        self._source.set_state(state)
+
+    def reset_metrics(self):
+        """Reset the collected timing statistics."""
+        self._batch_count = 0
+        self._wait_time = 0.
+        self._consume_time = 0.
+        self._producer_time_sum = 0.
+        self._queue_size_sum = 0
+
+    def get_metrics(self, reset=True):
+        """
+        Get the metrics of the mini-batches since the last reset.
+
+        Args:
+            reset (bool): Whether or not to reset the collected statistics
+                after getting the metrics? (default :obj:`True`)
+
+        Returns:
+            dict[str, float]: The metrics, or an empty dict if no
+                mini-batch has been obtained since the last reset.
+        """
+        metrics = {}
+        n = self._batch_count
+        if n > 0:
+            prefix = '{}{}/'.format(self.METRIC_PREFIX, self.name)
+            metrics[prefix + 'wait_sec'] = self._wait_time / n
+            metrics[prefix + 'consume_sec'] = self._consume_time / n
+            if isinstance(self._source, ThreadingFlow):
+                metrics[prefix + 'produce_sec'] = self._producer_time_sum / n
+                metrics[prefix + 'queue_size'] = \
+                    float(self._queue_size_sum) / n
+            else:
+                metrics[prefix + 'produce_sec'] = self._wait_time / n
+            total_time = self._wait_time + self._consume_time
+            if total_time > 0:
+                metrics[prefix + 'batches_per_sec'] = n / total_time
+        if reset:
+            self.reset_metrics()
+        return metrics
+
+    def collect_metrics(self, loop):
+        """
+        Add the metrics to a train loop, and reset the statistics.
+
+        Args:
+            loop (tfsnippet.scaffold.TrainLoop): The train loop.
+        """
+        metrics = self.get_metrics()
+        if metrics:
+            loop.collect_metrics(metrics)
+
+    def _minibatch_iterator(self):
+        is_threading = isinstance(self._source, ThreadingFlow)
+        source_iterator = iter(self._source)
+        try:
+            while True:
+                if is_threading:
+                    queue_size = self._source.queue_size
+                start_time = time.time()
+                try:
+                    batch = next(source_iterator)
+                except StopIteration:
+                    break
+                yield_time = time.time()
+
+                self._batch_count += 1
+                self._wait_time += yield_time - start_time
+                if is_threading:
+                    self._queue_size_sum += queue_size
+                    self._producer_time_sum += self._source.producer_time or 0.
+
+                yield batch
+                self._consume_time += time.time() - yield_time
+        finally:
+            source_iterator.close()
@@ -3,6 +3,28 @@ from .base import DataFlow
 __all__ = ['MapperFlow']
 
 
+def _check_mapper_output(mapped_b):
+    """
+    Check the output of a mapper function, converting lists into tuples.
+
+    Args:
+        mapped_b: The output of the mapper function.
+
+    Returns:
+        tuple: The checked output.
+
+    Raises:
+        TypeError: If the output is neither a tuple nor a list.
+    """
+    if isinstance(mapped_b, list):
+        mapped_b = tuple(mapped_b)
+    elif not isinstance(mapped_b, tuple):
+        raise TypeError('The output of the ``mapper`` is expected to '
+                        'be a tuple or a list, but got a {}.'.
+                        format(mapped_b.__class__.__name__))
+    return mapped_b
+
+
 class MapperFlow(DataFlow):
     """
     Data flow which transforms the mini-batch arrays from source flow
@@ -32,13 +54,16 @@ class MapperFlow(DataFlow):
         """Get the source data flow."""
         return self._source
 
+    def _shard(self, num_shards, index, mode):
+        return MapperFlow(self._source.shard(num_shards, index, mode),
+                          self._mapper)
+
+    def get_state(self):
+        return self._source.get_state()
+
+    def set_state(self, state):
+        self._source.set_state(state)
+
     def _minibatch_iterator(self):
         for b in self._source:
-            mapped_b = self._mapper(*b)
-            if isinstance(mapped_b, list):
-                mapped_b = tuple(mapped_b)
-            elif not isinstance(mapped_b, tuple):
-                raise TypeError('The output of the ``mapper`` is expected to '
-                                'be a tuple or a list, but got a {}.'.
-                                format(mapped_b.__class__.__name__))
-            yield mapped_b
+            yield _check_mapper_output(self._mapper(*b))
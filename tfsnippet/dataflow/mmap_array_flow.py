@@ -0,0 +1,93 @@
+import numpy as np
+
+from .array_flow import ArrayFlow
+
+__all__ = ['MmapArrayFlow']
+
+
+class MmapArrayFlow(ArrayFlow):
+    """
+    Using memory-mapped ``.npy`` files as data source flow.
+
+    The arrays are opened by :func:`np.load` with ``mmap_mode='r'``, thus
+    only the rows touched by each mini-batch are read from the files.
+    This flow is suitable for datasets which are much larger than the
+    memory of the host.
+
+    Usage::
+
+        mmap_flow = DataFlow.npy_files(['x.npy', 'y.npy'], batch_size=256,
+                                       shuffle=True)
+        for batch_x, batch_y in mmap_flow:
+            ...
+    """
+
+    def __init__(self, paths, batch_size, shuffle=False, skip_incomplete=False,
+                 random_state=None, shuffle_chunk_size=None,
+                 shuffle_buffer_size=None, buffer_pool_size=None,
+                 sort_batch_indices=False, restore_batch_order=False):
+        """
+        Construct a :class:`MmapArrayFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the ``.npy`` files, to be
+                iterated through mini-batches.  These arrays should be
+                at least 1-d, with identical first dimension.
+            batch_size (int): Size of each mini-batch.
+            shuffle (bool or str): Whether or not to shuffle data before
+                iterating?  If ``"block"``, use block-shuffling instead of
+                fully random shuffling, which is recommended for large
+                files.  See :class:`ArrayFlow`.  (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling data before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+            shuffle_chunk_size (int): Size of each contiguous chunk for
+                block-shuffling.  (default :obj:`None`, `batch_size`)
+            shuffle_buffer_size (int): Size of the shuffle buffer for
+                block-shuffling.  (default :obj:`None`,
+                ``16 * shuffle_chunk_size``)
+            buffer_pool_size (int): If specified, gather the shuffled
+                mini-batches into this number of preallocated buffers for
+                each array.  (default :obj:`None`)
+            sort_batch_indices (bool): Whether or not to sort the indices
+                of each shuffled mini-batch before gathering?  This is
+                recommended for large files.  (default :obj:`False`)
+            restore_batch_order (bool): Whether or not to permute the items
+                of each mini-batch gathered by sorted indices back to their
+                shuffled order?  (default :obj:`False`)
+        """
+        paths = tuple(paths)
+        if not paths:
+            raise ValueError('`paths` must not be empty.')
+        arrays = []
+        for path in paths:
+            a = np.load(path, mmap_mode='r')
+            if not isinstance(a, np.ndarray):
+                # a ``.npz`` file is opened as an `NpzFile`, which holds
+                # the file open until closed
+                a.close()
+                raise ValueError('Not a .npy file: {!r}'.format(path))
+            arrays.append(a)
+
+        super(MmapArrayFlow, self).__init__(
+            arrays=arrays,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            skip_incomplete=skip_incomplete,
+            random_state=random_state,
+            shuffle_chunk_size=shuffle_chunk_size,
+            shuffle_buffer_size=shuffle_buffer_size,
+            buffer_pool_size=buffer_pool_size,
+            sort_batch_indices=sort_batch_indices,
+            restore_batch_order=restore_batch_order
+        )
+        self._paths = paths
+
+    @property
+    def paths(self):
+        """Get the paths of the ``.npy`` files."""
+        return self._paths
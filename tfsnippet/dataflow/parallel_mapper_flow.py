@@ -0,0 +1,232 @@
+import multiprocessing
+from functools import partial
+from multiprocessing.pool import ThreadPool
+
+import six
+
+from tfsnippet.utils import AutoInitAndCloseable
+from .base import DataFlow
+from .mapper_flow import _check_mapper_output
+
+if six.PY2:
+    from Queue import Queue
+else:
+    from queue import Queue
+
+__all__ = ['ParallelMapperFlow', 'ThreadPoolMapperFlow']
+
+# the mapper function in a worker process of :class:`ParallelMapperFlow`
+_worker_mapper = None
+
+
+def _init_process_worker(mapper):
+    global _worker_mapper
+    _worker_mapper = mapper
+
+
+def _run_mapper(mapper, index, batch):
+    try:
+        return index, True, _check_mapper_output(mapper(*batch))
+    except Exception as ex:
+        return index, False, ex
+
+
+def _run_process_worker(index, batch):
+    return _run_mapper(_worker_mapper, index, batch)
+
+
+class ParallelMapperFlow(DataFlow, AutoInitAndCloseable):
+    """
+    Data flow which transforms the mini-batch arrays from source flow
+    by a specified mapper function, running in a pool of worker processes.
+
+    The mini-batches from the source flow are dispatched to the worker
+    processes, and at most `max_in_flight` mini-batches are being mapped
+    or waiting to be consumed at the same time.  This flow is suitable for
+    CPU-heavy mappers written in Python or NumPy, which would otherwise be
+    bound to a single core by the GIL.
+
+    Usage::
+
+        source_flow = DataFlow.arrays([x, y], batch_size=256)
+        with source_flow.parallel_map(augment, n_workers=8) as df:
+            for epoch in epochs:
+                for batch_x, batch_y in df:
+                    ...
+
+    Note that the source flow is iterated in the consumer process, and
+    the mini-batches (as well as the mapped outputs) are sent through
+    pipes between the processes.  The mapper is sent to the worker
+    processes only once, when the pool is created.  It must be picklable
+    if the processes are not created by ``fork``.
+    """
+
+    def __init__(self, source, mapper, n_workers, ordered=True,
+                 max_in_flight=None):
+        """
+        Construct a :class:`ParallelMapperFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            mapper ((\*np.ndarray) -> tuple[np.ndarray])): The mapper
+                function, which transforms numpy arrays into a tuple
+                of other numpy arrays.
+            n_workers (int): Number of workers.  It should be at least 1.
+            ordered (bool): Whether or not to keep the order of the
+                mini-batches from the source flow? (default :obj:`True`)
+            max_in_flight (int): Maximum number of mini-batches being
+                mapped or waiting to be consumed.
+                (default :obj:`None`, ``2 * n_workers``)
+        """
+        # check the parameters
+        if n_workers < 1:
+            raise ValueError('`n_workers` must be at least 1')
+        if max_in_flight is None:
+            max_in_flight = 2 * n_workers
+        if max_in_flight < 1:
+            raise ValueError('`max_in_flight` must be at least 1')
+
+        # memorize the parameters
+        self._source = source
+        self._mapper = mapper
+        self._n_workers = n_workers
+        self._ordered = ordered
+        self._max_in_flight = max_in_flight
+
+        # internal states for the workers
+        self._pool = None
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    @property
+    def n_workers(self):
+        """Get the number of workers."""
+        return self._n_workers
+
+    @property
+    def ordered(self):
+        """Whether or not to keep the order of the mini-batches?"""
+        return self._ordered
+
+    @property
+    def max_in_flight(self):
+        """Get the maximum number of in-flight mini-batches."""
+        return self._max_in_flight
+
+    def _create_pool(self):
+        """Create the worker pool."""
+        return multiprocessing.Pool(
+            self.n_workers, initializer=_init_process_worker,
+            initargs=(self._mapper,)
+        )
+
+    def _task_func(self):
+        """Get the function to run in the worker pool for each task."""
+        return _run_process_worker
+
+    def _submit(self, index, batch, callback, error_callback):
+        """
+        Submit a mini-batch to the worker pool.
+
+        Args:
+            index (int): Index of the mini-batch in the current epoch.
+            batch (tuple[np.ndarray]): The mini-batch from source flow.
+            callback: Callback to receive ``(index, success, payload)``.
+            error_callback: Callback to receive errors of the worker pool.
+        """
+        kwargs = {'callback': callback}
+        if not six.PY2:
+            kwargs['error_callback'] = error_callback
+        self._pool.apply_async(self._task_func(), (index, batch), **kwargs)
+
+    def _init(self):
+        self._pool = self._create_pool()
+
+    def _close(self):
+        try:
+            self._pool.terminate()
+            self._pool.join()
+        finally:
+            self._pool = None
+            self._initialized = False
+
+    def _minibatch_iterator(self):
+        self.init()
+
+        # results of the current epoch.  A new queue is used for each epoch,
+        # such that the late results of an interrupted epoch are discarded.
+        results = Queue()
+
+        def error_callback(ex):
+            results.put((None, False, ex))
+
+        source_iterator = iter(self._source)
+        source_exhausted = False
+        submitted = 0
+        consumed = 0
+        pending = {}  # the mapped batches which have arrived out of order
+
+        try:
+            while True:
+                # keep feeding the workers until `max_in_flight` is reached
+                while not source_exhausted and \
+                        submitted - consumed < self.max_in_flight:
+                    try:
+                        batch = next(source_iterator)
+                    except StopIteration:
+                        source_exhausted = True
+                    else:
+                        self._submit(submitted, batch, results.put,
+                                     error_callback)
+                        submitted += 1
+
+                if consumed >= submitted:
+                    break
+
+                # wait for the next mapped batch
+                while not self.ordered or consumed not in pending:
+                    index, success, payload = results.get()
+                    if not success:
+                        raise payload
+                    if not self.ordered:
+                        pending[consumed] = payload
+                        break
+                    pending[index] = payload
+
+                mapped_b = pending.pop(consumed)
+                consumed += 1
+                yield mapped_b
+        finally:
+            source_iterator.close()
+
+
+class ThreadPoolMapperFlow(ParallelMapperFlow):
+    """
+    Data flow which transforms the mini-batch arrays from source flow
+    by a specified mapper function, running in a pool of worker threads.
+
+    This flow avoids the cost of transferring the mini-batches between
+    processes, thus is preferred over :class:`ParallelMapperFlow` if the
+    mapper releases the GIL for most of its time, e.g., a mapper which
+    calls NumPy, OpenCV, or ``session.run``.
+
+    Usage::
+
+        source_flow = DataFlow.arrays([x], batch_size=256)
+        with source_flow.threaded_map(sample_x, n_workers=4) as df:
+            for epoch in epochs:
+                for [batch_x] in df:
+                    ...
+
+    The mapper is called from multiple worker threads simultaneously,
+    thus it must be thread-safe.
+    """
+
+    def _create_pool(self):
+        return ThreadPool(self.n_workers)
+
+    def _task_func(self):
+        return partial(_run_mapper, self._mapper)
@@ -0,0 +1,246 @@
+import multiprocessing
+import traceback
+from logging import getLogger
+
+import six
+
+from tfsnippet.utils import AutoInitAndCloseable
+from .array_flow import ArrayFlow
+from .base import DataFlow, ExtraInfoDataFlow
+from .shared_memory import SharedMemoryRingBuffer
+
+if six.PY2:
+    from Queue import Empty
+else:
+    from queue import Empty
+
+__all__ = ['ProcessFlow']
+
+_EPOCH_END = 'epoch_end'
+_WORKER_ERROR = 'worker_error'
+
+
+def _process_flow_worker(source, ring, epoch_counter, stopping):
+    active_epoch = 0
+    try:
+        while not stopping.is_set():
+            # iterate through the mini-batches in the current epoch
+            for batch in source:
+                if stopping.is_set() or active_epoch < epoch_counter.value:
+                    break
+                ring.put(batch, tag=active_epoch)
+
+            # put the epoch ending mark into the ring buffer
+            if not stopping.is_set():
+                ring.put_message(active_epoch, (_EPOCH_END,))
+
+            # move to the next epoch
+            active_epoch += 1
+    except Exception:
+        getLogger(__name__).warning(
+            '{} exited because of error.'.format(ProcessFlow.__name__),
+            exc_info=True
+        )
+        ring.put_message(active_epoch, (_WORKER_ERROR, traceback.format_exc()))
+
+
+class ProcessFlow(DataFlow, AutoInitAndCloseable):
+    """
+    Data flow to prefetch from the source data flow in a background process.
+
+    This is an alternative to :class:`ThreadingFlow`, which runs the source
+    flow in a separated process, thus is not limited by the GIL.  The
+    mini-batches are transferred through a :class:`SharedMemoryRingBuffer`
+    instead of being pickled, and are received as read-only views of the
+    shared memory.
+
+    Usage::
+
+        array_flow = DataFlow.arrays([x, y], batch_size=256)
+        with array_flow.map(augment).multiprocessed(prefetch=5) as df:
+            for epoch in epochs:
+                for batch_x, batch_y in df:
+                    ...
+
+    Note that the shared memory of a mini-batch will be recycled after
+    `buffer_pool_size` more mini-batches are requested, thus the arrays
+    are only valid until then.  By default, they are only valid until the
+    next mini-batch is requested.  Specify a larger `buffer_pool_size` if
+    the mini-batches are read ahead by the consumer, e.g., ``k + 2`` if
+    prefetched by ``.threaded(k)``, or copy the arrays if they should be
+    kept for longer.
+    """
+
+    def __init__(self, source, prefetch, batch_size=None, data_shapes=None,
+                 dtypes=None, buffer_pool_size=1):
+        """
+        Construct a :class:`ProcessFlow`.
+
+        Args:
+            source (DataFlow): The source data flow.
+            prefetch (int): Number of mini-batches to prefetch ahead.
+                It should be at least 1.
+            batch_size (int): Maximum size of each mini-batch from the
+                source flow.  (default :obj:`None`, use the `batch_size`
+                of the source flow if it is an :class:`ExtraInfoDataFlow`)
+            data_shapes (Iterable[tuple[int]]): The shapes of data in a
+                mini-batch from the source flow, excluding the batch
+                dimension.  (default :obj:`None`, use the `data_shapes`
+                of the source flow if it is an :class:`ExtraInfoDataFlow`)
+            dtypes (Iterable[np.dtype]): The data types of the arrays in
+                a mini-batch from the source flow.  (default :obj:`None`,
+                use the data types of the arrays if the source flow is an
+                :class:`ArrayFlow`)
+            buffer_pool_size (int): Number of the obtained mini-batches
+                whose shared memory is held by the consumer.  The shared
+                memory of a mini-batch is recycled after `buffer_pool_size`
+                more mini-batches are obtained.  It should be at least 1.
+                (default 1)
+        """
+        # check the parameters
+        if prefetch < 1:
+            raise ValueError('`prefetch_num` must be at least 1')
+        if buffer_pool_size < 1:
+            raise ValueError('`buffer_pool_size` must be at least 1.')
+        if batch_size is None and isinstance(source, ExtraInfoDataFlow):
+            batch_size = source.batch_size
+        if data_shapes is None and isinstance(source, ExtraInfoDataFlow):
+            data_shapes = source.data_shapes
+        if dtypes is None and isinstance(source, ArrayFlow):
+            dtypes = tuple(a.dtype for a in source.the_arrays)
+        for name, value in [('batch_size', batch_size),
+                            ('data_shapes', data_shapes),
+                            ('dtypes', dtypes)]:
+            if value is None:
+                raise ValueError('`{}` must be specified, since it cannot '
+                                 'be inferred from the source flow {!r}.'.
+                                 format(name, source))
+
+        # memorize the parameters
+        self._source = source
+        self._prefetch_num = prefetch
+        self._batch_size = batch_size
+        self._data_shapes = tuple(tuple(s) for s in data_shapes)
+        self._dtypes = tuple(dtypes)
+        self._buffer_pool_size = buffer_pool_size
+
+        # internal states for background worker
+        self._worker = None  # type: multiprocessing.Process
+        self._ring = None  # type: SharedMemoryRingBuffer
+        self._epoch_counter = None  # counter for tracking the active epoch
+        self._stopping = None
+
+    @property
+    def source(self):
+        """Get the source data flow."""
+        return self._source
+
+    def length_hint(self):
+        return self._source.length_hint()
+
+    @property
+    def prefetch_num(self):
+        """Get the number of batches to prefetch."""
+        return self._prefetch_num
+
+    @property
+    def buffer_pool_size(self):
+        """
+        Get the number of the obtained mini-batches whose shared memory is
+        held by the consumer.
+        """
+        return self._buffer_pool_size
+
+    @property
+    def batch_size(self):
+        """Get the maximum size of each mini-batch."""
+        return self._batch_size
+
+    @property
+    def data_shapes(self):
+        """Get the shapes of data in a mini-batch."""
+        return self._data_shapes
+
+    @property
+    def dtypes(self):
+        """Get the data types of the arrays in a mini-batch."""
+        return self._dtypes
+
+    def _init(self):
+        # prepare for the worker states.  `buffer_pool_size` slots more
+        # than `prefetch` are required, since they are held by the consumer.
+        self._ring = SharedMemoryRingBuffer(
+            n_slots=self.prefetch_num + self.buffer_pool_size,
+            batch_size=self.batch_size,
+            data_shapes=self.data_shapes,
+            dtypes=self.dtypes,
+            n_held_slots=self.buffer_pool_size
+        )
+        self._epoch_counter = multiprocessing.Value('l', 0)
+        self._stopping = multiprocessing.Event()
+
+        # create and start the worker
+        self._worker = multiprocessing.Process(
+            target=_process_flow_worker,
+            args=(self.source, self._ring, self._epoch_counter,
+                  self._stopping)
+        )
+        self._worker.daemon = True
+        self._worker.start()
+
+    def _close(self):
+        try:
+            # prevent the worker process from further work
+            self._stopping.set()
+            # release all slots to notify the background worker
+            while self._worker.is_alive():
+                self._ring.drain()
+                self._worker.join(0.1)
+        finally:
+            self._worker = None
+            self._ring = None
+            self._epoch_counter = None
+            self._stopping = None
+            self._initialized = False
+
+    def _minibatch_iterator(self):
+        self.init()
+
+        try:
+            # iterate through one epoch
+            while True:
+                try:
+                    epoch, batch, payload = self._ring.get(timeout=1)
+                except Empty:
+                    if not self._worker.is_alive():
+                        raise RuntimeError('{} worker process exited '
+                                           'unexpectedly.'.
+                                           format(self.__class__.__name__))
+                    continue
+
+                if epoch < self._epoch_counter.value:
+                    # we've got a remaining item from the last epoch, skip it
+                    pass
+                elif epoch > self._epoch_counter.value:  # pragma: no cover
+                    # we've accidentally got an item from the future epoch
+                    # it should be a bug, and we shall report it
+                    raise RuntimeError('Unexpected entry from future epoch.')
+                elif batch is None:
+                    if payload[0] == _EPOCH_END:
+                        # we've got the epoch ending mark for the current
+                        # epoch, so we should break the loop
+                        break
+                    raise RuntimeError('{} worker process exited because of '
+                                       'error:\n{}'.
+                                       format(self.__class__.__name__,
+                                              payload[1]))
+                else:
+                    # we've got a normal batch for the current epoch,
+                    # so yield it
+                    yield batch
+        finally:
+            # the held slots are not released here, since the last
+            # mini-batches of the epoch might still be used by the consumer
+            if self._ring is not None:
+                with self._epoch_counter.get_lock():
+                    self._epoch_counter.value += 1
@@ -1,6 +1,6 @@
 import numpy as np
 
-from .array_flow import ArrayFlow
+from .array_flow import ArrayFlow, _shard_slice
 
 __all__ = ['SeqFlow']
 
@@ -36,9 +36,11 @@ class SeqFlow(ArrayFlow):
             skip_incomplete (bool): Whether or not to exclude the last
                 mini-batch if it is incomplete? (default :obj:`False`)
             dtype: Data type of the numbers. (default ``np.int32``)
-            random_state (RandomState): Optional numpy RandomState for
-                shuffling data before each epoch.  (default :obj:`None`,
-                use the global :class:`RandomState`).
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling data before each epoch, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
         """
         # check the parameters
         if batch_size is None:
@@ -55,6 +57,7 @@ class SeqFlow(ArrayFlow):
         self._start = start
         self._stop = stop
         self._step = step
+        self._dtype = dtype
 
     @property
     def start(self):
@@ -70,3 +73,17 @@ class SeqFlow(ArrayFlow):
     def step(self):
         """Get the step of the sequence."""
         return self._step
+
+    def _shard(self, num_shards, index, mode):
+        s = _shard_slice(self.data_length, num_shards, index, mode)
+        start, stop, step = s.indices(self.data_length)
+        return SeqFlow(
+            start=self.start + start * self.step,
+            stop=self.start + stop * self.step,
+            step=self.step * step,
+            batch_size=self.batch_size,
+            shuffle=self.is_shuffled,
+            skip_incomplete=self.skip_incomplete,
+            dtype=self._dtype,
+            random_state=self._shard_random_state(index)
+        )
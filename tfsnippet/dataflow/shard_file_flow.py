@@ -0,0 +1,432 @@
+import time
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from tfsnippet.utils import AutoInitAndCloseable, RandomStreams
+from .array_flow import _shard_slice
+from .base import DataFlow
+
+__all__ = ['ShardFileFlow']
+
+
+def _sample_distinct(random_state, n, k):
+    """
+    Sample `k` distinct integers from ``[0, n)`` in random order.
+
+    Rejection sampling is used when `k` is much smaller than `n`, which
+    avoids generating a permutation of all the `n` integers.
+    """
+    if 2 * k > n:
+        return random_state.permutation(n)[:k]
+    ret = np.unique(random_state.randint(0, n, size=k))
+    while len(ret) < k:
+        ret = np.unique(np.concatenate(
+            [ret, random_state.randint(0, n, size=k - len(ret))]))
+    random_state.shuffle(ret)
+    return ret
+
+
+class _ShuffleBuffer(object):
+    """
+    Bounded buffer of rows, from which random mini-batches are drawn.
+
+    The rows are stored in preallocated arrays.  When a mini-batch is
+    drawn, the holes left by the drawn rows are filled by the rows at the
+    end of the buffer, thus each mini-batch costs O(batch_size) copies.
+    """
+
+    def __init__(self, capacity, random_state):
+        self.capacity = capacity
+        self.size = 0
+        self._random_state = random_state
+        self._buffers = None
+
+    def add(self, arrays, start, stop):
+        """Copy rows ``[start, stop)`` of `arrays` into the buffer."""
+        if self._buffers is None:
+            self._buffers = tuple(
+                np.empty((self.capacity,) + a.shape[1:], dtype=a.dtype)
+                for a in arrays
+            )
+        end = self.size + stop - start
+        for buf, a in zip(self._buffers, arrays):
+            buf[self.size: end] = a[start: stop]
+        self.size = end
+
+    def pop(self, k):
+        """Draw `k` random rows out of the buffer."""
+        n = self.size
+        indices = _sample_distinct(self._random_state, n, k)
+        batch = tuple(buf[indices] for buf in self._buffers)
+
+        # move the rows at the end of the buffer into the holes
+        is_drawn = np.zeros([k], dtype=np.bool_)
+        is_drawn[indices[indices >= n - k] - (n - k)] = True
+        holes = indices[indices < n - k]
+        tail = np.arange(n - k, n)[~is_drawn]
+        for buf in self._buffers:
+            buf[holes] = buf[tail]
+        self.size = n - k
+        return batch
+
+
+class ShardFileFlow(DataFlow, AutoInitAndCloseable):
+    """
+    Using a list of ``.npy`` or ``.npz`` shard files as data source flow.
+
+    Each shard file holds a contiguous part of the dataset.  The rows of
+    `cycle_length` shards are interleaved, by taking `block_length` rows
+    from each of the open shards in turn.  When a shard is exhausted, it
+    is replaced by the next shard in the shard order, which is shuffled
+    before each epoch if `shuffle` is :obj:`True`.  The shards are read on
+    background I/O threads, and the next `prefetch_shards` shards are read
+    ahead while the open shards are being consumed.
+
+    If `shuffle_buffer_size` is specified, the interleaved rows are further
+    shuffled through a bounded buffer of this number of rows, from which
+    the mini-batches are drawn at random.  Larger buffers give more
+    randomness, at the cost of more memory.
+
+    Usage::
+
+        shard_flow = DataFlow.shard_files(
+            sorted(glob('train-*.npz')), batch_size=256, keys=['x', 'y'],
+            shuffle=True, cycle_length=4, shuffle_buffer_size=65536
+        )
+        with shard_flow:
+            for epoch in epochs:
+                for batch_x, batch_y in shard_flow:
+                    ...
+
+    The interleaving order only depends on the shard order and the
+    parameters, but not the timing of the I/O threads, thus the flow is
+    reproducible with a seeded `random_state`, or with a
+    :class:`~tfsnippet.utils.RandomStreams`, which shuffles each epoch by
+    its own random stream ``random_state.stream(epoch)``.  At most
+    ``cycle_length + prefetch_shards`` shards are held in memory at the
+    same time.  The read throughput of each shard is recorded in
+    :attr:`shard_stats`.
+    """
+
+    def __init__(self, paths, batch_size, keys=None, shuffle=False,
+                 skip_incomplete=False, cycle_length=4, block_length=1,
+                 shuffle_buffer_size=None, prefetch_shards=1,
+                 n_io_threads=None, random_state=None):
+        """
+        Construct a :class:`ShardFileFlow`.
+
+        Args:
+            paths (Iterable[str]): Paths of the ``.npy`` or ``.npz`` shard
+                files.  A ``.npy`` file holds a single array, while a
+                ``.npz`` file holds the arrays named by `keys`.
+            batch_size (int): Size of each mini-batch.
+            keys (Iterable[str]): Names of the arrays to read from each
+                ``.npz`` file.  (default :obj:`None`, all the arrays in the
+                first shard file, in their stored order)
+            shuffle (bool): Whether or not to shuffle the shard order
+                before each epoch? (default :obj:`False`)
+            skip_incomplete (bool): Whether or not to exclude the last
+                mini-batch if it is incomplete? (default :obj:`False`)
+            cycle_length (int): Number of shards to interleave at the same
+                time. (default 4)
+            block_length (int): Number of consecutive rows to take from
+                each shard in turn. (default 1)
+            shuffle_buffer_size (int): If specified, shuffle the rows
+                through a buffer of this number of rows.
+                (default :obj:`None`, do not shuffle the rows)
+            prefetch_shards (int): Number of shards to read ahead of the
+                open shards. (default 1)
+            n_io_threads (int): Number of I/O threads.
+                (default :obj:`None`, ``cycle_length + prefetch_shards``)
+            random_state (RandomState or RandomStreams): Optional numpy
+                RandomState for shuffling the shards and the rows, or
+                :class:`~tfsnippet.utils.RandomStreams` for using a random
+                stream per epoch.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+        """
+        # validate parameters
+        paths = tuple(paths)
+        if not paths:
+            raise ValueError('`paths` must not be empty.')
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1.')
+        if cycle_length < 1:
+            raise ValueError('`cycle_length` must be at least 1.')
+        if block_length < 1:
+            raise ValueError('`block_length` must be at least 1.')
+        if shuffle_buffer_size is not None and \
+                shuffle_buffer_size < batch_size:
+            raise ValueError('`shuffle_buffer_size` must be at least '
+                             '`batch_size`.')
+        if prefetch_shards < 0:
+            raise ValueError('`prefetch_shards` must be at least 0.')
+        if n_io_threads is None:
+            n_io_threads = cycle_length + prefetch_shards
+        if n_io_threads < 1:
+            raise ValueError('`n_io_threads` must be at least 1.')
+
+        # determine the keys of the arrays from the first shard, which
+        # only reads the directory of the ``.npz`` file
+        if keys is None and paths[0].endswith('.npz'):
+            with np.load(paths[0]) as f:
+                keys = f.files
+        if keys is not None:
+            keys = tuple(keys)
+
+        # memorize the parameters
+        self._paths = paths
+        self._batch_size = batch_size
+        self._keys = keys
+        self._shuffle = shuffle
+        self._skip_incomplete = skip_incomplete
+        self._cycle_length = cycle_length
+        self._block_length = block_length
+        self._shuffle_buffer_size = shuffle_buffer_size
+        self._prefetch_shards = prefetch_shards
+        self._n_io_threads = n_io_threads
+        self._random_state = random_state or np.random
+
+        # internal states
+        self._pool = None
+        self._shard_stats = {}
+        self._epoch_counter = 0
+
+    @property
+    def paths(self):
+        """Get the paths of the shard files."""
+        return self._paths
+
+    @property
+    def batch_size(self):
+        """Get the size of each mini-batch."""
+        return self._batch_size
+
+    @property
+    def keys(self):
+        """
+        Get the names of the arrays to read from each ``.npz`` file.
+
+        Returns:
+            tuple[str] or None: The names, or :obj:`None` if the shard files
+                are ``.npy`` files.
+        """
+        return self._keys
+
+    @property
+    def is_shuffled(self):
+        """Whether or not to shuffle the shard order before each epoch?"""
+        return self._shuffle
+
+    @property
+    def skip_incomplete(self):
+        """Whether or not to exclude the last mini-batch if incomplete?"""
+        return self._skip_incomplete
+
+    @property
+    def cycle_length(self):
+        """Get the number of shards to interleave at the same time."""
+        return self._cycle_length
+
+    @property
+    def block_length(self):
+        """Get the number of consecutive rows to take from each shard."""
+        return self._block_length
+
+    @property
+    def shuffle_buffer_size(self):
+        """
+        Get the size of the buffer for shuffling the rows.
+
+        Returns:
+            int or None: The buffer size, or :obj:`None` if the rows are
+                not shuffled.
+        """
+        return self._shuffle_buffer_size
+
+    @property
+    def prefetch_shards(self):
+        """Get the number of shards to read ahead of the open shards."""
+        return self._prefetch_shards
+
+    @property
+    def n_io_threads(self):
+        """Get the number of I/O threads."""
+        return self._n_io_threads
+
+    @property
+    def shard_stats(self):
+        """
+        Get the read statistics of the shards which have been read.
+
+        Returns:
+            dict[str, dict[str, float]]: Dict from the path of each shard
+                to its statistics of the last read, with the keys
+                ``"rows"``, ``"bytes"``, ``"read_sec"`` and
+                ``"bytes_per_sec"``.
+        """
+        return dict(self._shard_stats)
+
+    def _shard(self, num_shards, index, mode):
+        paths = self._paths[_shard_slice(len(self._paths), num_shards,
+                                         index, mode)]
+        return ShardFileFlow(
+            paths=paths,
+            batch_size=self._batch_size,
+            keys=self._keys,
+            shuffle=self._shuffle,
+            skip_incomplete=self._skip_incomplete,
+            cycle_length=self._cycle_length,
+            block_length=self._block_length,
+            shuffle_buffer_size=self._shuffle_buffer_size,
+            prefetch_shards=self._prefetch_shards,
+            n_io_threads=self._n_io_threads,
+            random_state=(self._random_state.child(index)
+                          if isinstance(self._random_state, RandomStreams)
+                          else self._random_state)
+        )
+
+    def _init(self):
+        self._pool = ThreadPool(self._n_io_threads)
+
+    def _close(self):
+        try:
+            self._pool.terminate()
+            self._pool.join()
+        finally:
+            self._pool = None
+
+    def _read_shard(self, path):
+        """
+        Read the arrays of a shard file, and record its read statistics.
+
+        Args:
+            path (str): Path of the shard file.
+
+        Returns:
+            tuple[np.ndarray]: The arrays of the shard.
+        """
+        start_time = time.time()
+        if self._keys is None:
+            arrays = (np.load(path),)
+            if not isinstance(arrays[0], np.ndarray):
+                raise ValueError('Not a .npy file: {!r}'.format(path))
+        else:
+            with np.load(path) as f:
+                arrays = tuple(f[k] for k in self._keys)
+        read_time = time.time() - start_time
+
+        for a in arrays:
+            if len(a.shape) < 1 or len(a) != len(arrays[0]):
+                raise ValueError('The arrays of shard {!r} must be at least '
+                                 '1-d, with the same length.'.format(path))
+        n_bytes = sum(a.nbytes for a in arrays)
+        self._shard_stats[path] = {
+            'rows': len(arrays[0]),
+            'bytes': n_bytes,
+            'read_sec': read_time,
+            'bytes_per_sec': n_bytes / read_time if read_time > 0 else None,
+        }
+        return arrays
+
+    def _interleave_blocks(self, random_state):
+        """
+        Iterate through the blocks of rows interleaved from the shards.
+
+        Args:
+            random_state (RandomState): The random state for shuffling
+                the shard order.
+
+        Yields:
+            (tuple[np.ndarray], int, int): The arrays of a shard, and the
+                start and stop of the rows in this block.
+        """
+        # the shard order of this epoch
+        order = np.arange(len(self._paths))
+        if self._shuffle:
+            random_state.shuffle(order)
+        order = deque(order)
+
+        # keep reading the next shards ahead of the open shards, such that
+        # at most `cycle_length + prefetch_shards` shards are open or being
+        # read at the same time.  Each open shard is a list of
+        # [arrays, position].
+        reading = deque()
+        open_shards = []
+
+        def read_next():
+            while order and len(open_shards) + len(reading) < \
+                    self._cycle_length + self._prefetch_shards:
+                path = self._paths[order.popleft()]
+                reading.append(
+                    self._pool.apply_async(self._read_shard, (path,)))
+
+        read_next()
+        while reading and len(open_shards) < self._cycle_length:
+            open_shards.append([reading.popleft().get(), 0])
+            read_next()
+
+        while open_shards:
+            i = 0
+            while i < len(open_shards):
+                arrays, start = open_shards[i]
+                stop = min(start + self._block_length, len(arrays[0]))
+                if start < stop:
+                    yield arrays, start, stop
+                if stop < len(arrays[0]):
+                    open_shards[i][1] = stop
+                    i += 1
+                else:
+                    # replace the exhausted shard with the next one, after
+                    # its slot is freed for reading the next shard
+                    del open_shards[i]
+                    read_next()
+                    if reading:
+                        open_shards.insert(i, [reading.popleft().get(), 0])
+                        read_next()
+                        i += 1
+
+    def _minibatch_iterator(self):
+        self.init()
+        batch_size = self._batch_size
+        if isinstance(self._random_state, RandomStreams):
+            random_state = self._random_state.stream(self._epoch_counter)
+            self._epoch_counter += 1
+        else:
+            random_state = self._random_state
+        blocks = self._interleave_blocks(random_state)
+
+        if self._shuffle_buffer_size is not None:
+            # draw random mini-batches from a full shuffle buffer
+            buffer = _ShuffleBuffer(self._shuffle_buffer_size, random_state)
+            for arrays, start, stop in blocks:
+                while start < stop:
+                    end = min(stop, start + buffer.capacity - buffer.size)
+                    buffer.add(arrays, start, end)
+                    start = end
+                    if buffer.size >= buffer.capacity:
+                        yield buffer.pop(batch_size)
+
+            # drain the remaining rows in the buffer
+            while buffer.size >= batch_size:
+                yield buffer.pop(batch_size)
+            if buffer.size > 0 and not self._skip_incomplete:
+                yield buffer.pop(buffer.size)
+
+        else:
+            # concatenate the blocks into mini-batches in order
+            pending = []
+            pending_size = 0
+            for arrays, start, stop in blocks:
+                pending.append(tuple(a[start: stop] for a in arrays))
+                pending_size += stop - start
+                if pending_size >= batch_size:
+                    merged = [np.concatenate(p) for p in zip(*pending)]
+                    n_full = pending_size // batch_size * batch_size
+                    for s in range(0, n_full, batch_size):
+                        yield tuple(m[s: s + batch_size] for m in merged)
+                    pending = [tuple(m[n_full:] for m in merged)]
+                    pending_size -= n_full
+            if pending_size > 0 and not self._skip_incomplete:
+                yield tuple(np.concatenate(p) for p in zip(*pending))
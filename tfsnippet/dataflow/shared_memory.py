@@ -0,0 +1,241 @@
+import multiprocessing
+from collections import deque
+
+import numpy as np
+import six
+
+if six.PY2:
+    from Queue import Empty
+else:
+    from queue import Empty
+
+__all__ = ['SharedMemoryRingBuffer']
+
+
+class SharedMemoryRingBuffer(object):
+    """
+    A ring buffer of mini-batch slots in shared memory, for transferring
+    mini-batches between processes without pickling the arrays.
+
+    The buffer consists of `n_slots` fixed-size slots, each of which is
+    able to hold a mini-batch of at most `batch_size` items.  The producer
+    process copies a mini-batch into a free slot via :meth:`put`, while
+    the consumer process obtains read-only numpy views of the slot via
+    :meth:`get`, without any further copying.  The consumer holds the
+    slots of the last `n_held_slots` mini-batches it has obtained, and the
+    slot of a mini-batch is recycled once another `n_held_slots`
+    mini-batches are obtained via :meth:`get` (or :meth:`release` is
+    called), thus the arrays obtained by the consumer are only valid until
+    then.
+
+    Usage::
+
+        ring = SharedMemoryRingBuffer(
+            n_slots=4, batch_size=256, data_shapes=((784,), ()),
+            dtypes=(np.float32, np.int32)
+        )
+
+        # in the producer process
+        ring.put([batch_x, batch_y])
+
+        # in the consumer process
+        tag, (batch_x, batch_y), payload = ring.get()
+
+    The ring buffer must be constructed before the producer process is
+    started, and passed to the producer process as an argument.
+    """
+
+    def __init__(self, n_slots, batch_size, data_shapes, dtypes,
+                 n_held_slots=1):
+        """
+        Construct a :class:`SharedMemoryRingBuffer`.
+
+        Args:
+            n_slots (int): Number of the slots.  It should be at least 1.
+            batch_size (int): Maximum size of the mini-batch in each slot.
+            data_shapes (Iterable[tuple[int]]): The shapes of data in a
+                mini-batch.  The batch dimension is not included.
+            dtypes (Iterable[np.dtype]): The data types of the arrays in
+                a mini-batch.
+            n_held_slots (int): Number of the slots held by the consumer.
+                It should be at least 1, and at most `n_slots`.
+                (default 1)
+        """
+        # check the parameters
+        data_shapes = tuple(tuple(int(s) for s in shape)
+                            for shape in data_shapes)
+        dtypes = tuple(np.dtype(dtype) for dtype in dtypes)
+        if n_slots < 1:
+            raise ValueError('`n_slots` must be at least 1')
+        if n_held_slots < 1 or n_held_slots > n_slots:
+            raise ValueError('`n_held_slots` must be at least 1, and at '
+                             'most `n_slots`')
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1')
+        if len(data_shapes) != len(dtypes):
+            raise ValueError('`data_shapes` and `dtypes` must have the same '
+                             'length.')
+
+        # memorize the parameters
+        self._n_slots = n_slots
+        self._n_held_slots = n_held_slots
+        self._batch_size = batch_size
+        self._data_shapes = data_shapes
+        self._dtypes = dtypes
+
+        # allocate the shared memory and the queues
+        self._buffers = tuple(
+            multiprocessing.RawArray(
+                'b', max(n_slots * batch_size * int(np.prod(shape)) *
+                         dtype.itemsize, 1)
+            )
+            for shape, dtype in zip(data_shapes, dtypes)
+        )
+        self._free_slots = multiprocessing.Queue()
+        self._filled_slots = multiprocessing.Queue()
+        for i in range(n_slots):
+            self._free_slots.put(i)
+
+        # states which are local to each process
+        self._arrays = None  # numpy views of the shared memory
+        self._held_slots = deque()  # the slots held by the consumer
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_arrays'] = None
+        state['_held_slots'] = deque()
+        return state
+
+    @property
+    def n_slots(self):
+        """Get the number of slots."""
+        return self._n_slots
+
+    @property
+    def n_held_slots(self):
+        """Get the number of the slots held by the consumer."""
+        return self._n_held_slots
+
+    @property
+    def batch_size(self):
+        """Get the maximum size of the mini-batch in each slot."""
+        return self._batch_size
+
+    @property
+    def data_shapes(self):
+        """Get the shapes of data in a mini-batch."""
+        return self._data_shapes
+
+    @property
+    def dtypes(self):
+        """Get the data types of the arrays in a mini-batch."""
+        return self._dtypes
+
+    def _get_arrays(self):
+        if self._arrays is None:
+            self._arrays = tuple(
+                np.frombuffer(buf, dtype=dtype,
+                              count=self.n_slots * self.batch_size *
+                              int(np.prod(shape))).
+                reshape((self.n_slots, self.batch_size) + shape)
+                for buf, shape, dtype in zip(
+                    self._buffers, self.data_shapes, self.dtypes)
+            )
+        return self._arrays
+
+    def put(self, arrays, tag=None):
+        """
+        Copy a mini-batch into a free slot, and publish it to the consumer.
+        This method will block until a free slot is available.
+
+        Args:
+            arrays (Iterable[np.ndarray]): The arrays of the mini-batch.
+            tag: Optional picklable tag, which will be received by the
+                consumer along with the mini-batch.
+
+        Raises:
+            ValueError: If the arrays do not fit into a slot.
+        """
+        arrays = tuple(arrays)
+        if len(arrays) != len(self.data_shapes):
+            raise ValueError('Expected {} arrays, but got {}.'.
+                             format(len(self.data_shapes), len(arrays)))
+        length = len(arrays[0])
+        if length > self.batch_size:
+            raise ValueError('The mini-batch size {} exceeds the slot size '
+                             '{}.'.format(length, self.batch_size))
+        for a, shape in zip(arrays, self.data_shapes):
+            if len(a) != length or a.shape[1:] != shape:
+                raise ValueError('The shape of the array {!r} does not match '
+                                 'the data shape {!r} with batch size {}.'.
+                                 format(a.shape, shape, length))
+
+        slot = self._free_slots.get()
+        try:
+            for dst, a in zip(self._get_arrays(), arrays):
+                dst[slot, :length] = a
+        except Exception:
+            self._free_slots.put(slot)
+            raise
+        self._filled_slots.put((tag, slot, length))
+
+    def put_message(self, tag, payload):
+        """
+        Publish a message to the consumer, without occupying a slot.
+
+        Args:
+            tag: Picklable tag of the message.
+            payload: Picklable payload of the message.
+        """
+        self._filled_slots.put((tag, None, payload))
+
+    def get(self, timeout=None):
+        """
+        Get the next mini-batch or message.  If the consumer already holds
+        `n_held_slots` slots, the earliest held slot will be released.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+                (default :obj:`None`, wait forever)
+
+        Returns:
+            (tag, tuple[np.ndarray] or None, payload): The tag, the
+                read-only arrays of the mini-batch, and the payload.
+                For a mini-batch, the payload is the size of the mini-batch.
+                For a message, the arrays will be :obj:`None`.
+
+        Raises:
+            queue.Empty: If no mini-batch or message arrives in `timeout`.
+        """
+        while len(self._held_slots) >= self._n_held_slots:
+            self._free_slots.put(self._held_slots.popleft())
+        tag, slot, payload = self._filled_slots.get(timeout=timeout)
+        if slot is None:
+            return tag, None, payload
+
+        self._held_slots.append(slot)
+        arrays = []
+        for src in self._get_arrays():
+            a = src[slot, :payload]
+            a.setflags(write=False)
+            arrays.append(a)
+        return tag, tuple(arrays), payload
+
+    def release(self):
+        """Release all the slots held by the consumer."""
+        while self._held_slots:
+            self._free_slots.put(self._held_slots.popleft())
+
+    def drain(self):
+        """
+        Discard all the published mini-batches and messages which have not
+        been received by the consumer, and release their slots.
+        """
+        self.release()
+        while True:
+            try:
+                tag, slot, payload = self._filled_slots.get(timeout=0.01)
+            except Empty:
+                break
+            if slot is not None:
+                self._free_slots.put(slot)
@@ -1,3 +1,4 @@
+import time
 from threading import Thread, Semaphore
 
 import six
@@ -5,6 +6,7 @@ from logging import getLogger
 
 from tfsnippet.utils import AutoInitAndCloseable
 from .base import DataFlow
+from .buffer_pool import _check_buffer_pool_size
 
 if six.PY2:
     from Queue import Queue
@@ -25,27 +27,107 @@ class ThreadingFlow(DataFlow, AutoInitAndCloseable):
             for epoch in epochs:
                 for batch_x, batch_y in df:
                     ...
+
+    If ``prefetch = 'auto'``, the number of prefetched mini-batches is
+    adjusted during iteration.  The time taken by the source flow to
+    produce each mini-batch, and the time taken by the consumer to process
+    each mini-batch, are measured.  If the consumer has to wait for a
+    mini-batch (a stall) while the source flow is as fast as the consumer
+    on average, the stall is caused by the jitter of the source flow, and
+    the prefetch number is increased.  If the queue never drops below
+    two mini-batches during `AUTO_SHRINK_WINDOW` mini-batches, the
+    prefetch number is decreased.
+    It is also bounded by `max_prefetch` and `max_prefetch_bytes`.
+    Note that a deeper queue does not help if the source flow is slower
+    than the consumer on average, thus it is not increased in this case.
+
+    Up to ``prefetch + 2`` mini-batches of the source flow are used at the
+    same time: `prefetch` in the queue, one being enqueued by the
+    background worker, and one being used by the consumer.  If the source
+    flow recycles its mini-batches in `buffer_pool_size` buffers (e.g., an
+    :class:`ArrayFlow` with a buffer pool), `prefetch` must not exceed
+    ``buffer_pool_size - 2``, and `max_prefetch` is capped at it.
     """
 
     EPOCH_END = object()
     """Object to mark an ending position of an epoch."""
 
-    def __init__(self, source, prefetch):
+    AUTO_PREFETCH_INIT = 2
+    """Initial number of mini-batches to prefetch in auto mode."""
+
+    AUTO_MAX_PREFETCH = 32
+    """Default maximum number of mini-batches to prefetch in auto mode."""
+
+    AUTO_EMA_DECAY = .9
+    """Decay of the moving averages of the measured time."""
+
+    AUTO_SHRINK_WINDOW = 64
+    """
+    Number of mini-batches without stalls, before the prefetch number
+    can be decreased in auto mode.
+    """
+
+    def __init__(self, source, prefetch, max_prefetch=None,
+                 max_prefetch_bytes=None):
         """
         Construct a :class:`ThreadingFlow`.
 
         Args:
             source (DataFlow): The source data flow.
-            prefetch (int): Number of mini-batches to prefetch ahead.
-                It should be at least 1.
+            prefetch (int or str): Number of mini-batches to prefetch ahead.
+                It should be at least 1, or "auto" to adjust the number
+                automatically.
+            max_prefetch (int): Maximum number of mini-batches to prefetch
+                in auto mode.  It is capped at ``buffer_pool_size - 2`` if
+                the source flow has a buffer pool. (default :obj:`None`,
+                32)
+            max_prefetch_bytes (int): Maximum number of bytes of the
+                prefetched mini-batches in auto mode, estimated from the
+                average size of the mini-batches.
+                (default :obj:`None`, no limit)
         """
         # check the parameters
-        if prefetch < 1:
+        is_auto = prefetch == 'auto'
+        if is_auto:
+            if max_prefetch is None:
+                max_prefetch = self.AUTO_MAX_PREFETCH
+            if max_prefetch < 1:
+                raise ValueError('`max_prefetch` must be at least 1')
+            prefetch = min(self.AUTO_PREFETCH_INIT, max_prefetch)
+        elif isinstance(prefetch, six.string_types):
+            raise ValueError('`prefetch` must be an integer or "auto": '
+                             'got {!r}'.format(prefetch))
+        elif prefetch < 1:
             raise ValueError('`prefetch_num` must be at least 1')
+        elif max_prefetch is not None or max_prefetch_bytes is not None:
+            raise ValueError('`max_prefetch` and `max_prefetch_bytes` can '
+                             'only be specified if `prefetch` is "auto"')
+
+        # the mini-batches of the source flow must not be overwritten while
+        # being prefetched
+        pool_size = getattr(source, 'buffer_pool_size', None)
+        if is_auto and pool_size is not None:
+            _check_buffer_pool_size(source, 3)
+            max_prefetch = min(max_prefetch, pool_size - 2)
+            prefetch = min(prefetch, max_prefetch)
+        _check_buffer_pool_size(source, prefetch + 2)
 
         # memorize the parameters
         self._source = source
         self._prefetch_num = prefetch
+        self._is_auto_prefetch = is_auto
+        self._max_prefetch = max_prefetch
+        self._max_prefetch_bytes = max_prefetch_bytes
+
+        # statistics of the producer and the consumer
+        self._producer_time = None  # moving average of time per batch
+        self._consumer_time = None  # moving average of time per batch
+        self._batch_bytes = None  # moving average of bytes per batch
+        self._batch_count = 0
+        self._stall_count = 0
+        self._stall_time = 0.
+        self._min_queue_size = None  # since last adjustment in auto mode
+        self._gets_since_adjust = 0
 
         # internal states for background worker
         self._worker = None  # type: Thread
@@ -55,16 +137,149 @@ class ThreadingFlow(DataFlow, AutoInitAndCloseable):
         self._worker_alive = None
         self._worker_ready_sem = None
 
+        # the state of the source flow after the last obtained mini-batch
+        self._source_state = None
+        self._has_source_state = None
+
     @property
     def source(self):
         """Get the source data flow."""
         return self._source
 
+    def length_hint(self):
+        return self._source.length_hint()
+
+    def get_state(self):
+        # the source flow has gone ahead of the consumer, so use the state
+        # recorded along with the last obtained mini-batch
+        if self._source_state is None:
+            return self.source.get_state()
+        return self._source_state
+
+    def set_state(self, state):
+        # discard the prefetched mini-batches
+        self.close()
+        self.source.set_state(state)
+        self._source_state = None
+
     @property
     def prefetch_num(self):
-        """Get the number of batches to prefetch."""
+        """
+        Get the number of batches to prefetch.
+
+        In auto mode, this is the currently chosen number.
+        """
         return self._prefetch_num
 
+    @property
+    def is_auto_prefetch(self):
+        """Whether or not the number of batches to prefetch is adjusted?"""
+        return self._is_auto_prefetch
+
+    @property
+    def max_prefetch(self):
+        """Get the maximum number of batches to prefetch in auto mode."""
+        return self._max_prefetch
+
+    @property
+    def max_prefetch_bytes(self):
+        """Get the maximum number of prefetched bytes in auto mode."""
+        return self._max_prefetch_bytes
+
+    @property
+    def queue_size(self):
+        """Get the number of prefetched mini-batches in the queue."""
+        if self._batch_queue is None:
+            return 0
+        return self._batch_queue.qsize()
+
+    @property
+    def batch_count(self):
+        """Get the number of mini-batches obtained by the consumer."""
+        return self._batch_count
+
+    @property
+    def stall_count(self):
+        """
+        Get the number of stalls, i.e., the number of times the consumer
+        found the queue empty and had to wait for a mini-batch.
+        """
+        return self._stall_count
+
+    @property
+    def stall_time(self):
+        """Get the total seconds the consumer has waited for mini-batches."""
+        return self._stall_time
+
+    @property
+    def producer_time(self):
+        """
+        Get the moving average of the seconds taken by the source flow to
+        produce each mini-batch, or :obj:`None` if not measured yet.
+        """
+        return self._producer_time
+
+    @property
+    def consumer_time(self):
+        """
+        Get the moving average of the seconds taken by the consumer to
+        process each mini-batch, or :obj:`None` if not measured yet.
+        """
+        return self._consumer_time
+
+    def _moving_average(self, avg, value):
+        if avg is None:
+            return value
+        return self.AUTO_EMA_DECAY * avg + (1. - self.AUTO_EMA_DECAY) * value
+
+    def _set_queue_size(self, size):
+        queue = self._batch_queue
+        with queue.mutex:
+            queue.maxsize = size
+            queue.not_full.notify_all()
+        self._prefetch_num = size
+
+    def _adjust_prefetch(self, stalled, queue_size):
+        """
+        Adjust the number of batches to prefetch in auto mode.
+
+        Args:
+            stalled (bool): Whether or not the consumer found the queue
+                empty when getting the current mini-batch?
+            queue_size (int): Size of the queue when getting the current
+                mini-batch.
+        """
+        limit = self._max_prefetch
+        if self._max_prefetch_bytes is not None and self._batch_bytes:
+            limit = min(limit, max(
+                1, int(self._max_prefetch_bytes // self._batch_bytes)))
+
+        size = self._prefetch_num
+        if self._min_queue_size is None or queue_size < self._min_queue_size:
+            self._min_queue_size = queue_size
+        self._gets_since_adjust += 1
+
+        if stalled and size < limit and \
+                self._producer_time is not None and \
+                self._consumer_time is not None and \
+                self._producer_time <= self._consumer_time:
+            # the source flow is fast enough on average, but the consumer
+            # still stalls, so more mini-batches should be prefetched
+            size += 1
+        elif self._gets_since_adjust >= self.AUTO_SHRINK_WINDOW and \
+                self._min_queue_size >= 2:
+            # at least one prefetched mini-batch has never been used
+            size -= 1
+
+        size = max(min(size, limit), 1)
+        changed = size != self._prefetch_num
+        if changed:
+            self._set_queue_size(size)
+        if changed or self._gets_since_adjust >= self.AUTO_SHRINK_WINDOW:
+            # start a new observation window
+            self._min_queue_size = None
+            self._gets_since_adjust = 0
+
     def _worker_func(self):
         active_epoch = self._epoch_counter
         self._worker_alive = True
@@ -73,14 +288,28 @@ class ThreadingFlow(DataFlow, AutoInitAndCloseable):
         try:
             while not self._stopping:
                 # iterate through the mini-batches in the current epoch
+                start_time = time.time()
+                state = None
                 for batch in self.source:
                     if self._stopping or active_epoch < self._epoch_counter:
                         break
-                    self._batch_queue.put((active_epoch, batch))
+                    self._producer_time = self._moving_average(
+                        self._producer_time, time.time() - start_time)
+                    self._batch_bytes = self._moving_average(
+                        self._batch_bytes,
+                        sum(getattr(a, 'nbytes', 0) for a in batch)
+                    )
+                    if self._has_source_state:
+                        state = self.source.get_state()
+                    self._batch_queue.put((active_epoch, batch, state))
+                    start_time = time.time()
 
                 # put the epoch ending mark into the queue
                 if not self._stopping:
-                    self._batch_queue.put((active_epoch, self.EPOCH_END))
+                    if self._has_source_state:
+                        state = self.source.get_state()
+                    self._batch_queue.put(
+                        (active_epoch, self.EPOCH_END, state))
 
                 # move to the next epoch
                 active_epoch += 1
@@ -100,6 +329,15 @@ class ThreadingFlow(DataFlow, AutoInitAndCloseable):
         self._stopping = False
         self._worker_ready_sem = Semaphore(value=0)
 
+        # record the state of the source flow along with each mini-batch,
+        # if the source flow supports checkpointing
+        try:
+            self._source_state = self.source.get_state()
+            self._has_source_state = True
+        except NotImplementedError:
+            self._source_state = None
+            self._has_source_state = False
+
         # create and start the worker
         self._worker = Thread(target=self._worker_func)
         self._worker.daemon = True
@@ -129,7 +367,10 @@ class ThreadingFlow(DataFlow, AutoInitAndCloseable):
         try:
             # iterate through one epoch
             while self._worker_alive:
-                epoch, payload = self._batch_queue.get()
+                queue_size = self._batch_queue.qsize()
+                start_time = time.time()
+                epoch, payload, state = self._batch_queue.get()
+                wait_time = time.time() - start_time
                 if epoch < self._epoch_counter:
                     # we've got a remaining item from the last epoch, skip it
                     pass
@@ -140,10 +381,23 @@ class ThreadingFlow(DataFlow, AutoInitAndCloseable):
                 elif payload is self.EPOCH_END:
                     # we've got the epoch ending mark for the current epoch,
                     # so we should break the loop
+                    self._source_state = state
                     break
                 else:
                     # we've got a normal batch for the current epoch,
-                    # so yield it
+                    # so update the statistics and yield it
+                    self._batch_count += 1
+                    self._source_state = state
+                    stalled = queue_size == 0
+                    if stalled:
+                        self._stall_count += 1
+                        self._stall_time += wait_time
+                    if self._is_auto_prefetch:
+                        self._adjust_prefetch(stalled, queue_size)
+
+                    yield_time = time.time()
                     yield payload
+                    self._consumer_time = self._moving_average(
+                        self._consumer_time, time.time() - yield_time)
         finally:
             self._epoch_counter += 1
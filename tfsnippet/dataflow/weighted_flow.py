@@ -0,0 +1,307 @@
+import numpy as np
+
+from .base import DataFlow
+
+__all__ = ['WeightedFlow']
+
+
+def _build_alias_table(weights):
+    """
+    Build the alias tables for sampling from the discrete distributions
+    proportional to each row of `weights`, without Python loops.
+
+    The tables are constructed by a vectorized version of the sweeping
+    construction.  The items of each row are scaled to have an average
+    weight of 1, and divided into light items (weight < 1) and heavy items.
+    Each light item borrows its deficit from the heavy item, whose
+    cumulative surplus covers the beginning of the light item's cumulative
+    deficit.  If the deficit of a light item overflows the surplus of its
+    heavy item, the heavy item in turn borrows the overflow from the next
+    heavy item.  All the rows are processed at once, by offsetting the
+    cumulative sums of each row by ``row * (n + 1)``.
+
+    Args:
+        weights (np.ndarray): The non-negative weights, 1-d for a single
+            table, or 2-d for a table for each row.  If the weights of a
+            row are all zero, a uniform distribution is used.
+
+    Returns:
+        (np.ndarray, np.ndarray): The probabilities of accepting each bucket,
+            and the aliases of each bucket (indices within each row).
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(weights.shape) == 1:
+        prob, alias = _build_alias_table(weights[np.newaxis, :])
+        return prob[0], alias[0]
+
+    rows, n = weights.shape
+    total = np.sum(weights, axis=-1, keepdims=True)
+    scaled = np.where(
+        total > 0, weights * (n / np.where(total > 0, total, 1.)), 1.)
+    prob = np.ones([rows, n])
+    alias = np.tile(np.arange(n), [rows, 1])
+
+    is_light = scaled < 1.
+    offset = np.arange(rows)[:, np.newaxis] * (n + 1.)
+    deficit_end = np.cumsum(np.where(is_light, 1. - scaled, 0.), axis=-1) + \
+        offset
+    surplus_end = np.cumsum(np.where(is_light, 0., scaled - 1.), axis=-1) + \
+        offset
+    light_row, light_col = np.where(is_light)
+    heavy_row, heavy_col = np.where(~is_light)
+    if len(light_row) == 0 or len(heavy_row) == 0:
+        return prob, alias
+
+    # a row without heavy items is only possible due to rounding errors,
+    # in which case the light items of this row are left untouched
+    heavy_count = np.bincount(heavy_row, minlength=rows)
+    heavy_last = np.cumsum(heavy_count) - 1  # the last heavy item of each row
+    has_heavy = heavy_count[light_row] > 0
+    light_row, light_col = light_row[has_heavy], light_col[has_heavy]
+
+    light_end = deficit_end[light_row, light_col]
+    light_start = light_end - (1. - scaled[light_row, light_col])
+    heavy_end = surplus_end[heavy_row, heavy_col]
+
+    # each light item borrows from the heavy item whose surplus
+    # covers the beginning of its deficit
+    k = np.searchsorted(heavy_end, light_start, side='right')
+    k = np.minimum(k, heavy_last[light_row])
+    prob[light_row, light_col] = scaled[light_row, light_col]
+    alias[light_row, light_col] = heavy_col[k]
+
+    # each heavy item borrows the overflow from the next heavy item
+    i = np.searchsorted(light_start, heavy_end, side='left') - 1
+    valid = i >= 0
+    valid[valid] = light_row[i[valid]] == heavy_row[valid]
+    overflow = np.where(valid, light_end[np.maximum(i, 0)] - heavy_end, 0.)
+    not_last = np.arange(len(heavy_row)) != heavy_last[heavy_row]
+    prob[heavy_row[not_last], heavy_col[not_last]] = \
+        1. - np.clip(overflow[not_last], 0., 1.)
+    alias[heavy_row[not_last], heavy_col[not_last]] = \
+        heavy_col[np.where(not_last)[0] + 1]
+    return prob, alias
+
+
+def _alias_draw(prob, alias, size, random_state):
+    """
+    Draw `size` samples from an alias table.
+
+    Args:
+        prob (np.ndarray): The probabilities of accepting each bucket.
+        alias (np.ndarray): The aliases of each bucket.
+        size (int): Number of samples to draw.
+        random_state (RandomState): The numpy RandomState.
+
+    Returns:
+        np.ndarray: The sampled indices.
+    """
+    idx = random_state.randint(len(prob), size=size)
+    accept = random_state.random_sample(size) < prob[idx]
+    return np.where(accept, idx, alias[idx])
+
+
+class WeightedFlow(DataFlow):
+    """
+    Using numpy-like arrays as data source flow, sampling mini-batches
+    with replacement, according to per-example weights.
+
+    The samples are drawn from alias tables, which takes O(1) time for
+    each sample.  The data are divided into blocks of `block_size`, and
+    a two-level alias table is maintained: one for choosing the block, and
+    one for each block for choosing the example.  Thus the weights of a
+    subset of the examples can be updated by :meth:`update_weights`, which
+    only rebuilds the tables of the affected blocks and the table of the
+    blocks, instead of rebuilding the whole table.
+
+    Usage::
+
+        df = DataFlow.weighted([x, y], weights=np.ones(len(x)),
+                               batch_size=256, return_indices=True)
+        for epoch in epochs:
+            for batch_x, batch_y, batch_idx in df:
+                losses = session.run(...)
+                df.update_weights(batch_idx, losses)
+    """
+
+    def __init__(self, arrays, weights, batch_size, steps_per_epoch=None,
+                 return_indices=False, block_size=None, random_state=None):
+        """
+        Construct a :class:`WeightedFlow`.
+
+        Args:
+            arrays: List of numpy-like arrays, to be sampled through
+                mini-batches.  These arrays should be at least 1-d,
+                with identical first dimension.
+            weights (np.ndarray): The non-negative weights of the examples.
+            batch_size (int): Size of each mini-batch.
+            steps_per_epoch (int): Number of mini-batches in each epoch.
+                (default :obj:`None`, ``ceil(data_length / batch_size)``)
+            return_indices (bool): Whether or not to produce the indices of
+                the sampled examples at the end of each mini-batch?
+                (default :obj:`False`)
+            block_size (int): Number of examples in each block of the
+                two-level alias table.  Updating the weights of ``m``
+                scattered examples takes ``O(m * block_size + data_length /
+                block_size)`` time.  (default :obj:`None`,
+                ``ceil(sqrt(data_length / batch_size))``, which is optimal
+                for updating the weights of a mini-batch)
+            random_state (RandomState): Optional numpy RandomState for
+                sampling.  (default :obj:`None`, use the global
+                :class:`RandomState`).
+        """
+        # validate parameters
+        arrays = tuple(arrays)
+        if not arrays:
+            raise ValueError('`arrays` must not be empty.')
+        for a in arrays:
+            if not hasattr(a, 'shape'):
+                raise ValueError('`arrays` must be numpy-like arrays.')
+            if len(a.shape) < 1:
+                raise ValueError('`arrays` must be at least 1-d arrays.')
+        data_length = len(arrays[0])
+        for a in arrays[1:]:
+            if len(a) != data_length:
+                raise ValueError('`arrays` must have the same data length.')
+        if data_length < 1:
+            raise ValueError('`arrays` must not be empty.')
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1.')
+        if steps_per_epoch is None:
+            steps_per_epoch = (data_length + batch_size - 1) // batch_size
+        if steps_per_epoch < 1:
+            raise ValueError('`steps_per_epoch` must be at least 1.')
+        if block_size is None:
+            block_size = int(np.ceil(np.sqrt(float(data_length) / batch_size)))
+        if block_size < 1:
+            raise ValueError('`block_size` must be at least 1.')
+
+        # memorize the parameters
+        self._arrays = arrays
+        self._data_length = data_length
+        self._batch_size = batch_size
+        self._steps_per_epoch = steps_per_epoch
+        self._return_indices = return_indices
+        self._block_size = block_size
+        self._random_state = random_state or np.random
+
+        # the weights, padded to a multiple of `block_size` by zeros
+        block_count = (data_length + block_size - 1) // block_size
+        self._weights = np.zeros(block_count * block_size, dtype=np.float64)
+        self._block_prob = np.empty([block_count, block_size])
+        self._block_alias = np.empty([block_count, block_size], dtype=np.int64)
+        self._block_weights = np.zeros([block_count])
+        self._top_prob = self._top_alias = None
+        self._set_weights(np.arange(data_length), weights)
+
+    @property
+    def the_arrays(self):
+        """Get the tuple of arrays accessed by this :class:`WeightedFlow`."""
+        return self._arrays
+
+    @property
+    def array_count(self):
+        """Get the count of arrays in each mini-batch."""
+        return len(self._arrays)
+
+    @property
+    def data_length(self):
+        """Get the number of examples."""
+        return self._data_length
+
+    @property
+    def batch_size(self):
+        """Get the size of each mini-batch."""
+        return self._batch_size
+
+    @property
+    def steps_per_epoch(self):
+        """Get the number of mini-batches in each epoch."""
+        return self._steps_per_epoch
+
+    @property
+    def return_indices(self):
+        """Whether or not to produce the indices of the sampled examples?"""
+        return self._return_indices
+
+    @property
+    def block_size(self):
+        """Get the number of examples in each block of the alias table."""
+        return self._block_size
+
+    @property
+    def weights(self):
+        """Get a read-only view of the weights of the examples."""
+        ret = self._weights[:self._data_length]
+        ret.setflags(write=False)
+        return ret
+
+    def _set_weights(self, indices, weights):
+        indices = np.asarray(indices, dtype=np.int64).reshape([-1])
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != indices.shape:
+            weights = np.broadcast_to(weights, indices.shape)
+        if np.any((indices < 0) | (indices >= self._data_length)):
+            raise IndexError('`indices` out of range.')
+        if not np.all(weights >= 0):
+            raise ValueError('`weights` must be non-negative.')
+
+        # compute the new weights of the affected blocks
+        old_weights = self._weights[indices]
+        self._weights[indices] = weights
+        blocks = np.unique(indices // self._block_size)
+        example_weights = self._weights.reshape([-1, self._block_size])
+        block_weights = self._block_weights.copy()
+        block_weights[blocks] = np.sum(example_weights[blocks], axis=-1)
+        if not np.sum(block_weights) > 0:
+            self._weights[indices] = old_weights
+            raise ValueError('The sum of `weights` must be positive.')
+
+        # rebuild the alias tables of the affected blocks,
+        # as well as the alias table of the blocks
+        self._block_prob[blocks], self._block_alias[blocks] = \
+            _build_alias_table(example_weights[blocks])
+        self._block_weights = block_weights
+        self._top_prob, self._top_alias = _build_alias_table(block_weights)
+
+    def update_weights(self, indices, weights):
+        """
+        Update the weights of a subset of the examples.
+
+        This only rebuilds the alias tables of the blocks containing the
+        updated examples, and the alias table of the blocks.  The updated
+        weights are used by the mini-batches sampled after this call.
+        Note that if this flow is prefetched by a :class:`ThreadingFlow`,
+        the prefetched mini-batches have already been sampled.
+
+        Args:
+            indices (np.ndarray): The indices of the examples.
+            weights (np.ndarray or float): The new weights of the examples.
+        """
+        self._set_weights(indices, weights)
+
+    def sample_indices(self, size):
+        """
+        Sample the indices of examples according to their weights.
+
+        Args:
+            size (int): Number of indices to sample.
+
+        Returns:
+            np.ndarray: The sampled indices.
+        """
+        blocks = _alias_draw(self._top_prob, self._top_alias, size,
+                             self._random_state)
+        offsets = self._random_state.randint(self._block_size, size=size)
+        accept = self._random_state.random_sample(size) < \
+            self._block_prob[blocks, offsets]
+        offsets = np.where(accept, offsets, self._block_alias[blocks, offsets])
+        return blocks * self._block_size + offsets
+
+    def _minibatch_iterator(self):
+        for _ in range(self._steps_per_epoch):
+            indices = self.sample_indices(self._batch_size)
+            batch = tuple(a[indices] for a in self._arrays)
+            if self._return_indices:
+                batch += (indices,)
+            yield batch
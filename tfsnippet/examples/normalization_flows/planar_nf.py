@@ -7,7 +7,7 @@ import tensorflow as tf
 from tensorflow.contrib.framework import arg_scope, add_arg_scope
 
 from tfsnippet.bayes import BayesianNet
-from tfsnippet.dataflow import DataFlow
+from tfsnippet.dataflow import BernoulliSampler, DataFlow
 from tfsnippet.distributions import Normal, Bernoulli
 from tfsnippet.examples.nn import (l2_regularizer,
                                    regularization_loss,
@@ -106,14 +106,6 @@ def posterior_flow(z, log_qz):
     return z, log_qz
 
 
-def sample_from_probs(x):
-    uniform_samples = tf.random_uniform(
-        shape=tf.shape(x), minval=0., maxval=1.,
-        dtype=x.dtype
-    )
-    return tf.cast(tf.less(uniform_samples, x), dtype=tf.int32)
-
-
 def main():
     logging.basicConfig(
         level='INFO',
@@ -215,13 +207,7 @@ def main():
             )
 
     # prepare for training and testing data
-    def input_x_sampler(x):
-        return session.run([sampled_x], feed_dict={sample_input_x: x})
-
-    with tf.device('/device:CPU:0'):
-        sample_input_x = tf.placeholder(
-            dtype=tf.float32, shape=(None, config.x_dim), name='sample_input_x')
-        sampled_x = sample_from_probs(sample_input_x)
+    input_x_sampler = BernoulliSampler()
 
     train_flow = DataFlow.arrays([x_train], config.batch_size, shuffle=True,
                                  skip_incomplete=True).map(input_x_sampler)
@@ -230,8 +216,9 @@ def main():
 
     with create_session().as_default() as session, \
             train_flow.threaded(5) as train_flow:
-        # fix the testing flow, reducing the testing time
-        test_flow = test_flow.to_arrays_flow(batch_size=config.test_batch_size)
+        # fix the testing flow, by caching the mini-batches of the first
+        # epoch, which also reduces the testing time
+        test_flow = test_flow.cache()
 
         # train the network
         with TrainLoop(params,
@@ -13,6 +13,9 @@ def load_mnist(shape=None, dtype=None, normalize=False):
         dtype: If specified, cast each digit into this dtype.
         normalize (bool): Whether or not to normalize the digits to (0, 1)?
             This implies ``dtype=np.float32``, if dtype is not specified.
+            To keep the digits in ``uint8`` and normalize only the
+            mini-batches, use :meth:`~tfsnippet.dataflow.DataFlow.cast`
+            instead.
 
     Returns:
         Tuple of numpy arrays `(x_train, y_train), (x_test, y_test)`.
@@ -1,6 +1,7 @@
 import numpy as np
 from matplotlib import pyplot as plt
 
+from tfsnippet.dataflow import ArrayCollector
 from tfsnippet.trainer import merge_feed_dict
 from tfsnippet.utils import get_default_session_or_error
 
@@ -26,18 +27,14 @@ def collect_outputs(outputs, inputs, data_flow, feed_dict=None, session=None):
     inputs = list(inputs)
     session = session or get_default_session_or_error()
 
-    collected = [[] for _ in range(len(outputs))]
+    collector = ArrayCollector(length=data_flow.length_hint())
     for batch in data_flow:
         batch_feed_dict = merge_feed_dict(
             feed_dict,
             {k: v for (k, v) in zip(inputs, batch)}
         )
-        for i, o in enumerate(session.run(outputs, feed_dict=batch_feed_dict)):
-            collected[i].append(o)
-
-    for i, batches in enumerate(collected):
-        collected[i] = np.concatenate(batches, axis=0)
-    return tuple(collected)
+        collector.collect(session.run(outputs, feed_dict=batch_feed_dict))
+    return collector.get_arrays()
 
 
 def plot_2d_log_p(x, log_p, cmap='jet', **kwargs):
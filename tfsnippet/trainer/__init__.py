@@ -1,15 +1,16 @@
-from . import (base_trainer, dynamic_values, evaluator, feed_dict, hooks,
-               loss_trainer, trainer, validator)
+from . import (base_trainer, dataset_input, dynamic_values, evaluator,
+               feed_dict, hooks, loss_trainer, trainer, validator)
 
 __all__ = sum(
     [m.__all__ for m in [
-        base_trainer, dynamic_values, evaluator, feed_dict, hooks,
-        loss_trainer, trainer, validator
+        base_trainer, dataset_input, dynamic_values, evaluator, feed_dict,
+        hooks, loss_trainer, trainer, validator
     ]],
     []
 )
 
 from .base_trainer import *
+from .dataset_input import *
 from .dynamic_values import *
 from .evaluator import *
 from .feed_dict import *
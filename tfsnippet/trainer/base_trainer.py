@@ -287,3 +287,46 @@ class BaseTrainer(object):
             int: The number of removed hooks.
         """
         return self.remove_by_priority(HookPriority.ANNEALING)
+
+    def collect_data_metrics_after_steps(self, flows, freq):
+        """
+        Add a hook to collect the metrics of instrumented data flows into
+        the training loop, to run after every few steps.
+
+        Args:
+            flows (Iterable[InstrumentedFlow]): The instrumented data flows.
+            freq (int): The frequency for this hook to run.
+        """
+        flows = tuple(flows)
+        self.after_steps.add_hook(
+            lambda: self._collect_data_metrics(flows), freq=freq,
+            priority=HookPriority.DATA_METRICS
+        )
+
+    def collect_data_metrics_after_epochs(self, flows, freq):
+        """
+        Add a hook to collect the metrics of instrumented data flows into
+        the training loop, to run after every few epochs.
+
+        Args:
+            flows (Iterable[InstrumentedFlow]): The instrumented data flows.
+            freq (int): The frequency for this hook to run.
+        """
+        flows = tuple(flows)
+        self.after_epochs.add_hook(
+            lambda: self._collect_data_metrics(flows), freq=freq,
+            priority=HookPriority.DATA_METRICS
+        )
+
+    def remove_data_metrics_hooks(self):
+        """
+        Remove data metrics hooks from all lists.
+
+        Returns:
+            int: The number of removed hooks.
+        """
+        return self.remove_by_priority(HookPriority.DATA_METRICS)
+
+    def _collect_data_metrics(self, flows):
+        for flow in flows:
+            flow.collect_metrics(self.loop)
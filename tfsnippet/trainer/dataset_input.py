@@ -0,0 +1,128 @@
+import tensorflow as tf
+
+__all__ = ['DatasetInput']
+
+
+class DatasetInput(object):
+    """
+    Class to feed the mini-batches of a :class:`DataFlow` into TensorFlow
+    through :mod:`tf.data`, instead of ``feed_dict``.
+
+    The mini-batches are converted into tensors and prefetched by the
+    background threads of TensorFlow, thus the data transfer overlaps with
+    the training operation.  The model should be built upon the tensors
+    from :attr:`inputs`, and a :class:`DatasetInput` can be used in place of
+    the data flow of a :class:`Trainer` or an :class:`Evaluator`::
+
+        train_input = DatasetInput(
+            train_flow, output_types=[tf.float32, tf.int32],
+            output_shapes=[[None, 784], [None]], prefetch=5
+        )
+        input_x, input_y = train_input.inputs
+        loss = build_model(input_x, input_y)
+        train_op = optimizer.minimize(loss)
+
+        with TrainLoop(...) as loop:
+            trainer = Trainer(loop, train_op, [], train_input,
+                              metrics={'loss': loss})
+            trainer.run()
+
+    Each epoch of the :class:`DatasetInput` is exactly one epoch of the
+    data flow, and it finishes right after the last mini-batch is consumed,
+    so the epoch and step counters of :class:`TrainLoop` are the same as
+    feeding the data flow via ``feed_dict``.
+    """
+
+    def __init__(self, data_flow, output_types, output_shapes=None,
+                 prefetch=1):
+        """
+        Construct a new :class:`DatasetInput`.
+
+        Args:
+            data_flow (DataFlow): The data flow.
+            output_types (Iterable[tf.DType]): The data types of the arrays
+                in each mini-batch.
+            output_shapes (Iterable[tf.TensorShape]): The shapes of the
+                arrays in each mini-batch, including the batch dimension.
+                (default :obj:`None`, unknown shapes)
+            prefetch (int): Number of mini-batches to prefetch.
+                (default 1)
+        """
+        dataset = data_flow.to_tf_dataset(
+            output_types=output_types, output_shapes=output_shapes,
+            prefetch=prefetch, mark_last=True
+        )
+        self._data_flow = data_flow
+        self._iterator = dataset.make_initializable_iterator()
+        elements = self._iterator.get_next()
+        self._inputs = tuple(elements[:-1])
+        self._is_last = elements[-1]
+        self._epoch_finished = True
+
+    @property
+    def data_flow(self):
+        """
+        Get the data flow.
+
+        Returns:
+            DataFlow: The data flow.
+        """
+        return self._data_flow
+
+    @property
+    def inputs(self):
+        """
+        Get the input tensors, which produce the arrays of each mini-batch.
+
+        Returns:
+            tuple[tf.Tensor]: The input tensors.
+        """
+        return self._inputs
+
+    @property
+    def initializer(self):
+        """Get the operation to start a new epoch."""
+        return self._iterator.initializer
+
+    def iter_epoch(self, session):
+        """
+        Start a new epoch, and iterate through its steps.
+
+        :meth:`run_batch` must be called once after each step is yielded,
+        which consumes the mini-batch of that step.
+
+        Args:
+            session (tf.Session): The TensorFlow session.
+
+        Yields:
+            None: Once for each step, until the last mini-batch has
+                been consumed by :meth:`run_batch`.
+        """
+        session.run(self.initializer)
+        self._epoch_finished = False
+        while not self._epoch_finished:
+            yield None
+
+    def run_batch(self, session, fetches, feed_dict=None):
+        """
+        Run `fetches` upon the next mini-batch.
+
+        Args:
+            session (tf.Session): The TensorFlow session.
+            fetches (list): The fetches for ``session.run``.
+            feed_dict: The feed dict for ``session.run``.
+                (default :obj:`None`)
+
+        Returns:
+            list or None: The fetched values, or :obj:`None` if the epoch
+                contains no mini-batch.
+        """
+        try:
+            values, is_last = session.run(
+                [fetches, self._is_last], feed_dict=feed_dict)
+        except tf.errors.OutOfRangeError:
+            self._epoch_finished = True
+            return None
+        if is_last:
+            self._epoch_finished = True
+        return values
@@ -9,6 +9,7 @@ from tfsnippet.dataflow import DataFlow
 from tfsnippet.utils import get_default_session_or_error
 from tfsnippet.scaffold import TrainLoop
 
+from .dataset_input import DatasetInput
 from .feed_dict import resolve_feed_dict, merge_feed_dict
 
 __all__ = ['auto_batch_weight', 'Evaluator']
@@ -60,7 +61,9 @@ class Evaluator(object):
                 The number of tensors, and the order of tensors, should
                 both match the arrays of each mini-batch data, provided
                 by `data_flow`.
-            data_flow (DataFlow): The validation data flow.
+            data_flow (DataFlow or DatasetInput): The validation data flow.
+                If it is a :class:`DatasetInput`, the metrics should be
+                computed upon its input tensors, and `inputs` must be empty.
             feed_dict (dict[tf.Tensor, any]): The fixed feed dict for
                 validation.  It will be merged with `inputs` and the
                 argument of ``run(feed_dict)``. (default :obj:`None`)
@@ -70,8 +73,16 @@ class Evaluator(object):
             batch_weight_func ((\*arrays) -> float or None): Specify how
                 to compute the metric weight for each mini-batch.  If
                 :obj:`None`, will use 1. as the metric weight.
+                If `data_flow` is a :class:`DatasetInput`, the arrays of
+                each mini-batch will be fetched along with the metrics,
+                unless :func:`auto_batch_weight` is used, in which case
+                only the size of the first array will be fetched.
                 (default :func:`auto_batch_weight`)
         """
+        inputs = list(inputs or ())
+        if isinstance(data_flow, DatasetInput) and inputs:
+            raise ValueError('`inputs` must be empty when `data_flow` is a '
+                             '`DatasetInput`.')
         if not isinstance(metrics, (dict, OrderedDict)):
             metrics = {loop.valid_metric_name: metrics}
         metrics = OrderedDict([
@@ -86,13 +97,23 @@ class Evaluator(object):
 
         self._loop = loop
         self._metrics = metrics
-        self._inputs = list(inputs or ())
+        self._inputs = inputs
         self._data_flow = data_flow
         self._feed_dict = dict(feed_dict or ())
         self._time_metric_name = time_metric_name
         self._batch_weight_func = batch_weight_func
         self._last_metrics_dict = {}  # store the metrics of last evaluation
 
+        # the tensors to be fetched for computing the batch weights,
+        # if `data_flow` is a `DatasetInput`
+        self._batch_weight_fetches = []
+        if isinstance(data_flow, DatasetInput) and \
+                batch_weight_func is not None:
+            if batch_weight_func is auto_batch_weight:
+                self._batch_weight_fetches = [tf.size(data_flow.inputs[0])]
+            else:
+                self._batch_weight_fetches = list(data_flow.inputs)
+
     @property
     def loop(self):
         """
@@ -129,7 +150,7 @@ class Evaluator(object):
         Get the validation data flow.
 
         Returns:
-            DataFlow: The validation data flow.
+            DataFlow or DatasetInput: The validation data flow.
         """
         return self._data_flow
 
@@ -167,6 +188,50 @@ class Evaluator(object):
         return session.run(list(six.itervalues(self.metrics)),
                            feed_dict=feed_dict)
 
+    def _iter_batches(self, session, feed_dict):
+        for batch_data in self.data_flow:
+            # prepare for the batch feed dict
+            batch_feed_dict = resolve_feed_dict(
+                merge_feed_dict(
+                    self.feed_dict,
+                    feed_dict,
+                    zip(self.inputs, batch_data)
+                )
+            )
+
+            # inspect the batch weight
+            if self._batch_weight_func is not None:
+                batch_weight = self._batch_weight_func(*batch_data)
+            else:
+                batch_weight = 1.
+
+            # run the mini-batch
+            yield batch_weight, self._run_batch(session, batch_feed_dict)
+
+    def _iter_dataset_batches(self, session, feed_dict):
+        feed_dict = resolve_feed_dict(
+            merge_feed_dict(self.feed_dict, feed_dict))
+        metric_tensors = list(six.itervalues(self.metrics))
+        fetches = metric_tensors + self._batch_weight_fetches
+
+        for _ in self.data_flow.iter_epoch(session):
+            values = self.data_flow.run_batch(
+                session, fetches, feed_dict=feed_dict)
+            if values is None:  # the epoch contains no mini-batch
+                break
+            batch_values = values[:len(metric_tensors)]
+            weight_values = values[len(metric_tensors):]
+
+            # compute the batch weight
+            if self._batch_weight_func is None:
+                batch_weight = 1.
+            elif self._batch_weight_func is auto_batch_weight:
+                batch_weight = weight_values[0]
+            else:
+                batch_weight = self._batch_weight_func(*weight_values)
+
+            yield batch_weight, batch_values
+
     def run(self, feed_dict=None):
         """
         Run evaluation.
@@ -190,25 +255,12 @@ class Evaluator(object):
         metric_weights = []
 
         with timeit():
-            for batch_data in self.data_flow:
-                # prepare for the batch feed dict
-                feed_dict = resolve_feed_dict(
-                    merge_feed_dict(
-                        self.feed_dict,
-                        feed_dict,
-                        zip(self.inputs, batch_data)
-                    )
-                )
-
-                # inspect the batch weight
-                if self._batch_weight_func is not None:
-                    batch_weight = self._batch_weight_func(*batch_data)
-                else:
-                    batch_weight = 1.
-                metric_weights.append(batch_weight)
+            if isinstance(self.data_flow, DatasetInput):
+                batches = self._iter_dataset_batches(session, feed_dict)
+            else:
+                batches = self._iter_batches(session, feed_dict)
 
-                # run the mini-batch
-                batch_values = self._run_batch(session, feed_dict)
+            for batch_weight, batch_values in batches:
                 for i, v in enumerate(batch_values):
                     if len(np.asarray(v).shape) != 0:  # pragma: no cover
                         raise ValueError(
@@ -217,6 +269,7 @@ class Evaluator(object):
                         )
 
                 # accumulate the metrics
+                metric_weights.append(batch_weight)
                 metric_values.append(np.asarray(batch_values))
 
         # now merge all batch metrics and do logging
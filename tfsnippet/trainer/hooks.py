@@ -12,6 +12,7 @@ class HookPriority(object):
     EVALUATION = VALIDATION = 500
     DEFAULT = 1000
     ANNEALING = 1500
+    DATA_METRICS = 9000
     LOGGING = 10000
 
 
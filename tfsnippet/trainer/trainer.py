@@ -1,7 +1,9 @@
 import six
 
 from tfsnippet.scaffold import TrainLoop
+from tfsnippet.utils import get_default_session_or_error
 from .base_trainer import BaseTrainer
+from .dataset_input import DatasetInput
 from .feed_dict import resolve_feed_dict, merge_feed_dict
 
 
@@ -75,9 +77,11 @@ class Trainer(BaseTrainer):
                 The number of tensors, and the order of tensors, should
                 both match the arrays of each mini-batch data, provided
                 by `data_flow`.
-            data_flow (DataFlow): The training data flow.
+            data_flow (DataFlow or DatasetInput): The training data flow.
                 Each mini-batch must contain one array for each placeholder
-                in `inputs`.
+                in `inputs`.  If it is a :class:`DatasetInput`, the model
+                should be built upon its input tensors, and `inputs`
+                must be empty.
             feed_dict: The feed dict for training.  It will be merged with
                 the arrays provided by `data_flow` in each step.
                 (default :obj:`None`)
@@ -87,10 +91,14 @@ class Trainer(BaseTrainer):
         if loop.max_epoch is None and loop.max_step is None:
             raise ValueError('At least one of `max_epoch`, `max_step` should '
                              'be configured for `loop`.')
+        inputs = tuple(inputs or ())
+        if isinstance(data_flow, DatasetInput) and inputs:
+            raise ValueError('`inputs` must be empty when `data_flow` is a '
+                             '`DatasetInput`.')
         super(Trainer, self).__init__(loop=loop)
 
         # memorize the arguments
-        self._inputs = tuple(inputs or ())
+        self._inputs = inputs
         self._data_flow = data_flow
         self._feed_dict = dict(feed_dict or ())
         self._train_op = train_op
@@ -112,7 +120,7 @@ class Trainer(BaseTrainer):
         Get the training data flow.
 
         Returns:
-            DataFlow: The training data flow.
+            DataFlow or DatasetInput: The training data flow.
         """
         return self._data_flow
 
@@ -137,22 +145,33 @@ class Trainer(BaseTrainer):
         return self._metrics
 
     def _iter_steps(self):
+        if isinstance(self.data_flow, DatasetInput):
+            return self.loop.iter_steps(
+                self.data_flow.iter_epoch(get_default_session_or_error()))
         return self.loop.iter_steps(self.data_flow)
 
     def _run_step(self, session, payload):
         # prepare for the feed dict of this step
         step, batch_data = payload
+        is_dataset = isinstance(self.data_flow, DatasetInput)
         feed_dict = resolve_feed_dict(
             merge_feed_dict(
                 self.feed_dict,
-                zip(self.inputs, batch_data)
+                zip(self.inputs, batch_data) if not is_dataset else None
             )
         )
 
         # run the training operation
         metric_names = list(six.iterkeys(self.metrics))
         metric_tensors = [self.metrics[k] for k in metric_names]
-        metric_values = session.run(
-            [self._train_op] + metric_tensors, feed_dict=feed_dict)[1:]
+        fetches = [self._train_op] + metric_tensors
+        if is_dataset:
+            values = self.data_flow.run_batch(
+                session, fetches, feed_dict=feed_dict)
+            if values is None:  # the epoch contains no mini-batch
+                return
+            metric_values = values[1:]
+        else:
+            metric_values = session.run(fetches, feed_dict=feed_dict)[1:]
         self.loop.collect_metrics(
             {n: v for n, v in zip(metric_names, metric_values)})
@@ -5,6 +5,7 @@ __all__ = [
     'minibatch_slices_iterator',
     'split_numpy_arrays',
     'split_numpy_array',
+    'RandomStreams',
 ]
 
 
@@ -44,8 +45,10 @@ def split_numpy_arrays(arrays, portion=None, size=None, shuffle=True,
             Ignored if `size` is specified.
         size (int): Size of the second half.
         shuffle (bool): Whether or not to shuffle before splitting?
-        random_state (RandomState): Optional numpy RandomState for shuffling
-            data. (default :obj:`None`, use the global :class:`RandomState`).
+        random_state (RandomState or RandomStreams): Optional numpy
+            RandomState for shuffling data, or :class:`RandomStreams` whose
+            ``stream()`` is used for shuffling.  (default :obj:`None`, use
+            the global :class:`RandomState`).
 
     Returns:
         (tuple[np.ndarray], tuple[np.ndarray]): Splitted two halves of arrays.
@@ -79,6 +82,8 @@ def split_numpy_arrays(arrays, portion=None, size=None, shuffle=True,
     if shuffle:
         if random_state is None:
             random_state = np.random
+        elif isinstance(random_state, RandomStreams):
+            random_state = random_state.stream()
         indices = np.arange(data_count)
         random_state.shuffle(indices)
         arrays = tuple(a[indices] for a in arrays)
@@ -113,3 +118,142 @@ def split_numpy_array(array, portion=None, size=None, shuffle=True):
     (a,), (b,) = split_numpy_arrays((array,), portion=portion, size=size,
                                     shuffle=shuffle)
     return a, b
+
+
+# whether or not the counter-based Philox generator is available (NumPy 1.17+)
+_HAS_PHILOX = hasattr(np.random, 'Philox') and \
+    hasattr(np.random, 'SeedSequence')
+
+
+def _check_key(key, name):
+    key = tuple(int(k) for k in key)
+    for k in key:
+        if k < 0:
+            raise ValueError('`{}` must be non-negative integers: got {!r}.'.
+                             format(name, key))
+    return key
+
+
+def _uint32_words(n):
+    """Split a non-negative integer into 32-bit words."""
+    words = [n & 0xffffffff]
+    n >>= 32
+    while n:
+        words.append(n & 0xffffffff)
+        n >>= 32
+    return words
+
+
+class RandomStreams(object):
+    """
+    Reproducible random streams, keyed by a seed and integer counters.
+
+    Each random stream obtained by :meth:`stream` is a new
+    :class:`RandomState`, which is determined only by the seed, the key of
+    this object and the counters, rather than the history of a shared
+    stateful random generator.  Thus the random streams for different
+    epochs, shards or workers can be computed independently and in any
+    order (e.g., in parallel threads or processes), yet reproducibly.
+    For example::
+
+        streams = RandomStreams(seed=1234)
+
+        # the flow shuffles each epoch with ``streams.stream(epoch)``
+        train_flow = DataFlow.arrays([x, y], batch_size=64, shuffle=True,
+                                     random_state=streams)
+
+        # each worker uses its own random stream for the augmentation
+        worker_streams = streams.child(worker_index)
+        for epoch in epochs:
+            augment = RandomCrop(32, padding=4,
+                                 random_state=worker_streams.stream(epoch))
+
+    With NumPy 1.17 or later, the streams use the counter-based Philox
+    generator, keyed by hashing the seed, the key and the counters with
+    :class:`np.random.SeedSequence`.  Otherwise they use the Mersenne
+    Twister generator, seeded by the same integers.  The streams
+    are thus reproducible only with the same major version of NumPy.
+    """
+
+    def __init__(self, seed, key=()):
+        """
+        Construct a :class:`RandomStreams`.
+
+        Args:
+            seed (int): The non-negative seed.
+            key (Iterable[int]): The non-negative integers identifying
+                these random streams, e.g., a shard or a worker.
+                (default ``()``)
+        """
+        seed = int(seed)
+        if seed < 0:
+            raise ValueError('`seed` must be a non-negative integer: got {}.'.
+                             format(seed))
+        self._seed = seed
+        self._key = _check_key(key, 'key')
+
+    def __repr__(self):
+        return 'RandomStreams(seed={}, key={!r})'.format(self._seed,
+                                                         self._key)
+
+    def __eq__(self, other):
+        return isinstance(other, RandomStreams) and \
+            self._seed == other._seed and self._key == other._key
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash((self._seed, self._key))
+
+    @property
+    def seed(self):
+        """Get the seed."""
+        return self._seed
+
+    @property
+    def key(self):
+        """Get the integers identifying these random streams."""
+        return self._key
+
+    def child(self, *key):
+        """
+        Get the child random streams, e.g., for a shard or a worker.
+
+        Args:
+            \*key (int): The non-negative integers to be appended to the
+                key of this object.
+
+        Returns:
+            RandomStreams: The child random streams.
+        """
+        return RandomStreams(self._seed, self._key + _check_key(key, 'key'))
+
+    def stream(self, *counters):
+        """
+        Get the random stream for specified counters, e.g., the epoch.
+
+        Args:
+            \*counters (int): The non-negative integer counters.
+
+        Returns:
+            RandomState: A new :class:`RandomState` for the random stream.
+        """
+        counters = _check_key(counters, 'counters')
+        # the key and the counters are encoded as separate groups, each
+        # prefixed by its length, and each integer is prefixed by its number
+        # of words, such that ``child(i).stream(j)``, ``stream(i, j)`` and
+        # ``child(i, j).stream()`` never produce the same stream
+        words = []
+        for group in (self._key, counters):
+            words.append(len(group))
+            for n in group:
+                n_words = _uint32_words(n)
+                words.append(len(n_words))
+                words.extend(n_words)
+        if _HAS_PHILOX:
+            seq = np.random.SeedSequence(self._seed, spawn_key=tuple(words))
+            return RandomState(np.random.Philox(seq))
+        seed_words = _uint32_words(self._seed)
+        words = [len(seed_words)] + seed_words + words
+        return RandomState(np.asarray(words, dtype=np.uint32))